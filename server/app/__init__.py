@@ -4,11 +4,14 @@ from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_socketio import SocketIO
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 
 # from flask_wtf.csrf import CSRFProtect
 from dotenv import load_dotenv
 from .config import Config
+from .services.socketio_backplane import socketio_options
+from .services.metrics import init_metrics, metrics_snapshot
 
 db = SQLAlchemy()
 migrate = Migrate()
@@ -17,25 +20,59 @@ socketio = SocketIO(cors_allowed_origins="http://localhost:3003", async_mode='ge
 # csrf = CSRFProtect()
 
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
 
     @app.route('/healthcheck', methods=['GET'])
     def healthcheck():
         return jsonify({'status': 'OK'}), 200
 
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        snapshot = metrics_snapshot()
+        if snapshot is None:
+            return jsonify({'error': 'Metrics are disabled'}), 404
+        return jsonify(snapshot), 200
+
     load_dotenv()
     app.config.from_object(Config)
+    if test_config:
+        app.config.update(test_config)
 
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    init_metrics(app)
     # csrf.init_app(app)
     CORS(app, supports_credentials=True, origins=["http://localhost:3003"])
-    socketio.init_app(app)
 
+    # Socket.IO のハンドラーは init_app のたびに新しいサーバーへ登録されるよう、
+    # コントローラーを init_app より先に読み込む
     from app.routes import init_routes
+    from app.utils.token_utils import init_revocation_store
+    from app.services.message_writer import init_message_writer
+    from app.services.chat_membership import init_chat_membership
+    from app.services.chat_replay import init_chat_replay
+    from app.services.broadcast_scheduler import init_broadcaster
+    from app.services.presence import init_presence
+    from app.services.response_cache import init_response_cache
+    from app.services.rate_limiter import init_rate_limiter
+    from app.services.password_hasher import init_password_hasher
+
+    socketio.init_app(app, **socketio_options(app.config))
+    if app.config['PROXY_FIX_X_FOR']:
+        # Socket.IO の接続も含め、信頼するプロキシが付けた接続元 IP を使う
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
 
+    init_revocation_store(app)
+    init_message_writer(app)
+    init_chat_membership(app)
+    init_chat_replay(app)
+    init_broadcaster(app)
+    init_presence(app)
+    init_response_cache(app)
+    init_rate_limiter(app)
+    init_password_hasher(app)
     init_routes(app)
 
     return app
@@ -9,3 +9,118 @@ class Config:
     JWT_TOKEN_LOCATION = ['cookies']
     JWT_ACCESS_COOKIE_PATH = '/'  # トークンがどのパスで有効か
     JWT_COOKIE_CSRF_PROTECT = True
+
+    MESSAGE_PAGE_SIZE = int(os.environ.get('MESSAGE_PAGE_SIZE', 50))
+    MESSAGE_PAGE_MAX_SIZE = int(os.environ.get('MESSAGE_PAGE_MAX_SIZE', 200))
+
+    USER_SEARCH_LIMIT = int(os.environ.get('USER_SEARCH_LIMIT', 20))
+    USER_SEARCH_MAX_LIMIT = int(os.environ.get('USER_SEARCH_MAX_LIMIT', 50))
+    FRIEND_SUGGESTION_LIMIT = int(os.environ.get('FRIEND_SUGGESTION_LIMIT', 10))
+    FRIEND_SUGGESTION_MAX_LIMIT = int(
+        os.environ.get('FRIEND_SUGGESTION_MAX_LIMIT', 50)
+    )
+
+    CALENDAR_MAX_RANGE_DAYS = int(os.environ.get('CALENDAR_MAX_RANGE_DAYS', 400))
+    # meeting_time(現地時刻の自由入力)を解釈するタイムゾーン
+    APP_TIMEZONE = os.environ.get('APP_TIMEZONE', 'Asia/Tokyo')
+    # 終了時刻のない予定が占める時間
+    SCHEDULE_DEFAULT_EVENT_MINUTES = int(
+        os.environ.get('SCHEDULE_DEFAULT_EVENT_MINUTES', 120)
+    )
+    SCHEDULE_MAX_USERS = int(os.environ.get('SCHEDULE_MAX_USERS', 100))
+
+    # ICS フィードは一定件数ずつ読みながら送信する。カレンダーアプリのポーリング間隔
+    ICS_FEED_PAGE_SIZE = int(os.environ.get('ICS_FEED_PAGE_SIZE', 500))
+    ICS_FEED_MAX_AGE = int(os.environ.get('ICS_FEED_MAX_AGE', 300))
+    ICS_IMPORT_BATCH_SIZE = int(os.environ.get('ICS_IMPORT_BATCH_SIZE', 200))
+    ICS_IMPORT_MAX_EVENTS = int(os.environ.get('ICS_IMPORT_MAX_EVENTS', 5000))
+
+    # 'database' はワーカー間で共有、'memory' は単一プロセス用
+    TOKEN_REVOCATION_BACKEND = os.environ.get('TOKEN_REVOCATION_BACKEND', 'database')
+    TOKEN_REVOCATION_CACHE_SIZE = int(
+        os.environ.get('TOKEN_REVOCATION_CACHE_SIZE', 10000)
+    )
+    TOKEN_REVOCATION_CACHE_TTL = int(os.environ.get('TOKEN_REVOCATION_CACHE_TTL', 5))
+
+    # 複数ワーカー/インスタンス間でチャットを中継する。例: redis://redis:6379/0
+    # 'local://' はプロセス内ブローカー(テスト用)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'calendar-chat')
+    # スティッキーセッションのないロードバランサ配下では 'websocket' のみにする
+    SOCKETIO_TRANSPORTS = (
+        os.environ['SOCKETIO_TRANSPORTS'].split(',')
+        if os.environ.get('SOCKETIO_TRANSPORTS')
+        else None
+    )
+
+    # 'sync' は1件ずつコミット、'write_behind' はバッファしてまとめて INSERT する
+    MESSAGE_WRITE_MODE = os.environ.get('MESSAGE_WRITE_MODE', 'sync')
+    MESSAGE_WRITE_BATCH_SIZE = int(os.environ.get('MESSAGE_WRITE_BATCH_SIZE', 200))
+    MESSAGE_WRITE_FLUSH_INTERVAL = float(
+        os.environ.get('MESSAGE_WRITE_FLUSH_INTERVAL', 0.2)
+    )
+    MESSAGE_WRITE_MAX_PENDING = int(os.environ.get('MESSAGE_WRITE_MAX_PENDING', 5000))
+    # 'buffered' はバッファ投入時点で応答、'committed' はコミット完了を待つ
+    MESSAGE_WRITE_DURABILITY = os.environ.get('MESSAGE_WRITE_DURABILITY', 'buffered')
+
+    # 再接続時の取りこぼし再送。ルームごとに直近 N 件をメモリに保持し、
+    # さかのぼれない場合は DB から最大 CHAT_REPLAY_MAX_MESSAGES 件を読む
+    CHAT_REPLAY_BUFFER_SIZE = int(os.environ.get('CHAT_REPLAY_BUFFER_SIZE', 200))
+    CHAT_REPLAY_MAX_ROOMS = int(os.environ.get('CHAT_REPLAY_MAX_ROOMS', 1000))
+    CHAT_REPLAY_MAX_MESSAGES = int(os.environ.get('CHAT_REPLAY_MAX_MESSAGES', 500))
+
+    # 'immediate' は1件ずつ receive_message、'coalesce' は短い間隔でまとめて
+    # receive_messages として送る(送信フレーム数を減らす)
+    CHAT_BROADCAST_MODE = os.environ.get('CHAT_BROADCAST_MODE', 'immediate')
+    CHAT_BROADCAST_WINDOW_MS = float(os.environ.get('CHAT_BROADCAST_WINDOW_MS', 50))
+    CHAT_BROADCAST_MAX_BATCH = int(os.environ.get('CHAT_BROADCAST_MAX_BATCH', 50))
+
+    # オンライン・入力中の通知。ルームごとに間隔をあけ、変化があったときだけ送る
+    PRESENCE_BROADCAST_INTERVAL_MS = float(
+        os.environ.get('PRESENCE_BROADCAST_INTERVAL_MS', 1000)
+    )
+    PRESENCE_TYPING_TTL = float(os.environ.get('PRESENCE_TYPING_TTL', 5))
+    PRESENCE_MAX_ROOMS_PER_CONNECTION = int(
+        os.environ.get('PRESENCE_MAX_ROOMS_PER_CONNECTION', 50)
+    )
+
+    # イベント詳細・フレンド一覧のキャッシュ。'memory'、'redis'(要 redis)、'none'
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL')
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1000))
+    RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 30))
+
+    # トークンバケットによる流量制限。'count/seconds'(秒あたり count/seconds ずつ
+    # 補充、最大 count)。空にするとそのポリシーは無効。'memory' または 'redis'(要 redis)
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_URL = os.environ.get('RATE_LIMIT_URL')
+    RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 10000))
+    # 前段のリバースプロキシの段数。1 以上なら X-Forwarded-For の右から
+    # その段数分を信頼して接続元 IP にする。0 ならヘッダーは無視する
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+    RATE_LIMITS = {
+        # IP アドレスごと
+        'login': os.environ.get('RATE_LIMIT_LOGIN', '10/60'),
+        # メールアドレスと IP アドレスの組ごとの、ログインに失敗した回数
+        'login_account': os.environ.get('RATE_LIMIT_LOGIN_ACCOUNT', '5/60'),
+        # ユーザーごと
+        'search_users': os.environ.get('RATE_LIMIT_SEARCH_USERS', '60/60'),
+        'send_friend_request': os.environ.get('RATE_LIMIT_FRIEND_REQUEST', '20/60'),
+        'send_message': os.environ.get('RATE_LIMIT_SEND_MESSAGE', '20/10'),
+        # チャットのルームごと
+        'room_messages': os.environ.get('RATE_LIMIT_ROOM_MESSAGES', '100/10'),
+    }
+
+    # パスワードのハッシュ方式とコスト(変更すると次回ログイン時に作り直す)。
+    # 計算は PASSWORD_HASH_WORKERS 本のスレッドで行い、待ちが
+    # PASSWORD_HASH_MAX_QUEUE 件を超えると 503 を返す。0 ならその場で計算する
+    PASSWORD_HASH_METHOD = os.environ.get(
+        'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000'
+    )
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 32))
+
+    # リクエスト/Socket.IO イベントごとの計測。/metrics で参照できる
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
@@ -13,6 +13,13 @@ from flask_jwt_extended import (
 from app.models.user_model import User
 from app import db
 from app.utils.token_utils import revoke_token
+from app.services.rate_limiter import (
+    by_remote_addr,
+    by_submitted_email_and_addr,
+    rate_limit,
+    rate_limit_failures,
+)
+from app.services.password_hasher import PasswordHasherBusy
 
 
 def register_user():
@@ -28,7 +35,10 @@ def register_user():
         return jsonify({'message': 'Email already registered'}), 400
 
     new_user = User(username=username, email=email)
-    new_user.set_password(password)
+    try:
+        new_user.set_password(password)
+    except PasswordHasherBusy:
+        return _busy_response()
     db.session.add(new_user)
     try:
         db.session.commit()
@@ -38,13 +48,23 @@ def register_user():
     return jsonify({'message': 'User registered successfully'}), 201
 
 
+@rate_limit('login', key=by_remote_addr)
+@rate_limit_failures('login_account', key=by_submitted_email_and_addr)
 def login_user():
     data = request.get_json()
     email = data.get('email')
     password = data.get('password')
 
     user = User.query.filter_by(email=email).first()
-    if user and user.check_password(password):
+    try:
+        authenticated = user is not None and user.check_password(password)
+        if authenticated and user.password_needs_rehash():
+            # ハッシュの方式・コストを変えた場合、ログイン時に作り直す
+            _rehash_password(user, password)
+    except PasswordHasherBusy:
+        return _busy_response()
+
+    if authenticated:
         access_token = create_access_token(
             identity=user.id,
             additional_claims={"username": user.username},
@@ -59,6 +79,24 @@ def login_user():
         return jsonify({"message": "Invalid email or password"}), 401
 
 
+def _rehash_password(user, password):
+    try:
+        user.set_password(password)
+        db.session.commit()
+    except PasswordHasherBusy:
+        # 混んでいるときは作り直しを次回に回す
+        return
+    except Exception as e:
+        db.session.rollback()
+        logging.warning(f"Failed to rehash password for user {user.id}: {str(e)}")
+
+
+def _busy_response():
+    response = jsonify({'message': 'Server is busy, please retry'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
 @jwt_required()
 def get_user():
     user_id = get_jwt_identity()
@@ -72,7 +110,7 @@ def get_user():
 def logout_user():
     jwt_data = get_jwt()
     jti = jwt_data.get('jti')
-    revoke_token(jti)
+    revoke_token(jti, jwt_data.get('exp'))
 
     response = jsonify({'message': 'Logout successful'})
     unset_jwt_cookies(response)
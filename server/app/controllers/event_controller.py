@@ -2,12 +2,55 @@ import logging
 import uuid
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from flask import request, jsonify
-from flask_socketio import join_room, leave_room, emit
+from flask import current_app, request, jsonify
+from flask_socketio import join_room, leave_room, emit, rooms
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import socketio
 from app.models import db, Event, EventInvite, EventParticipant, User, Message
-
+from app.services.message_service import (
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    fetch_message_page,
+    fetch_messages_after,
+    latest_message_marker,
+)
+from app.services.message_writer import MessageBufferFull, get_message_writer
+from app.services.chat_membership import get_chat_membership
+from app.services.chat_replay import get_chat_replay
+from app.services.broadcast_scheduler import get_broadcaster
+from app.services.presence import TooManyRooms, get_presence
+from app.services.rate_limiter import socket_rate_limit
+from app.services.invite_service import invite_users
+from app.services.availability_service import (
+    get_availability_index,
+    resolve_members,
+)
+from app.services.response_cache import get_response_cache
+from app.services.metrics import instrument_socket_event
+from app.utils.serializers import isoformat
+from app.utils.time_utils import format_utc, utc_naive
+from app.services.resource_versions import (
+    bump_versions,
+    check_not_modified,
+    event_key,
+    tag_response,
+    user_key,
+)
+from app.services.calendar_service import (
+    InvalidRange,
+    add_calendar_entries,
+    apply_event_times,
+    apply_recurrence,
+    fetch_calendar,
+    find_overlapping_events,
+    parse_datetime,
+    remove_calendar_entries,
+    remove_occurrence_exceptions,
+    resolve_range,
+    set_occurrence_exception,
+    update_calendar_entries,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,26 +76,59 @@ def create_event():
             description=data.get('description'),
             created_by=user_id,
         )
+        apply_event_times(event, *_requested_times(data))
+        apply_recurrence(event, data.get('recurrence_rule'))
+
+        conflicts = find_overlapping_events(user_id, event.starts_at, event.ends_at)
+        if conflicts and data.get('reject_overlap'):
+            return (
+                jsonify(
+                    {'error': 'Event overlaps existing events', 'conflicts': conflicts}
+                ),
+                409,
+            )
+
         db.session.add(event)
-        db.session.commit()
+        db.session.flush()
 
-        participant = EventParticipant(event_id=event.id, user_id=user_id)
+        event_id = event.id
+        participant = EventParticipant(event_id=event_id, user_id=user_id)
         db.session.add(participant)
+        add_calendar_entries(event, [user_id])
 
-        invitee_ids = data.get('invitees', [])
-        for invitee_id in invitee_ids:
-            invite = EventInvite(event_id=event.id, user_id=invitee_id)
-            db.session.add(invite)
+        invites = invite_users(event_id, user_id, data.get('invitees', []))
 
         db.session.commit()
 
-        return jsonify({'message': 'Event created successfully.'}), 201
+        return (
+            jsonify(
+                {
+                    'message': 'Event created successfully.',
+                    'event_id': event_id,
+                    'invites': invites,
+                    'conflicts': conflicts,
+                }
+            ),
+            201,
+        )
+    except InvalidRange as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error creating event: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
+def _requested_times(data):
+    starts_at = data.get('starts_at')
+    ends_at = data.get('ends_at')
+    return (
+        parse_datetime(starts_at, 'starts_at') if starts_at else None,
+        parse_datetime(ends_at, 'ends_at') if ends_at else None,
+    )
+
+
 @jwt_required()
 def update_event(event_id):
     try:
@@ -74,9 +150,40 @@ def update_event(event_id):
         event.meeting_place = data.get('meeting_place', event.meeting_place)
         event.description = data.get('description', event.description)
 
+        conflicts = []
+        if any(
+            key in data
+            for key in (
+                'event_date',
+                'meeting_time',
+                'starts_at',
+                'ends_at',
+                'recurrence_rule',
+            )
+        ):
+            previous = (utc_naive(event.starts_at), event.recurrence_rule)
+            apply_event_times(event, *_requested_times(data))
+            apply_recurrence(event, data.get('recurrence_rule', event.recurrence_rule))
+            # 各回は元の開始時刻で識別するため、初回や規則が変われば例外を破棄する
+            if (utc_naive(event.starts_at), event.recurrence_rule) != previous:
+                remove_occurrence_exceptions(event_id)
+            conflicts = find_overlapping_events(
+                user_id, event.starts_at, event.ends_at, exclude_event_id=event_id
+            )
+
+        update_calendar_entries(event)
+        bump_versions([event_key(event_id)] + _pending_invite_keys(event_id))
+
         db.session.commit()
+        get_response_cache().invalidate('event_detail', event_id)
 
-        return jsonify({'message': 'Event updated successfully'}), 200
+        return (
+            jsonify({'message': 'Event updated successfully', 'conflicts': conflicts}),
+            200,
+        )
+    except InvalidRange as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error updating event: {str(e)}")
@@ -92,14 +199,26 @@ def delete_event(event_id):
         if not event or event.created_by != user_id:
             return jsonify({'error': 'Event not found or unauthorized'}), 404
 
+        bump_versions([event_key(event_id)] + _pending_invite_keys(event_id))
         EventParticipant.query.filter_by(event_id=event_id).delete()
         EventInvite.query.filter_by(event_id=event_id).delete()
+        remove_occurrence_exceptions(event_id)
+        remove_calendar_entries(event_id)
 
+        # まだ書き込まれていないメッセージが削除の後に INSERT されないよう先に捨てる
+        get_message_writer().discard_event(event_id)
         Message.query.filter_by(event_id=event_id).delete()
 
         db.session.delete(event)
         db.session.commit()
 
+        # チャットの参加キャッシュを破棄し、全インスタンスのルームを閉じる
+        get_response_cache().invalidate('event_detail', event_id)
+        get_chat_membership().remove_event(str(event_id))
+        get_chat_replay().discard(str(event_id))
+        get_presence().remove_room(str(event_id))
+        socketio.close_room(str(event_id))
+
         return jsonify({'message': 'Event deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -107,6 +226,46 @@ def delete_event(event_id):
         return jsonify({'error': str(e)}), 500
 
 
+@jwt_required()
+def update_occurrence(event_id):
+    # 繰り返しの予定の一回分を中止(cancelled)または時間変更する。
+    # DELETE では例外を取り消して規則どおりに戻す
+    try:
+        user_id = get_jwt_identity()
+        event = Event.query.get(event_id)
+
+        if not event or event.created_by != user_id:
+            return jsonify({'error': 'Event not found or unauthorized'}), 404
+
+        data = request.get_json(silent=True) or request.args
+        if not data.get('occurrence_start'):
+            return jsonify({'error': 'occurrence_start is required'}), 400
+        occurrence_start = parse_datetime(data['occurrence_start'], 'occurrence_start')
+
+        if request.method == 'DELETE':
+            if not remove_occurrence_exceptions(event_id, occurrence_start):
+                return jsonify({'error': 'Occurrence exception not found'}), 404
+        else:
+            starts_at, ends_at = _requested_times(data)
+            set_occurrence_exception(
+                event,
+                occurrence_start,
+                bool(data.get('cancelled')),
+                starts_at,
+                ends_at,
+            )
+        db.session.commit()
+
+        return jsonify({'message': 'Occurrence updated successfully'}), 200
+    except InvalidRange as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error updating occurrence: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
 @jwt_required()
 def get_participated_events():
     user_id = get_jwt_identity()
@@ -118,38 +277,102 @@ def get_participated_events():
     )
 
     try:
-        start_date = datetime(year, month, 1)
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1)
-        else:
-            end_date = datetime(year, month + 1, 1)
+        start_date, end_date = resolve_range({'year': year, 'month': month})
+        etag, not_modified = check_not_modified(
+            [user_key(user_id, 'calendar')], start_date, end_date
+        )
+        if not_modified:
+            return not_modified
 
-        logger.debug(f"Start date: {start_date}, End date: {end_date}")
+        events = fetch_calendar(user_id, start_date, end_date)
 
-        participated_events = (
-            db.session.query(Event)
-            .join(EventParticipant, Event.id == EventParticipant.event_id)
-            .filter(
-                (EventParticipant.user_id == user_id) | (Event.created_by == user_id)
-            )
-            .filter(Event.event_date >= start_date, Event.event_date < end_date)
-            .all()
+        logger.debug(f"Found {len(events)} events")
+
+        return tag_response(jsonify(events), etag), 200
+    except InvalidRange as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error fetching participated events: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@jwt_required()
+def get_calendar_events():
+    user_id = get_jwt_identity()
+
+    try:
+        start_date, end_date = resolve_range(request.args)
+        # 隣接月の再取得は内容が変わらなければ 304 で返す
+        etag, not_modified = check_not_modified(
+            [user_key(user_id, 'calendar')], start_date, end_date
         )
+        if not_modified:
+            return not_modified
 
-        logger.debug(f"Found {len(participated_events)} events")
+        events = fetch_calendar(user_id, start_date, end_date)
 
-        events = [
+        response = jsonify(
             {
-                'id': event.id,
-                'event_name': event.event_name,
-                'event_date': event.event_date.isoformat(),
+                'start': format_utc(start_date),
+                'end': format_utc(end_date),
+                'events': events,
             }
-            for event in participated_events
+        )
+        return tag_response(response, etag), 200
+    except InvalidRange as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error fetching calendar events: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@jwt_required()
+def get_free_slots():
+    user_id = get_jwt_identity()
+
+    try:
+        start_date, end_date = resolve_range(request.args)
+        min_minutes = request.args.get('min_minutes', 30, type=int)
+        day_start = request.args.get('day_start', 0, type=int)
+        day_end = request.args.get('day_end', 24, type=int)
+        if not 0 <= day_start < day_end <= 24:
+            return jsonify({'error': 'Invalid day_start or day_end'}), 400
+
+        requested = [
+            value for value in request.args.get('user_ids', '').split(',') if value
         ]
+        if len(requested) > current_app.config['SCHEDULE_MAX_USERS']:
+            return jsonify({'error': 'Too many users'}), 400
+
+        members, rejected = resolve_members(user_id, requested)
+        slots = get_availability_index().free_slots(
+            members,
+            start_date,
+            end_date,
+            min_minutes=min_minutes,
+            day_start=day_start,
+            day_end=day_end,
+        )
 
-        return jsonify(events), 200
+        return (
+            jsonify(
+                {
+                    'start': format_utc(start_date),
+                    'end': format_utc(end_date),
+                    'users': members,
+                    'rejected': rejected,
+                    'slots': [
+                        {'start': format_utc(start), 'end': format_utc(end)}
+                        for start, end in slots
+                    ],
+                }
+            ),
+            200,
+        )
+    except InvalidRange as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error fetching participated events: {str(e)}")
+        logger.error(f"Error finding free slots: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
@@ -166,14 +389,21 @@ def respond_to_event():
                 event_id=event_id, user_id=user_id
             ).first()
             if not existing_participant:
+                event = Event.query.get(event_id)
+                if not event:
+                    return jsonify({'error': 'Event not found'}), 404
                 participant = EventParticipant(event_id=event_id, user_id=user_id)
                 db.session.add(participant)
+                add_calendar_entries(event, [user_id])
 
         invite = EventInvite.query.filter_by(event_id=event_id, user_id=user_id).first()
         if invite:
             invite.status = response
 
+        bump_versions([event_key(event_id), user_key(user_id, 'invites')])
+
         db.session.commit()
+        get_response_cache().invalidate('event_detail', event_id)
 
         return jsonify({'message': 'Response recorded successfully.'}), 200
     except Exception as e:
@@ -190,95 +420,130 @@ def get_event_detail(event_id):
         if not event:
             return jsonify({'error': 'Event not found'}), 404
 
-        participant = EventParticipant.query.filter_by(
-            event_id=event_id, user_id=user_id
-        ).first()
-
-        invite = EventInvite.query.filter_by(
-            event_id=event_id, user_id=user_id, status='pending'
-        ).first()
-
-        if not participant and not invite:
+        if not _can_view_event(event_id, user_id):
             return jsonify({'error': 'このイベントにアクセスする権限がありません'}), 403
 
-        participants = (
-            db.session.query(User)
-            .join(EventParticipant, User.id == EventParticipant.user_id)
-            .filter(EventParticipant.event_id == event_id)
-            .all()
+        # メッセージの追加はバージョンを進めず、最新メッセージで見分ける
+        etag, not_modified = check_not_modified(
+            [event_key(event_id)], latest_message_marker(event_id)
         )
+        if not_modified:
+            return not_modified
 
-        invited_friends = (
-            db.session.query(User)
-            .join(EventInvite, User.id == EventInvite.user_id)
-            .filter(EventInvite.event_id == event_id, EventInvite.status == 'pending')
-            .all()
+        # 同じイベントを多数の参加者が見るため、組み立て済みの詳細をキャッシュする
+        event_detail = get_response_cache().get_or_load(
+            'event_detail', event_id, etag, lambda: _build_event_detail(event)
         )
 
-        messages = (
-            Message.query.filter_by(event_id=event_id)
-            .order_by(Message.timestamp.asc())
-            .all()
-        )
-        message_list = [
-            {
-                'id': m.id,
-                'user': m.user.username,
-                'message': m.message,
-                'timestamp': m.timestamp,
-            }
-            for m in messages
-        ]
+        return tag_response(jsonify(event_detail), etag), 200
+
+    except Exception as e:
+        logger.error(f"Error fetching event details: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-        participant_list = [{'id': p.id, 'username': p.username} for p in participants]
-        invited_friends_list = [
-            {'id': f.id, 'username': f.username} for f in invited_friends
-        ]
 
-        event_detail = {
-            'event_name': event.event_name,
-            'event_date': event.event_date.isoformat(),
-            'meeting_time': event.meeting_time,
-            'meeting_place': event.meeting_place,
-            'description': event.description,
-            'participants': participant_list,
-            'invited_friends': invited_friends_list,
-            'messages': message_list,
-            'created_by': event.created_by,
-        }
+def _build_event_detail(event):
+    event_id = event.id
+    participants = (
+        db.session.query(User)
+        .join(EventParticipant, User.id == EventParticipant.user_id)
+        .filter(EventParticipant.event_id == event_id)
+        .all()
+    )
+
+    invited_friends = (
+        db.session.query(User)
+        .join(EventInvite, User.id == EventInvite.user_id)
+        .filter(EventInvite.event_id == event_id, EventInvite.status == 'pending')
+        .all()
+    )
+
+    message_page = fetch_message_page(event_id)
+
+    participant_list = [{'id': p.id, 'username': p.username} for p in participants]
+    invited_friends_list = [
+        {'id': f.id, 'username': f.username} for f in invited_friends
+    ]
+
+    return {
+        'event_name': event.event_name,
+        'event_date': isoformat(event.event_date),
+        'meeting_time': event.meeting_time,
+        'starts_at': format_utc(event.starts_at),
+        'ends_at': format_utc(event.ends_at),
+        'recurrence_rule': event.recurrence_rule,
+        'meeting_place': event.meeting_place,
+        'description': event.description,
+        'participants': participant_list,
+        'invited_friends': invited_friends_list,
+        'messages': message_page['messages'],
+        'messages_cursor': message_page['next_cursor'],
+        'created_by': event.created_by,
+    }
+
 
-        return jsonify(event_detail), 200
+@jwt_required()
+def get_event_messages(event_id):
+    try:
+        user_id = get_jwt_identity()
+        if not _can_view_event(event_id, user_id):
+            return jsonify({'error': 'このイベントにアクセスする権限がありません'}), 403
 
+        message_page = fetch_message_page(
+            event_id,
+            before=request.args.get('before'),
+            limit=request.args.get('limit', type=int),
+        )
+        return jsonify(message_page), 200
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error fetching event details: {str(e)}")
+        logger.error(f"Error fetching event messages: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
+def _pending_invite_keys(event_id):
+    invitees = db.session.query(EventInvite.user_id).filter_by(
+        event_id=event_id, status='pending'
+    )
+    return [user_key(row.user_id, 'invites') for row in invitees]
+
+
+def _can_view_event(event_id, user_id):
+    participant = EventParticipant.query.filter_by(
+        event_id=event_id, user_id=user_id
+    ).first()
+    if participant:
+        return True
+
+    invite = EventInvite.query.filter_by(
+        event_id=event_id, user_id=user_id, status='pending'
+    ).first()
+    return invite is not None
+
+
 @jwt_required()
 def invite_more_friends(event_id):
     try:
         data = request.get_json()
-        invitee_ids = data.get('invitees', [])
-
-        existing_invites = EventInvite.query.filter(
-            EventInvite.event_id == event_id, EventInvite.user_id.in_(invitee_ids)
-        ).all()
-
-        already_invited_ids = {invite.user_id for invite in existing_invites}
+        user_id = get_jwt_identity()
 
-        new_invitees = [
-            invitee_id
-            for invitee_id in invitee_ids
-            if invitee_id not in already_invited_ids
-        ]
+        participant = EventParticipant.query.filter_by(
+            event_id=event_id, user_id=user_id
+        ).first()
+        if not participant:
+            return jsonify({'error': 'Event not found or unauthorized'}), 404
 
-        for invitee_id in new_invitees:
-            invite = EventInvite(event_id=event_id, user_id=invitee_id)
-            db.session.add(invite)
+        invites = invite_users(event_id, user_id, data.get('invitees', []))
 
         db.session.commit()
+        if invites['added']:
+            get_response_cache().invalidate('event_detail', event_id)
 
-        return jsonify({'message': 'Friends invited successfully.'}), 201
+        return (
+            jsonify({'message': 'Friends invited successfully.', 'invites': invites}),
+            201,
+        )
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error inviting friends: {str(e)}")
@@ -286,92 +551,180 @@ def invite_more_friends(event_id):
 
 
 @socketio.on('join_event_chat')
+@instrument_socket_event('join_event_chat')
 @jwt_required()
 def handle_join_event_chat(data):
     user_id = get_jwt_identity()
     event_id = data.get('event_id')
+    room = str(event_id)
+    membership = get_chat_membership()
 
     logger.info(f"User {user_id} is attempting to join chat for event {event_id}")
 
-    participant = EventParticipant.query.filter_by(
-        event_id=event_id, user_id=user_id
-    ).first()
+    member = membership.get_member(request.sid, user_id, room)
+    if member is None:
+        # 参加者の確認とユーザー名の取得を1クエリで行い、接続単位でキャッシュする
+        participant = (
+            db.session.query(User.username)
+            .join(EventParticipant, EventParticipant.user_id == User.id)
+            .filter(
+                EventParticipant.event_id == event_id,
+                EventParticipant.user_id == user_id,
+            )
+            .first()
+        )
+        if participant is None:
+            logger.warning(
+                f"Unauthorized attempt to join chat for event {event_id} by user {user_id}"
+            )
+            emit(
+                'error', {'message': 'Unauthorized to join this chat'}, room=request.sid
+            )
+            return
+        membership.join(request.sid, user_id, participant.username, room)
+        member = membership.get_member(request.sid, user_id, room)
 
-    if participant:
-        logger.info(f"User {user_id} successfully joined the chat for event {event_id}")
-        join_room(str(event_id))
-
-        # current_timestamp = datetime.now(ZoneInfo('UTC')).isoformat()
-
-        # emit(
-        #     'receive_message',
-        #     {
-        #         'message': f'{participant.user.username}が参加。',
-        #         'user': participant.user.username,
-        #         'timestamp': current_timestamp,
-        #     },
-        #     room=str(event_id),
-        # )
-        logger.info(f"Emitting join message for event {event_id} and user {user_id}")
+    try:
+        get_presence().join(request.sid, user_id, member['username'], room)
+    except TooManyRooms:
+        membership.leave(request.sid, room)
+        emit('error', {'message': 'Too many chat rooms joined'}, to=request.sid)
+        return
+
+    join_room(room)
+    logger.info(f"User {user_id} successfully joined the chat for event {event_id}")
+
+    # 再接続時は最後に受け取ったメッセージのカーソル以降だけを送る
+    if data.get('last_cursor'):
+        _replay_missed_messages(event_id, room, data['last_cursor'])
+
+
+def _replay_missed_messages(event_id, room, last_cursor):
+    # まずリングバッファから、さかのぼれなければ DB を範囲で読む。
+    # ルーム参加後に読むため取りこぼしはないが、ライブ配信と重複しうるので
+    # クライアントは id で重複を除く
+    try:
+        after = decode_cursor(last_cursor)
+    except InvalidCursor:
+        emit('error', {'message': 'Invalid cursor'}, to=request.sid)
+        return
+
+    limit = current_app.config['CHAT_REPLAY_MAX_MESSAGES']
+    messages = get_chat_replay().since(room, after)
+    if messages is not None:
+        source = 'buffer'
+        has_more = len(messages) > limit
+        messages = messages[:limit]
     else:
-        logger.warning(
-            f"Unauthorized attempt to join chat for event {event_id} by user {user_id}"
-        )
-        emit('error', {'message': 'Unauthorized to join this chat'}, room=request.sid)
+        source = 'database'
+        # write-behind のバッファに残っているメッセージも読めるよう先に書き込む
+        get_message_writer().flush()
+        messages, has_more = fetch_messages_after(event_id, after, limit)
+
+    emit(
+        'missed_messages',
+        {
+            'event_id': event_id,
+            'messages': messages,
+            'has_more': has_more,
+            'source': source,
+        },
+        to=request.sid,
+    )
+
+
+def _joined_room(data):
+    # 参加していないルームの枠は消費させない(拒否はハンドラー側で行う)
+    room = str(data.get('event_id'))
+    if get_chat_membership().get_member(request.sid, get_jwt_identity(), room):
+        return room
+    return None
 
 
 @socketio.on('send_message')
+@instrument_socket_event('send_message')
 @jwt_required()
+@socket_rate_limit('send_message')
+@socket_rate_limit('room_messages', key=_joined_room)
 def handle_send_message(data):
     user_id = get_jwt_identity()
     event_id = data.get('event_id')
     message_text = data.get('message')
+    room = str(event_id)
 
     logger.info(f"Received message from user {user_id}: {message_text}")
 
-    participant = EventParticipant.query.filter_by(
-        event_id=event_id, user_id=user_id
-    ).first()
-
-    if participant:
-        message_id = str(uuid.uuid4())
-        message = Message(
-            id=message_id,
-            event_id=event_id,
-            user_id=user_id,
-            message=message_text,
-            timestamp=datetime.now(ZoneInfo('UTC')),
-        )
-        try:
-            db.session.add(message)
-            db.session.commit()
-            logger.info(f"Message saved by user {user_id} to event {event_id}")
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Failed to save message: {str(e)}")
-            emit('error', {'error': 'Failed to save message'}, to=request.sid)
-            return
-
-        current_timestamp = datetime.now(ZoneInfo('UTC')).isoformat()
-        emit(
-            'receive_message',
-            {
-                'id': message.id,
-                'user': participant.user.username,
-                'message': message.message,
-                'timestamp': current_timestamp,
-            },
-            room=str(event_id),
-            include_self=True,
-        )
-    else:
+    # 他のインスタンスでイベントが削除された場合はルームごと閉じられるため、
+    # ルームへの所属も合わせて確認する
+    member = get_chat_membership().get_member(request.sid, user_id, room)
+    if member is None or room not in rooms():
         logger.warning(
             f"Unauthorized attempt to send a message in event {event_id} by user {user_id}"
         )
         emit('error', {'error': 'Unauthorized to send message'}, to=request.sid)
+        return
+
+    timestamp = datetime.now(ZoneInfo('UTC'))
+    message = {
+        'id': str(uuid.uuid4()),
+        'event_id': event_id,
+        'user_id': user_id,
+        'message': message_text,
+        'timestamp': timestamp,
+    }
+    try:
+        get_message_writer().write(message)
+        logger.info(f"Message saved by user {user_id} to event {event_id}")
+    except MessageBufferFull:
+        logger.warning(f"Message buffer full, rejecting message from {user_id}")
+        emit('error', {'error': 'Server is busy, please retry'}, to=request.sid)
+        return
+    except Exception as e:
+        logger.error(f"Failed to save message: {str(e)}")
+        emit('error', {'error': 'Failed to save message'}, to=request.sid)
+        return
+
+    get_response_cache().invalidate('event_detail', event_id)
+
+    # DB と同じ UTC の naive な時刻でカーソルを作る
+    key = (timestamp.replace(tzinfo=None), message['id'])
+    payload = {
+        'id': message['id'],
+        'user': member['username'],
+        'message': message['message'],
+        'timestamp': timestamp.isoformat(),
+        'cursor': encode_cursor(*key),
+    }
+    get_chat_replay().append(room, key, payload)
+
+    get_broadcaster().publish(room, payload)
+    get_presence().set_typing(request.sid, room, False)
+
+
+@socketio.on('typing')
+@instrument_socket_event('typing')
+@jwt_required()
+def handle_typing(data):
+    # 入力中の通知。DB は読まず、presence としてまとめて配信する
+    room = str(data.get('event_id'))
+    if not get_presence().set_typing(request.sid, room, bool(data.get('typing'))):
+        emit('error', {'error': 'Not in this chat'}, to=request.sid)
+
+
+@socketio.on('get_presence')
+@instrument_socket_event('get_presence')
+@jwt_required()
+def handle_get_presence(data):
+    user_id = get_jwt_identity()
+    room = str(data.get('event_id'))
+    if get_chat_membership().get_member(request.sid, user_id, room) is None:
+        emit('error', {'error': 'Not in this chat'}, to=request.sid)
+        return
+    emit('presence', get_presence().snapshot(room), to=request.sid)
 
 
 @socketio.on('leave_room')
+@instrument_socket_event('leave_room')
 @jwt_required()
 def handle_leave_room(data):
     user_id = get_jwt_identity()
@@ -380,4 +733,13 @@ def handle_leave_room(data):
     logger.info(f"User {user_id} is leaving chat for event {event_id}")
 
     leave_room(str(event_id))
+    get_chat_membership().leave(request.sid, str(event_id))
+    get_presence().leave(request.sid, str(event_id))
     logger.info(f"User {user_id} has left the chat for event {event_id}")
+
+
+@socketio.on('disconnect')
+@instrument_socket_event('disconnect')
+def handle_disconnect():
+    get_chat_membership().disconnect(request.sid)
+    get_presence().disconnect(request.sid)
@@ -1,9 +1,24 @@
 from flask import request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, FriendRequest, User
+from app.services.friendship_service import (
+    accept_friend_requests,
+    are_friends,
+    find_request_between,
+)
+from app.services.rate_limiter import rate_limit
+from app.services.response_cache import get_response_cache
+from app.services.resource_versions import (
+    bump_versions,
+    check_not_modified,
+    tag_response,
+    user_key,
+)
+from app.utils.serializers import serialize_rows
 
 
 @jwt_required()
+@rate_limit('send_friend_request')
 def send_friend_request():
     receiver_id = request.json.get('receiver_id')
     sender_id = get_jwt_identity()
@@ -11,15 +26,28 @@ def send_friend_request():
     if receiver_id == sender_id:
         return jsonify({'msg': '自分自身にリクエストを送ることはできません。'}), 400
 
-    existing_request = FriendRequest.query.filter_by(
-        sender_id=sender_id, receiver_id=receiver_id
-    ).first()
+    if db.session.query(User.id).filter_by(id=receiver_id).first() is None:
+        return jsonify({'message': 'User not found.'}), 404
 
-    if existing_request:
+    if are_friends(sender_id, receiver_id):
+        return jsonify({'message': 'Already friends.'}), 400
+
+    existing_requests = find_request_between(sender_id, receiver_id)
+    crossed = [
+        r
+        for r in existing_requests
+        if r.sender_id == receiver_id and r.status == 'pending'
+    ]
+    if crossed:
+        # 相手からの保留中リクエストがあれば、送信せずにそのまま承認する
+        return _accept([r.id for r in crossed], sender_id)
+
+    if any(r.sender_id == sender_id for r in existing_requests):
         return jsonify({'message': 'Friend request already sent.'}), 400
 
     friend_request = FriendRequest(sender_id=sender_id, receiver_id=receiver_id)
     db.session.add(friend_request)
+    bump_versions([user_key(receiver_id, 'friend_requests')])
     db.session.commit()
 
     return jsonify({'message': 'リクエストを送りました。'}), 201
@@ -28,19 +56,20 @@ def send_friend_request():
 @jwt_required()
 def get_friend_requests():
     user_id = get_jwt_identity()
-    friend_requests = FriendRequest.query.filter_by(
-        receiver_id=user_id, status='pending'
-    ).all()
-    return jsonify(
-        [
-            {
-                'id': req.id,
-                'sender_id': req.sender_id,
-                'sender_username': req.sender.username,
-            }
-            for req in friend_requests
-        ]
+    etag, not_modified = check_not_modified([user_key(user_id, 'friend_requests')])
+    if not_modified:
+        return not_modified
+
+    friend_requests = (
+        db.session.query(
+            FriendRequest.id.label('id'),
+            FriendRequest.sender_id.label('sender_id'),
+            User.username.label('sender_username'),
+        )
+        .join(User, User.id == FriendRequest.sender_id)
+        .filter(FriendRequest.receiver_id == user_id, FriendRequest.status == 'pending')
     )
+    return tag_response(jsonify(serialize_rows(friend_requests)), etag)
 
 
 @jwt_required()
@@ -53,30 +82,32 @@ def respond_to_friend_request(request_id):
         return jsonify({'message': 'Invalid request.'}), 400
 
     if action == 'accept':
-        friend_request.status = 'accepted'
-        sender = User.query.get(friend_request.sender_id)
-        receiver = User.query.get(friend_request.receiver_id)
-
-        if receiver not in sender.friends:
-            sender.friends.append(receiver)
-        if sender not in receiver.friends:
-            receiver.friends.append(sender)
-
-        db.session.commit()
-
-        return (
-            jsonify(
-                {
-                    'message': 'Request accepted.',
-                    'friend': {'id': sender.id, 'username': sender.username},
-                }
-            ),
-            200,
-        )
+        return _accept([request_id], user_id)
     elif action == 'reject':
         db.session.delete(friend_request)
+        bump_versions([user_key(user_id, 'friend_requests')])
     else:
         return jsonify({'message': 'Invalid action.'}), 400
 
     db.session.commit()
     return jsonify({'message': f'Request {action}ed.'})
+
+
+@jwt_required()
+def accept_all_friend_requests():
+    return _accept(None, get_jwt_identity())
+
+
+def _accept(request_ids, user_id):
+    accepted = accept_friend_requests(user_id, request_ids)
+    if request_ids is not None and not accepted:
+        return jsonify({'message': 'Invalid request.'}), 400
+    db.session.commit()
+
+    get_response_cache().invalidate(
+        'friends', user_id, *[friend['id'] for friend in accepted]
+    )
+
+    if request_ids is None:
+        return jsonify({'message': 'Requests accepted.', 'accepted': accepted}), 200
+    return jsonify({'message': 'Request accepted.', 'friend': accepted[0]}), 200
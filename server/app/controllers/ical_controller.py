@@ -0,0 +1,116 @@
+import logging
+from flask import current_app, request, jsonify, stream_with_context, url_for
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models import db
+from app.services.ical_service import (
+    InvalidCalendar,
+    find_feed_user,
+    import_batch,
+    iter_feed,
+    parse_calendar,
+    revoke_feed_token,
+    rotate_feed_token,
+)
+from app.services.resource_versions import check_not_modified, tag_response, user_key
+
+logger = logging.getLogger(__name__)
+
+
+@jwt_required()
+def create_calendar_feed():
+    # フィード URL を発行する。再発行すると以前の URL は無効になる
+    try:
+        user_id = get_jwt_identity()
+        token = rotate_feed_token(user_id)
+        db.session.commit()
+
+        url = url_for('event_bp.get_calendar_feed', token=token, _external=True)
+        return jsonify({'url': url}), 201
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error creating calendar feed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@jwt_required()
+def delete_calendar_feed():
+    try:
+        user_id = get_jwt_identity()
+        if not revoke_feed_token(user_id):
+            return jsonify({'error': 'Calendar feed not found'}), 404
+        db.session.commit()
+
+        return jsonify({'message': 'Calendar feed deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error deleting calendar feed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+def get_calendar_feed(token):
+    # カレンダーアプリがポーリングする。トークンで認証し、変更がなければ 304 を返す
+    try:
+        user_id = find_feed_user(token)
+        if user_id is None:
+            return jsonify({'error': 'Calendar feed not found'}), 404
+
+        etag, not_modified = check_not_modified([user_key(user_id, 'calendar')], 'ics')
+        if not_modified:
+            return not_modified
+
+        response = current_app.response_class(
+            stream_with_context(
+                iter_feed(user_id, current_app.config['ICS_FEED_PAGE_SIZE'])
+            ),
+            mimetype='text/calendar',
+        )
+        response.headers['Content-Disposition'] = 'inline; filename="calendar.ics"'
+        response.cache_control.private = True
+        response.cache_control.max_age = current_app.config['ICS_FEED_MAX_AGE']
+        return tag_response(response, etag)
+    except Exception as e:
+        logger.error(f"Error fetching calendar feed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@jwt_required()
+def import_calendar():
+    # ICS ファイル(multipart の file、または本文)から予定を取り込む。
+    # invitees を指定すると取り込んだすべての予定にそのフレンドを招待する
+    user_id = get_jwt_identity()
+    upload = request.files.get('file')
+    try:
+        text = (upload.read() if upload else request.get_data()).decode('utf-8-sig')
+        items = parse_calendar(text, current_app.config['APP_TIMEZONE'])
+    except (UnicodeDecodeError, InvalidCalendar) as e:
+        return jsonify({'error': f'Invalid calendar: {str(e)}'}), 400
+
+    max_events = current_app.config['ICS_IMPORT_MAX_EVENTS']
+    if len(items) > max_events:
+        return jsonify({'error': f'Cannot import more than {max_events} events'}), 400
+
+    invitees = [
+        invitee for invitee in request.values.get('invitees', '').split(',') if invitee
+    ]
+    batch_size = current_app.config['ICS_IMPORT_BATCH_SIZE']
+    result = {
+        'created': [],
+        'skipped': [],
+        'errors': [],
+        'invites': {'added': [], 'rejected': []},
+    }
+    try:
+        # バッチごとにコミットする。UID で重複を除くため、失敗しても再実行できる
+        for start in range(0, len(items), batch_size):
+            batch = import_batch(user_id, items[start : start + batch_size], invitees)
+            db.session.commit()
+            for key in ('created', 'skipped', 'errors'):
+                result[key] += batch[key]
+            if batch['invites']['added'] or batch['invites']['rejected']:
+                result['invites'] = batch['invites']
+
+        return jsonify(result), 201
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error importing calendar: {str(e)}")
+        return jsonify({'error': str(e), **result}), 500
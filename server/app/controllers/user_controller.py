@@ -3,69 +3,93 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.user_model import User
 from app.models.event_model import EventInvite, Event
+from app.services.resource_versions import (
+    check_not_modified,
+    tag_response,
+    user_key,
+)
+from app.services.friend_graph import get_friend_graph, suggest_friends
+from app.services.response_cache import get_response_cache
+from app.services.user_search import search_users_by_name
+from app.services.rate_limiter import rate_limit
+from app.utils.serializers import isoformat, serialize_rows
 
 
 @jwt_required()
+@rate_limit('search_users')
 def search_users():
-    query = request.args.get('query', '')
+    query = request.args.get('query', '').strip()
     current_user_id = get_jwt_identity()
 
     if not query:
         return jsonify([])
 
-    current_user = User.query.get(current_user_id)
+    results = search_users_by_name(
+        query, current_user_id, limit=request.args.get('limit', type=int)
+    )
 
-    results = User.query.filter(User.username.ilike(f'%{query}%')).all()
+    mutual_counts = get_friend_graph().mutual_counts(
+        current_user_id, [user['id'] for user in results]
+    )
+    for user in results:
+        user['mutual_friends'] = mutual_counts[user['id']]
 
-    filtered_results = [
-        user
-        for user in results
-        if user.id != current_user_id and user not in current_user.friends
-    ]
+    return jsonify(results)
 
-    return jsonify(
-        [{'id': user.id, 'username': user.username} for user in filtered_results]
-    )
+
+@jwt_required()
+def get_friend_suggestions():
+    user_id = get_jwt_identity()
+    suggestions = suggest_friends(user_id, limit=request.args.get('limit', type=int))
+    return jsonify(suggestions), 200
 
 
 @jwt_required()
 def get_friends():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    etag, not_modified = check_not_modified([user_key(user_id, 'friends')])
+    if not_modified:
+        return not_modified
 
-    if not user:
+    friends_list = get_response_cache().get_or_load(
+        'friends', user_id, etag, lambda: _load_friends(user_id)
+    )
+    if friends_list is None:
         return jsonify({'message': 'User not found'}), 404
 
-    friends = user.friends.all()
-    friends_list = [
-        {'id': friend.id, 'username': friend.username} for friend in friends
-    ]
+    return tag_response(jsonify(friends_list), etag), 200
 
-    return jsonify(friends_list), 200
+
+def _load_friends(user_id):
+    user = User.query.get(user_id)
+    if not user:
+        return None
+
+    return [{'id': friend.id, 'username': friend.username} for friend in user.friends]
 
 
 @jwt_required()
 def get_event_invites():
     user_id = get_jwt_identity()
+    etag, not_modified = check_not_modified([user_key(user_id, 'invites')])
+    if not_modified:
+        return not_modified
 
     invites = (
-        db.session.query(EventInvite)
+        db.session.query(
+            Event.id.label('id'),
+            Event.event_name.label('event_name'),
+            Event.event_date.label('event_date'),
+            Event.meeting_time.label('meeting_time'),
+            Event.meeting_place.label('meeting_place'),
+            Event.description.label('description'),
+            User.username.label('invited_by'),
+        )
+        .select_from(EventInvite)
         .join(Event, Event.id == EventInvite.event_id)
         .join(User, User.id == Event.created_by)
         .filter(EventInvite.user_id == user_id, EventInvite.status == 'pending')
-        .all()
     )
-    invites_list = [
-        {
-            'id': invite.event.id,
-            'event_name': invite.event.event_name,
-            'event_date': invite.event.event_date.isoformat(),
-            'meeting_time': invite.event.meeting_time,
-            'meeting_place': invite.event.meeting_place,
-            'description': invite.event.description,
-            'invited_by': invite.event.creator.username,
-        }
-        for invite in invites
-    ]
-
-    return jsonify(invites_list), 200
+    invites_list = serialize_rows(invites, {'event_date': isoformat})
+
+    return tag_response(jsonify(invites_list), etag), 200
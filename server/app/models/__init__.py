@@ -1,8 +1,16 @@
 from .. import db
 from .user_model import User
 from .friend_request_model import FriendRequest
-from .event_model import Event, EventInvite, EventParticipant
+from .event_model import (
+    Event,
+    EventInvite,
+    EventOccurrenceException,
+    EventParticipant,
+)
 from .message_model import Message
+from .revoked_token_model import RevokedToken
+from .calendar_model import CalendarFeedToken, UserCalendarEntry
+from .resource_version_model import ResourceVersion
 
 __all__ = [
     'db',
@@ -10,6 +18,11 @@ __all__ = [
     'FriendRequest',
     'Event',
     'EventInvite',
+    'EventOccurrenceException',
     'EventParticipant',
     'Message',
+    'RevokedToken',
+    'UserCalendarEntry',
+    'CalendarFeedToken',
+    'ResourceVersion',
 ]
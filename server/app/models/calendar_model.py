@@ -0,0 +1,27 @@
+from .. import db
+
+
+class UserCalendarEntry(db.Model):
+    # ユーザーごとのカレンダー表示用の非正規化テーブル(参加・作成したイベント)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    event_name = db.Column(db.String(100), nullable=False)
+    event_date = db.Column(db.DateTime, nullable=True)
+    starts_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    ends_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    recurrence_rule = db.Column(db.String(200), nullable=True)
+    series_ends_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        db.PrimaryKeyConstraint('user_id', 'event_id', name='pk_user_calendar_entry'),
+        db.Index('ix_user_calendar_entry_user_id_event_date', 'user_id', 'event_date'),
+        db.Index('ix_user_calendar_entry_event_id', 'event_id'),
+        db.Index('ix_user_calendar_entry_user_id_starts_at', 'user_id', 'starts_at'),
+    )
+
+
+class CalendarFeedToken(db.Model):
+    # ICS フィード URL のトークン。URL だけで読めるため、ハッシュのみを保存する
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False)
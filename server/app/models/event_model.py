@@ -1,24 +1,55 @@
 from .. import db
-from datetime import datetime, timezone, timedelta
-
-
-jst = timezone(timedelta(hours=9))
+from datetime import datetime, timezone
 
 
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     event_name = db.Column(db.String(100), nullable=False)
     event_date = db.Column(db.DateTime, nullable=True)
+    # 表示用の自由入力。範囲検索・重なりの判定には starts_at/ends_at を使う
     meeting_time = db.Column(db.String(50), nullable=True)
+    starts_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    ends_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    # 繰り返しの予定は starts_at/ends_at を初回とし、各回は取得時に展開する。
+    # series_ends_at は最後の回の終了(無期限なら NULL)
+    recurrence_rule = db.Column(db.String(200), nullable=True)
+    series_ends_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    # ICS から取り込んだ予定の UID。同じファイルの再取り込みで重複させない
+    ical_uid = db.Column(db.String(255), nullable=True)
     meeting_place = db.Column(db.String(100), nullable=True)
     description = db.Column(db.Text, nullable=True)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(jst))
+    created_at = db.Column(
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (
+        db.Index('ix_event_created_by_event_date', 'created_by', 'event_date'),
+        db.Index('ix_event_starts_at_ends_at', 'starts_at', 'ends_at'),
+        db.UniqueConstraint(
+            'created_by', 'ical_uid', name='unique_event_creator_ical_uid'
+        ),
+    )
 
     creator = db.relationship('User', backref='created_events')
     invites = db.relationship('EventInvite', backref='event', lazy=True)
 
 
+class EventOccurrenceException(db.Model):
+    # 繰り返しの予定の特定の回(元の開始時刻で識別)の中止・時間変更
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    occurrence_start = db.Column(db.DateTime(timezone=True), nullable=False)
+    cancelled = db.Column(db.Boolean, nullable=False, default=False)
+    starts_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    ends_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        db.PrimaryKeyConstraint(
+            'event_id', 'occurrence_start', name='pk_event_occurrence_exception'
+        ),
+    )
+
+
 class EventInvite(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
@@ -27,6 +58,7 @@ class EventInvite(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint('event_id', 'user_id', name='unique_event_user_invite'),
+        db.Index('ix_event_invite_user_id_status', 'user_id', 'status'),
     )
 
     user = db.relationship('User', backref='event_invites')
@@ -37,5 +69,10 @@ class EventParticipant(db.Model):
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    __table_args__ = (
+        db.UniqueConstraint('event_id', 'user_id', name='unique_event_participant'),
+        db.Index('ix_event_participant_user_id', 'user_id'),
+    )
+
     event = db.relationship('Event', backref='participants')
     user = db.relationship('User', backref='participated_events')
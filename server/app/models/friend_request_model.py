@@ -7,6 +7,11 @@ class FriendRequest(db.Model):
     receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     status = db.Column(db.String(20), nullable=False, default='pending')
 
+    __table_args__ = (
+        db.Index('ix_friend_request_receiver_id_status', 'receiver_id', 'status'),
+        db.Index('ix_friend_request_sender_id_receiver_id', 'sender_id', 'receiver_id'),
+    )
+
     sender = db.relationship('User', foreign_keys=[sender_id], backref='sent_requests')
     receiver = db.relationship(
         'User', foreign_keys=[receiver_id], backref='received_requests'
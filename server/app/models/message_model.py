@@ -9,5 +9,9 @@ class Message(db.Model):
     message = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.now)
 
+    __table_args__ = (
+        db.Index('ix_message_event_id_timestamp', 'event_id', 'timestamp', 'id'),
+    )
+
     event = db.relationship('Event', backref='messages')
     user = db.relationship('User', backref='messages')
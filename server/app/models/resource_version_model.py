@@ -0,0 +1,10 @@
+from .. import db
+
+
+class ResourceVersion(db.Model):
+    # 読み取りAPIの ETag 用の更新カウンタ。'event:1' や 'user:1:friends' などのキー
+    key = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ResourceVersion {self.key}={self.version}>'
@@ -0,0 +1,9 @@
+from .. import db
+
+
+class RevokedToken(db.Model):
+    jti = db.Column(db.String(36), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
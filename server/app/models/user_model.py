@@ -1,11 +1,13 @@
 from .. import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from ..services.password_hasher import get_password_hasher
 
 
 friends_association_table = db.Table(
     'friends',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id')),
     db.Column('friend_id', db.Integer, db.ForeignKey('user.id')),
+    db.UniqueConstraint('user_id', 'friend_id', name='unique_friends_pair'),
+    db.Index('ix_friends_friend_id', 'friend_id'),
 )
 
 
@@ -13,7 +15,16 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+
+    __table_args__ = (
+        db.Index(
+            'ix_user_username_trgm',
+            'username',
+            postgresql_using='gin',
+            postgresql_ops={'username': 'gin_trgm_ops'},
+        ),
+    )
 
     friends = db.relationship(
         'User',
@@ -25,10 +36,13 @@ class User(db.Model):
     )
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = get_password_hasher().hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return get_password_hasher().verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return get_password_hasher().needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f'<User {self.username}>'
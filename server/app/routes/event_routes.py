@@ -3,19 +3,38 @@ from app.controllers.event_controller import (
     create_event,
     update_event,
     delete_event,
+    update_occurrence,
     get_participated_events,
+    get_calendar_events,
+    get_free_slots,
     respond_to_event,
     get_event_detail,
+    get_event_messages,
     invite_more_friends,
 )
-
+from app.controllers.ical_controller import (
+    create_calendar_feed,
+    delete_calendar_feed,
+    get_calendar_feed,
+    import_calendar,
+)
 
 event_bp = Blueprint('event_bp', __name__)
 
 event_bp.route('/create', methods=['POST'])(create_event)
 event_bp.route('/<int:event_id>/update', methods=['PUT'])(update_event)
 event_bp.route('/<int:event_id>/delete', methods=['DELETE'])(delete_event)
+event_bp.route('/<int:event_id>/occurrence', methods=['POST', 'DELETE'])(
+    update_occurrence
+)
 event_bp.route('/user/participated-events', methods=['GET'])(get_participated_events)
+event_bp.route('/user/calendar', methods=['GET'])(get_calendar_events)
+event_bp.route('/availability', methods=['GET'])(get_free_slots)
 event_bp.route('/respond', methods=['POST'])(respond_to_event)
 event_bp.route('/<int:event_id>/detail', methods=['GET'])(get_event_detail)
+event_bp.route('/<int:event_id>/messages', methods=['GET'])(get_event_messages)
 event_bp.route('/<int:event_id>/invite', methods=['POST'])(invite_more_friends)
+event_bp.route('/user/calendar-feed', methods=['POST'])(create_calendar_feed)
+event_bp.route('/user/calendar-feed', methods=['DELETE'])(delete_calendar_feed)
+event_bp.route('/calendar/<token>.ics', methods=['GET'])(get_calendar_feed)
+event_bp.route('/import', methods=['POST'])(import_calendar)
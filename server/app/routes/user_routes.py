@@ -1,5 +1,10 @@
 from flask import Blueprint
-from app.controllers.user_controller import search_users, get_friends, get_event_invites
+from app.controllers.user_controller import (
+    search_users,
+    get_friends,
+    get_event_invites,
+    get_friend_suggestions,
+)
 
 user_bp = Blueprint('user_bp', __name__)
 
@@ -7,3 +12,4 @@ user_bp = Blueprint('user_bp', __name__)
 user_bp.route('/search', methods=['GET'])(search_users)
 user_bp.route('/friends', methods=['GET'])(get_friends)
 user_bp.route('/event-invites', methods=['GET'])(get_event_invites)
+user_bp.route('/friend-suggestions', methods=['GET'])(get_friend_suggestions)
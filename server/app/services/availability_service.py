@@ -0,0 +1,200 @@
+import heapq
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+
+from app.models import db, UserCalendarEntry
+from app.models.user_model import friends_association_table
+from app.services.calendar_service import load_exceptions
+from app.services.invite_service import normalize_ids
+from app.services.resource_versions import get_versions, user_key
+from app.utils.recurrence import occurrences, parse_rule
+from app.utils.time_utils import to_utc_naive, utc_naive
+
+
+def merge_intervals(intervals):
+    # 開始順に並んだ区間を重なり・接する区間ごとにまとめる
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+class _UserIntervals:
+    __slots__ = ('version', 'starts', 'ends', 'series', 'tz_name')
+
+    def __init__(self, version, intervals, series=(), tz_name=None):
+        self.version = version
+        self.starts = [start for start, _ in intervals]
+        self.ends = [end for _, end in intervals]
+        # 繰り返しの予定は (rule, 初回の開始, 初回の終了, 例外) のまま持ち、
+        # 問い合わせの範囲内だけを展開する
+        self.series = series
+        self.tz_name = tz_name
+
+    def window(self, start, end):
+        if not self.series:
+            yield from self._fixed_window(start, end)
+            return
+        expanded = [
+            (occurrence_start, occurrence_end)
+            for rule, starts_at, ends_at, exceptions in self.series
+            for _, occurrence_start, occurrence_end in occurrences(
+                rule, starts_at, ends_at, start, end, self.tz_name, exceptions
+            )
+        ]
+        yield from merge_intervals(
+            sorted(expanded + list(self._fixed_window(start, end)))
+        )
+
+    def _fixed_window(self, start, end):
+        # 区間は互いに重ならないため、終了時刻でも昇順に並んでいる
+        i = bisect_right(self.ends, start)
+        while i < len(self.starts) and self.starts[i] < end:
+            yield self.starts[i], self.ends[i]
+            i += 1
+
+
+class AvailabilityIndex:
+    # ユーザーごとの予定を、まとめ済みのソートされた区間として保持する。
+    # 'user:<id>:calendar' のバージョンが変わったユーザーだけを読み直す
+    def __init__(self, tz_name):
+        self.tz_name = tz_name
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def busy(self, user_ids):
+        versions = get_versions([user_key(user_id, 'calendar') for user_id in user_ids])
+        with self._lock:
+            cached = {user_id: self._users.get(user_id) for user_id in user_ids}
+        stale = [
+            user_id
+            for user_id, entry in cached.items()
+            if entry is None or entry.version != versions[user_key(user_id, 'calendar')]
+        ]
+
+        if stale:
+            loaded = self._load(stale)
+            with self._lock:
+                for user_id in stale:
+                    entry = _UserIntervals(
+                        versions[user_key(user_id, 'calendar')],
+                        *loaded[user_id],
+                        tz_name=self.tz_name,
+                    )
+                    self._users[user_id] = cached[user_id] = entry
+        return cached
+
+    def _load(self, user_ids):
+        rows = (
+            db.session.query(
+                UserCalendarEntry.user_id,
+                UserCalendarEntry.event_id,
+                UserCalendarEntry.starts_at,
+                UserCalendarEntry.ends_at,
+                UserCalendarEntry.recurrence_rule,
+            )
+            .filter(
+                UserCalendarEntry.user_id.in_(user_ids),
+                UserCalendarEntry.starts_at.isnot(None),
+            )
+            .all()
+        )
+        exceptions = load_exceptions(
+            {row.event_id for row in rows if row.recurrence_rule}
+        )
+        intervals = defaultdict(list)
+        series = defaultdict(list)
+        for row in rows:
+            starts_at, ends_at = utc_naive(row.starts_at), utc_naive(row.ends_at)
+            if row.recurrence_rule:
+                series[row.user_id].append(
+                    (
+                        parse_rule(row.recurrence_rule, self.tz_name),
+                        starts_at,
+                        ends_at,
+                        exceptions.get(row.event_id),
+                    )
+                )
+            else:
+                intervals[row.user_id].append((starts_at, ends_at))
+        return {
+            user_id: (merge_intervals(sorted(intervals[user_id])), series[user_id])
+            for user_id in user_ids
+        }
+
+    def free_slots(self, user_ids, start, end, min_minutes=30, day_start=0, day_end=24):
+        users = self.busy(user_ids)
+        busy = merge_intervals(
+            heapq.merge(*(entry.window(start, end) for entry in users.values()))
+        )
+
+        slots = []
+        cursor = start
+        for busy_start, busy_end in busy + [(end, end)]:
+            if busy_start > cursor:
+                slots += self._clip_to_day(
+                    cursor, min(busy_start, end), day_start, day_end
+                )
+            cursor = max(cursor, busy_end)
+            if cursor >= end:
+                break
+
+        minimum = timedelta(minutes=min_minutes)
+        return [(s, e) for s, e in slots if e - s >= minimum]
+
+    def _clip_to_day(self, start, end, day_start, day_end):
+        # 現地時刻で day_start〜day_end 時の範囲に空き時間を制限する
+        if day_start == 0 and day_end == 24:
+            return [(start, end)]
+
+        tz = ZoneInfo(self.tz_name)
+        day = start.replace(tzinfo=timezone.utc).astimezone(tz).date()
+        last_day = end.replace(tzinfo=timezone.utc).astimezone(tz).date()
+        clipped = []
+        while day <= last_day:
+            window_start = to_utc_naive(datetime.combine(day, time(day_start), tz))
+            window_end = to_utc_naive(
+                datetime.combine(day, time(0), tz) + timedelta(hours=day_end)
+            )
+            s, e = max(start, window_start), min(end, window_end)
+            if s < e:
+                clipped.append((s, e))
+            day += timedelta(days=1)
+        return clipped
+
+
+def get_availability_index():
+    index = current_app.extensions.get('availability_index')
+    if index is None:
+        index = current_app.extensions['availability_index'] = AvailabilityIndex(
+            current_app.config['APP_TIMEZONE']
+        )
+    return index
+
+
+def resolve_members(user_id, requested_ids):
+    # 予定を見られるのは自分とフレンドのみ。それ以外は rejected で返す
+    requested, rejected = normalize_ids(requested_ids)
+    friends = friends_association_table.c
+    friend_ids = {
+        row.friend_id
+        for row in db.session.query(friends.friend_id).filter(
+            friends.user_id == user_id, friends.friend_id.in_(requested)
+        )
+    }
+    members = [user_id]
+    for requested_id in requested:
+        if requested_id in friend_ids:
+            members.append(requested_id)
+        elif requested_id != user_id:
+            rejected.append(requested_id)
+    return members, rejected
@@ -0,0 +1,79 @@
+import logging
+import threading
+
+from flask import current_app
+
+from app import socketio
+
+logger = logging.getLogger(__name__)
+
+
+class ImmediateBroadcaster:
+    # 1メッセージごとに receive_message を送る従来の動作
+    def publish(self, room, payload):
+        socketio.emit('receive_message', payload, to=room)
+
+    def flush(self, room=None):
+        return 0
+
+
+class CoalescingBroadcaster:
+    # ルームごとに window 秒の間に届いたメッセージをまとめ、receive_messages
+    # として1フレームで送る。max_batch 件たまった時点でも送る。
+    # 送信は1つのロックで直列化するため、同じルームのバッチは受け付け順に届く
+    def __init__(self, window=0.05, max_batch=50):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._emit_lock = threading.Lock()
+
+    def publish(self, room, payload):
+        with self._lock:
+            pending = self._pending.setdefault(room, [])
+            pending.append(payload)
+            count = len(pending)
+
+        if count >= self.max_batch:
+            self.flush(room)
+        elif count == 1:
+            socketio.start_background_task(self._flush_later, room)
+
+    def flush(self, room=None):
+        with self._emit_lock:
+            with self._lock:
+                rooms = list(self._pending) if room is None else [room]
+                batches = [
+                    (r, self._pending.pop(r)) for r in rooms if self._pending.get(r)
+                ]
+            for r, messages in batches:
+                socketio.emit(
+                    'receive_messages', {'event_id': r, 'messages': messages}, to=r
+                )
+        return sum(len(messages) for _, messages in batches)
+
+    def _flush_later(self, room):
+        socketio.sleep(self.window)
+        try:
+            self.flush(room)
+        except Exception as e:
+            logger.error(f"Failed to broadcast messages to room {room}: {str(e)}")
+
+
+def init_broadcaster(app):
+    mode = app.config['CHAT_BROADCAST_MODE']
+    if mode == 'immediate':
+        broadcaster = ImmediateBroadcaster()
+    elif mode == 'coalesce':
+        broadcaster = CoalescingBroadcaster(
+            window=app.config['CHAT_BROADCAST_WINDOW_MS'] / 1000,
+            max_batch=app.config['CHAT_BROADCAST_MAX_BATCH'],
+        )
+    else:
+        raise ValueError(f'Unknown chat broadcast mode: {mode}')
+
+    app.extensions['chat_broadcaster'] = broadcaster
+
+
+def get_broadcaster():
+    return current_app.extensions['chat_broadcaster']
@@ -0,0 +1,362 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from app import db
+from app.models import EventOccurrenceException, UserCalendarEntry
+from app.services.resource_versions import bump_versions, user_key
+from app.utils.db_utils import insert_ignore
+from app.utils.recurrence import (
+    InvalidRecurrence,
+    format_rule,
+    is_occurrence,
+    occurrences,
+    parse_rule,
+    series_end,
+)
+from app.utils.serializers import isoformat
+from app.utils.time_utils import (
+    as_utc,
+    event_interval,
+    format_utc,
+    local_to_utc_naive,
+    utc_naive,
+)
+
+
+class InvalidRange(ValueError):
+    pass
+
+
+def apply_event_times(event, starts_at=None, ends_at=None):
+    # 開始・終了が指定されなければ event_date と meeting_time から求める
+    if starts_at is None:
+        interval = event_interval(
+            event.event_date,
+            event.meeting_time,
+            current_app.config['APP_TIMEZONE'],
+            current_app.config['SCHEDULE_DEFAULT_EVENT_MINUTES'],
+        )
+        starts_at, ends_at = interval if interval else (None, None)
+    elif ends_at is None:
+        ends_at = starts_at + timedelta(
+            minutes=current_app.config['SCHEDULE_DEFAULT_EVENT_MINUTES']
+        )
+    if starts_at is not None and ends_at <= starts_at:
+        raise InvalidRange('ends_at must be after starts_at')
+    event.starts_at = as_utc(starts_at)
+    event.ends_at = as_utc(ends_at)
+    if event.event_date is None and starts_at is not None:
+        # starts_at だけで作られた予定にも、一覧の表示に使う日付を持たせる
+        event.event_date = _occurrence_date(
+            starts_at, current_app.config['APP_TIMEZONE']
+        )
+
+
+def apply_recurrence(event, value):
+    # 繰り返しのルールを検証・正規化し、シリーズの終了時刻を求める
+    if not value:
+        event.recurrence_rule = None
+        event.series_ends_at = None
+        return
+    if event.starts_at is None:
+        raise InvalidRange('Recurring events need a start time')
+    tz_name = current_app.config['APP_TIMEZONE']
+    try:
+        rule = parse_rule(value, tz_name)
+    except InvalidRecurrence as e:
+        raise InvalidRange(str(e))
+    event.recurrence_rule = format_rule(rule)
+    event.series_ends_at = as_utc(
+        series_end(rule, utc_naive(event.starts_at), utc_naive(event.ends_at), tz_name)
+    )
+
+
+def _entry_row(event, user_id):
+    return {
+        'user_id': user_id,
+        'event_id': event.id,
+        'event_name': event.event_name,
+        'event_date': event.event_date,
+        'starts_at': event.starts_at,
+        'ends_at': event.ends_at,
+        'recurrence_rule': event.recurrence_rule,
+        'series_ends_at': event.series_ends_at,
+    }
+
+
+def _insert_entries(rows):
+    if rows:
+        db.session.execute(
+            insert_ignore(UserCalendarEntry.__table__, 'pk_user_calendar_entry'), rows
+        )
+        bump_versions(user_key(row['user_id'], 'calendar') for row in rows)
+
+
+def add_calendar_entries(event, user_ids):
+    # 参加・作成したユーザーのカレンダーにイベントを載せる(重複は無視)
+    _insert_entries([_entry_row(event, user_id) for user_id in set(user_ids)])
+
+
+def add_event_calendar_entries(events, user_id):
+    # 複数のイベントを一人のカレンダーにまとめて載せる(ICS の取り込み)
+    _insert_entries([_entry_row(event, user_id) for event in events])
+
+
+def _bump_calendar_users(event_id):
+    user_ids = db.session.query(UserCalendarEntry.user_id).filter_by(event_id=event_id)
+    bump_versions(user_key(row.user_id, 'calendar') for row in user_ids)
+
+
+def update_calendar_entries(event):
+    _bump_calendar_users(event.id)
+    UserCalendarEntry.query.filter_by(event_id=event.id).update(
+        {
+            'event_name': event.event_name,
+            'event_date': event.event_date,
+            'starts_at': event.starts_at,
+            'ends_at': event.ends_at,
+            'recurrence_rule': event.recurrence_rule,
+            'series_ends_at': event.series_ends_at,
+        },
+        synchronize_session=False,
+    )
+
+
+def remove_calendar_entries(event_id):
+    _bump_calendar_users(event_id)
+    UserCalendarEntry.query.filter_by(event_id=event_id).delete(
+        synchronize_session=False
+    )
+
+
+def set_occurrence_exception(event, occurrence_start, cancelled, starts_at, ends_at):
+    # 繰り返しの予定の一回分だけを中止・時間変更する
+    if not event.recurrence_rule:
+        raise InvalidRange('Event is not recurring')
+    tz_name = current_app.config['APP_TIMEZONE']
+    rule = parse_rule(event.recurrence_rule, tz_name)
+    if not is_occurrence(rule, utc_naive(event.starts_at), tz_name, occurrence_start):
+        raise InvalidRange('occurrence_start does not match an occurrence')
+    if starts_at is not None and ends_at is None:
+        ends_at = starts_at + (event.ends_at - event.starts_at)
+    if starts_at is not None and ends_at <= starts_at:
+        raise InvalidRange('ends_at must be after starts_at')
+
+    db.session.merge(
+        EventOccurrenceException(
+            event_id=event.id,
+            occurrence_start=as_utc(occurrence_start),
+            cancelled=cancelled,
+            starts_at=as_utc(starts_at),
+            ends_at=as_utc(ends_at),
+        )
+    )
+    _bump_calendar_users(event.id)
+
+
+def remove_occurrence_exceptions(event_id, occurrence_start=None):
+    query = EventOccurrenceException.query.filter_by(event_id=event_id)
+    if occurrence_start is not None:
+        query = query.filter_by(occurrence_start=as_utc(occurrence_start))
+    removed = query.delete(synchronize_session=False)
+    if removed:
+        _bump_calendar_users(event_id)
+    return removed
+
+
+def load_exceptions(event_ids):
+    exceptions = defaultdict(dict)
+    if event_ids:
+        rows = db.session.query(
+            EventOccurrenceException.event_id,
+            EventOccurrenceException.occurrence_start,
+            EventOccurrenceException.cancelled,
+            EventOccurrenceException.starts_at,
+            EventOccurrenceException.ends_at,
+        ).filter(EventOccurrenceException.event_id.in_(event_ids))
+        for row in rows:
+            exceptions[row.event_id][utc_naive(row.occurrence_start)] = (
+                row.cancelled,
+                utc_naive(row.starts_at),
+                utc_naive(row.ends_at),
+            )
+    return exceptions
+
+
+def expand_entries(entries, start, end):
+    # 繰り返しの予定を [start, end) 内の各回に展開し、
+    # (エントリ, 元の開始 or None, 開始, 終了) を返す
+    tz_name = current_app.config['APP_TIMEZONE']
+    exceptions = load_exceptions(
+        {entry.event_id for entry in entries if entry.recurrence_rule}
+    )
+    for entry in entries:
+        starts_at, ends_at = utc_naive(entry.starts_at), utc_naive(entry.ends_at)
+        if not entry.recurrence_rule:
+            yield entry, None, starts_at, ends_at
+            continue
+        for original, occurrence_start, occurrence_end in occurrences(
+            parse_rule(entry.recurrence_rule, tz_name),
+            starts_at,
+            ends_at,
+            start,
+            end,
+            tz_name,
+            exceptions.get(entry.event_id),
+        ):
+            yield entry, original, occurrence_start, occurrence_end
+
+
+def _overlapping(start, end):
+    # 単発の予定は区間の重なり、繰り返しの予定はシリーズ全体の期間で絞り込む
+    entry = UserCalendarEntry
+    return and_(
+        entry.starts_at < as_utc(end),
+        or_(
+            entry.ends_at > as_utc(start),
+            and_(
+                entry.recurrence_rule.isnot(None),
+                or_(
+                    entry.series_ends_at.is_(None),
+                    entry.series_ends_at > as_utc(start),
+                ),
+            ),
+        ),
+    )
+
+
+def _query_entries(user_id, start, end):
+    # (user_id, starts_at) のインデックスで範囲を引く
+    return (
+        db.session.query(
+            UserCalendarEntry.event_id,
+            UserCalendarEntry.event_name,
+            UserCalendarEntry.event_date,
+            UserCalendarEntry.starts_at,
+            UserCalendarEntry.ends_at,
+            UserCalendarEntry.recurrence_rule,
+        )
+        .filter(UserCalendarEntry.user_id == user_id, _overlapping(start, end))
+        .all()
+    )
+
+
+def find_overlapping_events(user_id, starts_at, ends_at, exclude_event_id=None):
+    if starts_at is None:
+        return []
+    starts_at, ends_at = utc_naive(starts_at), utc_naive(ends_at)
+    entries = [
+        entry
+        for entry in _query_entries(user_id, starts_at, ends_at)
+        if entry.event_id != exclude_event_id
+    ]
+    conflicts = [
+        {
+            'id': entry.event_id,
+            'event_name': entry.event_name,
+            'occurrence_start': format_utc(original),
+            'starts_at': format_utc(occurrence_start),
+            'ends_at': format_utc(occurrence_end),
+        }
+        for entry, original, occurrence_start, occurrence_end in expand_entries(
+            entries, starts_at, ends_at
+        )
+    ]
+    return sorted(
+        conflicts, key=lambda conflict: (conflict['starts_at'], conflict['id'])
+    )
+
+
+def parse_datetime(value, name):
+    # ISO 8601 の文字列を UTC の naive datetime にする。
+    # オフセットのない値は APP_TIMEZONE の現地時刻とみなす
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        raise InvalidRange(f'Invalid {name}: {value}')
+    if parsed.tzinfo is None:
+        return local_to_utc_naive(parsed, current_app.config['APP_TIMEZONE'])
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _add_months(year, month, months):
+    index = year * 12 + (month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def resolve_range(args):
+    # 取得範囲 [start, end) を UTC の naive datetime で決める。日付・月の境界は
+    # APP_TIMEZONE の現地時刻で区切る
+    #   start/end          : 任意の範囲
+    #   view=week&date=    : date を含む週(月曜始まり)
+    #   year/month/months  : month から months か月分
+    tz_name = current_app.config['APP_TIMEZONE']
+    if args.get('start') or args.get('end'):
+        if not (args.get('start') and args.get('end')):
+            raise InvalidRange('Both start and end are required')
+        start = parse_datetime(args['start'], 'start')
+        end = parse_datetime(args['end'], 'end')
+    elif args.get('view') == 'week':
+        if args.get('date'):
+            try:
+                day = date.fromisoformat(args['date'][:10])
+            except ValueError:
+                raise InvalidRange(f'Invalid date: {args["date"]}')
+        else:
+            day = date.today()
+        monday = day - timedelta(days=day.weekday())
+        local_start = datetime(monday.year, monday.month, monday.day)
+        start = local_to_utc_naive(local_start, tz_name)
+        end = local_to_utc_naive(local_start + timedelta(days=7), tz_name)
+    else:
+        try:
+            year = int(args.get('year', datetime.now().year))
+            month = int(args.get('month', datetime.now().month))
+            months = int(args.get('months', 1))
+        except ValueError:
+            raise InvalidRange('year, month and months must be integers')
+        if not 1 <= month <= 12 or months < 1:
+            raise InvalidRange('Invalid month or months')
+        start = local_to_utc_naive(datetime(year, month, 1), tz_name)
+        end = local_to_utc_naive(_add_months(year, month, months), tz_name)
+
+    if end <= start:
+        raise InvalidRange('end must be after start')
+    max_days = current_app.config['CALENDAR_MAX_RANGE_DAYS']
+    if end - start > timedelta(days=max_days):
+        raise InvalidRange(f'Range must not exceed {max_days} days')
+    return start, end
+
+
+def _occurrence_date(starts_at, tz_name):
+    # 各回の event_date は、その回の現地日付の 0 時を UTC にしたもの
+    day = as_utc(starts_at).astimezone(ZoneInfo(tz_name)).date()
+    return local_to_utc_naive(datetime.combine(day, time()), tz_name)
+
+
+def fetch_calendar(user_id, start, end):
+    # 主キーにより重複はない。繰り返しの予定は範囲内の回だけを展開する
+    tz_name = current_app.config['APP_TIMEZONE']
+    events = [
+        {
+            'id': entry.event_id,
+            'event_name': entry.event_name,
+            'event_date': isoformat(
+                _occurrence_date(starts_at, tz_name)
+                if original is not None
+                else entry.event_date
+            ),
+            'starts_at': format_utc(starts_at),
+            'ends_at': format_utc(ends_at),
+            'recurrence_rule': entry.recurrence_rule,
+            'occurrence_start': format_utc(original),
+        }
+        for entry, original, starts_at, ends_at in expand_entries(
+            _query_entries(user_id, start, end), start, end
+        )
+    ]
+    return sorted(events, key=lambda event: (event['starts_at'], event['id']))
@@ -0,0 +1,75 @@
+import threading
+from collections import defaultdict
+
+from flask import current_app
+
+
+class ChatMembershipCache:
+    # 接続(sid)ごとの参加イベントとユーザー情報。join 時にDBで確認した結果を保持し、
+    # 退出・切断・イベント削除で破棄する
+    def __init__(self):
+        self._connections = {}
+        self._event_sids = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def join(self, sid, user_id, username, event_id):
+        with self._lock:
+            connection = self._connections.get(sid)
+            if connection is None or connection['user_id'] != user_id:
+                self._discard_connection(sid)
+                connection = self._connections[sid] = {
+                    'user_id': user_id,
+                    'username': username,
+                    'events': set(),
+                }
+            connection['events'].add(event_id)
+            self._event_sids[event_id].add(sid)
+
+    def get_member(self, sid, user_id, event_id):
+        connection = self._connections.get(sid)
+        if (
+            connection is None
+            or connection['user_id'] != user_id
+            or event_id not in connection['events']
+        ):
+            return None
+        return connection
+
+    def leave(self, sid, event_id):
+        with self._lock:
+            connection = self._connections.get(sid)
+            if connection is not None:
+                connection['events'].discard(event_id)
+            self._discard_event_sid(event_id, sid)
+
+    def disconnect(self, sid):
+        with self._lock:
+            self._discard_connection(sid)
+
+    def remove_event(self, event_id):
+        with self._lock:
+            for sid in self._event_sids.pop(event_id, set()):
+                connection = self._connections.get(sid)
+                if connection is not None:
+                    connection['events'].discard(event_id)
+
+    def _discard_connection(self, sid):
+        connection = self._connections.pop(sid, None)
+        if connection is not None:
+            for event_id in connection['events']:
+                self._discard_event_sid(event_id, sid)
+
+    def _discard_event_sid(self, event_id, sid):
+        sids = self._event_sids.get(event_id)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._event_sids[event_id]
+
+
+def init_chat_membership(app):
+    app.extensions['chat_membership'] = ChatMembershipCache()
+
+
+def get_chat_membership():
+    return current_app.extensions['chat_membership']
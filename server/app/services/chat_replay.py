@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict, deque
+
+from flask import current_app
+
+
+class ChatReplayBuffer:
+    # ルームごとに直近のメッセージを (timestamp, id) 順で保持するリングバッファ。
+    # 再接続したクライアントに、最後に受け取ったメッセージ以降だけを再送する。
+    # このプロセスから送信したメッセージのみを記録するため、複数インスタンス構成
+    # (SOCKETIO_MESSAGE_QUEUE)では使わずに DB から読む
+    def __init__(self, capacity=200, max_rooms=1000):
+        self.capacity = capacity
+        self.max_rooms = max_rooms
+        self._rooms = OrderedDict()
+        self._lock = threading.Lock()
+
+    def append(self, room, key, payload):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            messages = self._rooms.get(room)
+            if messages is None:
+                messages = self._rooms[room] = deque(maxlen=self.capacity)
+                while len(self._rooms) > self.max_rooms:
+                    self._rooms.popitem(last=False)
+            self._rooms.move_to_end(room)
+            messages.append((key, payload))
+
+    def since(self, room, key):
+        # key より新しいメッセージを古い順に返す。バッファが key まで
+        # さかのぼれない(取りこぼしがありうる)ときは None
+        with self._lock:
+            messages = self._rooms.get(room)
+            if not messages or key < messages[0][0]:
+                return None
+            entries = list(messages)
+        entries.sort(key=lambda entry: entry[0])
+        return [payload for entry_key, payload in entries if entry_key > key]
+
+    def discard(self, room):
+        with self._lock:
+            self._rooms.pop(room, None)
+
+
+def init_chat_replay(app):
+    capacity = app.config['CHAT_REPLAY_BUFFER_SIZE']
+    if app.config.get('SOCKETIO_MESSAGE_QUEUE'):
+        capacity = 0
+    app.extensions['chat_replay'] = ChatReplayBuffer(
+        capacity=capacity, max_rooms=app.config['CHAT_REPLAY_MAX_ROOMS']
+    )
+
+
+def get_chat_replay():
+    return current_app.extensions['chat_replay']
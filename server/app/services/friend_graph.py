@@ -0,0 +1,129 @@
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+from flask import current_app
+
+from app.models import db, FriendRequest, User
+from app.models.user_model import friends_association_table
+from app.services.resource_versions import get_versions, user_key
+
+
+class FriendGraph:
+    # ユーザーごとのフレンドIDをソート済みの整数配列で保持する隣接リスト。
+    # 'user:<id>:friends' のバージョンと照合し、変わったユーザーだけを読み直すため、
+    # 他のワーカーでの変更も反映される
+    def __init__(self):
+        self._adjacency = {}
+        self._lock = threading.Lock()
+
+    def neighbors(self, user_ids):
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+
+        versions = get_versions([user_key(user_id, 'friends') for user_id in user_ids])
+        with self._lock:
+            cached = {user_id: self._adjacency.get(user_id) for user_id in user_ids}
+        stale = [
+            user_id
+            for user_id, entry in cached.items()
+            if entry is None or entry[0] != versions[user_key(user_id, 'friends')]
+        ]
+
+        if stale:
+            loaded = self._load(stale)
+            with self._lock:
+                for user_id in stale:
+                    entry = (versions[user_key(user_id, 'friends')], loaded[user_id])
+                    self._adjacency[user_id] = cached[user_id] = entry
+
+        return {user_id: entry[1] for user_id, entry in cached.items()}
+
+    def _load(self, user_ids):
+        friends = friends_association_table.c
+        grouped = defaultdict(list)
+        rows = db.session.query(friends.user_id, friends.friend_id).filter(
+            friends.user_id.in_(user_ids)
+        )
+        for row in rows:
+            grouped[row.user_id].append(row.friend_id)
+        return {user_id: array('i', sorted(grouped[user_id])) for user_id in user_ids}
+
+    def suggestions(self, user_id, limit, exclude=()):
+        # 共通のフレンド数の多い順に、フレンドのフレンドを返す
+        own = self.neighbors([user_id])[user_id]
+        adjacency = self.neighbors(own)
+
+        excluded = set(own)
+        excluded.add(user_id)
+        excluded.update(exclude)
+
+        counts = Counter()
+        for friend_id in own:
+            for candidate_id in adjacency[friend_id]:
+                if candidate_id not in excluded:
+                    counts[candidate_id] += 1
+
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def mutual_counts(self, user_id, other_ids):
+        if not other_ids:
+            return {}
+        adjacency = self.neighbors([user_id, *other_ids])
+        own = set(adjacency[user_id])
+        return {
+            other_id: len(own.intersection(adjacency[other_id]))
+            for other_id in other_ids
+        }
+
+
+def get_friend_graph():
+    graph = current_app.extensions.get('friend_graph')
+    if graph is None:
+        graph = current_app.extensions['friend_graph'] = FriendGraph()
+    return graph
+
+
+def resolve_suggestion_limit(limit):
+    default = current_app.config['FRIEND_SUGGESTION_LIMIT']
+    maximum = current_app.config['FRIEND_SUGGESTION_MAX_LIMIT']
+    if limit is None:
+        return default
+    return max(1, min(int(limit), maximum))
+
+
+def suggest_friends(user_id, limit=None):
+    limit = resolve_suggestion_limit(limit)
+
+    # 保留中のリクエストがある相手は候補から外す
+    pending = (
+        db.session.query(FriendRequest.sender_id, FriendRequest.receiver_id)
+        .filter(
+            (FriendRequest.sender_id == user_id)
+            | (FriendRequest.receiver_id == user_id),
+            FriendRequest.status == 'pending',
+        )
+        .all()
+    )
+    exclude = {row.sender_id for row in pending} | {row.receiver_id for row in pending}
+
+    ranked = get_friend_graph().suggestions(user_id, limit, exclude=exclude)
+    if not ranked:
+        return []
+
+    usernames = dict(
+        db.session.query(User.id, User.username).filter(
+            User.id.in_([candidate_id for candidate_id, _ in ranked])
+        )
+    )
+    return [
+        {
+            'id': candidate_id,
+            'username': usernames[candidate_id],
+            'mutual_friends': count,
+        }
+        for candidate_id, count in ranked
+        if candidate_id in usernames
+    ]
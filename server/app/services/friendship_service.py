@@ -0,0 +1,103 @@
+from sqlalchemy import and_, or_
+
+from app.models import db, FriendRequest, User
+from app.models.user_model import friends_association_table
+from app.services.resource_versions import bump_versions, user_key
+from app.utils.db_utils import insert_ignore
+
+
+def add_friendships(pairs):
+    # 双方向の行を1回の INSERT で追加する。既にある行は一意制約で無視される
+    rows = {
+        (user_id, friend_id)
+        for a, b in pairs
+        for user_id, friend_id in ((a, b), (b, a))
+        if a != b
+    }
+    if not rows:
+        return set()
+
+    db.session.execute(
+        insert_ignore(friends_association_table, 'unique_friends_pair'),
+        [{'user_id': user_id, 'friend_id': friend_id} for user_id, friend_id in rows],
+    )
+    user_ids = {user_id for user_id, _ in rows}
+    bump_versions(user_key(user_id, 'friends') for user_id in user_ids)
+    return user_ids
+
+
+def are_friends(user_id, other_id):
+    friends = friends_association_table.c
+    return (
+        db.session.query(friends.user_id)
+        .filter(friends.user_id == user_id, friends.friend_id == other_id)
+        .first()
+        is not None
+    )
+
+
+def accept_friend_requests(receiver_id, request_ids=None):
+    # 受信者宛ての保留中リクエストをまとめて承認する。コミットは呼び出し側で行う
+    query = (
+        db.session.query(
+            FriendRequest.id, FriendRequest.sender_id, User.username.label('username')
+        )
+        .join(User, User.id == FriendRequest.sender_id)
+        .filter(
+            FriendRequest.receiver_id == receiver_id,
+            FriendRequest.status == 'pending',
+        )
+    )
+    if request_ids is not None:
+        query = query.filter(FriendRequest.id.in_(request_ids))
+    pending = query.order_by(FriendRequest.id).all()
+    if not pending:
+        return []
+
+    # 同時に承認された場合も、保留中の行だけを更新する
+    FriendRequest.query.filter(
+        FriendRequest.id.in_([row.id for row in pending]),
+        FriendRequest.status == 'pending',
+    ).update({'status': 'accepted'}, synchronize_session=False)
+
+    sender_ids = {row.sender_id for row in pending}
+    # 逆向き(受信者→送信者)の保留中リクエストも不要になるため承認済みにする
+    FriendRequest.query.filter(
+        FriendRequest.sender_id == receiver_id,
+        FriendRequest.receiver_id.in_(sender_ids),
+        FriendRequest.status == 'pending',
+    ).update({'status': 'accepted'}, synchronize_session=False)
+
+    add_friendships((receiver_id, sender_id) for sender_id in sender_ids)
+    bump_versions(
+        [user_key(receiver_id, 'friend_requests')]
+        + [user_key(sender_id, 'friend_requests') for sender_id in sender_ids]
+    )
+
+    seen = set()
+    accepted = []
+    for row in pending:
+        if row.sender_id not in seen:
+            seen.add(row.sender_id)
+            accepted.append({'id': row.sender_id, 'username': row.username})
+    return accepted
+
+
+def find_request_between(user_id, other_id):
+    # どちら向きでも2人の間のリクエストを探す(保留中を優先)
+    return (
+        FriendRequest.query.filter(
+            or_(
+                and_(
+                    FriendRequest.sender_id == user_id,
+                    FriendRequest.receiver_id == other_id,
+                ),
+                and_(
+                    FriendRequest.sender_id == other_id,
+                    FriendRequest.receiver_id == user_id,
+                ),
+            )
+        )
+        .order_by((FriendRequest.status == 'pending').desc(), FriendRequest.id)
+        .all()
+    )
@@ -0,0 +1,350 @@
+import hashlib
+import re
+import secrets
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from app import db
+from app.models import (
+    CalendarFeedToken,
+    Event,
+    EventParticipant,
+    UserCalendarEntry,
+)
+from app.services.calendar_service import (
+    InvalidRange,
+    add_event_calendar_entries,
+    apply_event_times,
+    apply_recurrence,
+    load_exceptions,
+)
+from app.services.invite_service import invite_users_to_events
+from app.utils.time_utils import to_utc_naive, utc_naive
+
+PRODID = '-//calendar-chat//ICS feed//JA'
+_ESCAPES = [('\\', '\\\\'), (';', '\\;'), (',', '\\,'), ('\n', '\\n')]
+_UNESCAPE = re.compile(r'\\([\\;,nN])')
+
+
+class InvalidCalendar(ValueError):
+    pass
+
+
+def _hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def rotate_feed_token(user_id):
+    # 新しいトークンを発行すると以前の URL は使えなくなる
+    token = secrets.token_urlsafe(32)
+    db.session.merge(
+        CalendarFeedToken(
+            user_id=user_id,
+            token_hash=_hash_token(token),
+            created_at=datetime.now(timezone.utc),
+        )
+    )
+    return token
+
+
+def revoke_feed_token(user_id):
+    return CalendarFeedToken.query.filter_by(user_id=user_id).delete()
+
+
+def find_feed_user(token):
+    row = (
+        db.session.query(CalendarFeedToken.user_id)
+        .filter_by(token_hash=_hash_token(token))
+        .first()
+    )
+    return row.user_id if row else None
+
+
+def escape_text(value):
+    for old, new in _ESCAPES:
+        value = value.replace(old, new)
+    return value.replace('\r', '')
+
+
+def unescape_text(value):
+    return _UNESCAPE.sub(
+        lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value
+    )
+
+
+def fold_line(line):
+    # RFC 5545: 1行は 75 オクテットまで。超える分は空白で始まる行に折り返す
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    start = 0
+    limit = 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # UTF-8 の途中で切らない
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode('utf-8'))
+        start = end
+        limit = 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_ics_datetime(value):
+    return utc_naive(value).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _event_uid(row):
+    return row.ical_uid or f'event-{row.event_id}@calendar-chat'
+
+
+def _vevent(row, exceptions, stamp):
+    uid = _event_uid(row)
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART:{format_ics_datetime(row.starts_at)}',
+        f'DTEND:{format_ics_datetime(row.ends_at)}',
+        f'SUMMARY:{escape_text(row.event_name)}',
+    ]
+    if row.meeting_place:
+        lines.append(f'LOCATION:{escape_text(row.meeting_place)}')
+    if row.description:
+        lines.append(f'DESCRIPTION:{escape_text(row.description)}')
+    overrides = []
+    if row.recurrence_rule:
+        lines.append(f'RRULE:{row.recurrence_rule}')
+        for original, (cancelled, starts_at, ends_at) in sorted(exceptions.items()):
+            if cancelled:
+                lines.append(f'EXDATE:{format_ics_datetime(original)}')
+            else:
+                overrides.append((original, starts_at, ends_at))
+    lines.append('END:VEVENT')
+
+    # 時間を変えた回は RECURRENCE-ID 付きの VEVENT で上書きする
+    duration = row.ends_at - row.starts_at
+    for original, starts_at, ends_at in overrides:
+        starts_at = starts_at or original
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:{uid}',
+            f'DTSTAMP:{stamp}',
+            f'RECURRENCE-ID:{format_ics_datetime(original)}',
+            f'DTSTART:{format_ics_datetime(starts_at)}',
+            f'DTEND:{format_ics_datetime(ends_at or starts_at + duration)}',
+            f'SUMMARY:{escape_text(row.event_name)}',
+            'END:VEVENT',
+        ]
+    return ''.join(fold_line(line) for line in lines)
+
+
+def _feed_page(user_id, after, page_size):
+    # (starts_at, event_id) のキーセットで1ページずつ読む
+    query = (
+        db.session.query(
+            UserCalendarEntry.event_id,
+            UserCalendarEntry.event_name,
+            UserCalendarEntry.starts_at,
+            UserCalendarEntry.ends_at,
+            UserCalendarEntry.recurrence_rule,
+            Event.meeting_place,
+            Event.description,
+            Event.ical_uid,
+        )
+        .join(Event, Event.id == UserCalendarEntry.event_id)
+        .filter(
+            UserCalendarEntry.user_id == user_id,
+            UserCalendarEntry.starts_at.isnot(None),
+        )
+    )
+    if after is not None:
+        starts_at, event_id = after
+        query = query.filter(
+            or_(
+                UserCalendarEntry.starts_at > starts_at,
+                and_(
+                    UserCalendarEntry.starts_at == starts_at,
+                    UserCalendarEntry.event_id > event_id,
+                ),
+            )
+        )
+    return (
+        query.order_by(UserCalendarEntry.starts_at, UserCalendarEntry.event_id)
+        .limit(page_size)
+        .all()
+    )
+
+
+def iter_feed(user_id, page_size):
+    # 全件をメモリに載せず、ページごとに VEVENT を生成して返す
+    stamp = format_ics_datetime(datetime.now(timezone.utc))
+    yield (
+        'BEGIN:VCALENDAR\r\nVERSION:2.0\r\n'
+        f'PRODID:{PRODID}\r\nCALSCALE:GREGORIAN\r\nMETHOD:PUBLISH\r\n'
+    )
+    after = None
+    while True:
+        rows = _feed_page(user_id, after, page_size)
+        if not rows:
+            break
+        exceptions = load_exceptions(
+            {row.event_id for row in rows if row.recurrence_rule}
+        )
+        yield ''.join(
+            _vevent(row, exceptions.get(row.event_id, {}), stamp) for row in rows
+        )
+        if len(rows) < page_size:
+            break
+        after = (rows[-1].starts_at, rows[-1].event_id)
+    yield 'END:VCALENDAR\r\n'
+
+
+def _unfold(text):
+    return re.sub(r'\r?\n[ \t]', '', text).splitlines()
+
+
+def _parse_property(line):
+    name_part, _, value = line.partition(':')
+    name, *params = name_part.split(';')
+    parsed = {}
+    for param in params:
+        key, _, param_value = param.partition('=')
+        parsed[key.upper()] = param_value
+    return name.upper(), parsed, value
+
+
+def _parse_datetime(value, params, tz_name):
+    # (UTC の naive datetime, 終日か) を返す
+    try:
+        if params.get('VALUE', '').upper() == 'DATE' or len(value) == 8:
+            day = datetime.strptime(value[:8], '%Y%m%d')
+            return to_utc_naive(day.replace(tzinfo=ZoneInfo(tz_name))), True
+        if value.endswith('Z'):
+            return datetime.strptime(value, '%Y%m%dT%H%M%SZ'), False
+        local = datetime.strptime(value, '%Y%m%dT%H%M%S')
+        zone = ZoneInfo(params.get('TZID', tz_name).strip('"'))
+        return to_utc_naive(local.replace(tzinfo=zone)), False
+    except (ValueError, ZoneInfoNotFoundError):
+        raise InvalidCalendar(f'Invalid date-time: {value}')
+
+
+def parse_calendar(text, tz_name):
+    # VEVENT を dict で返す。RECURRENCE-ID 付き(各回の上書き)は取り込まない
+    events = []
+    current = None
+    for line in _unfold(text):
+        if not line.strip():
+            continue
+        name, params, value = _parse_property(line)
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            current = {}
+        elif name == 'END' and value.upper() == 'VEVENT':
+            if current is not None:
+                events.append(current)
+            current = None
+        elif current is not None:
+            if name in ('DTSTART', 'DTEND'):
+                current[name] = _parse_datetime(value, params, tz_name)
+            elif name in ('UID', 'RRULE', 'RECURRENCE-ID'):
+                current[name] = value.strip()
+            elif name in ('SUMMARY', 'LOCATION', 'DESCRIPTION'):
+                current[name] = unescape_text(value)
+    if current is not None:
+        raise InvalidCalendar('Unterminated VEVENT')
+    return events
+
+
+def _local_label(starts_at, ends_at, all_day, tz_name):
+    # 表示用の event_date(現地日付の 0 時の UTC)と meeting_time
+    tz = ZoneInfo(tz_name)
+    local_start = starts_at.replace(tzinfo=timezone.utc).astimezone(tz)
+    event_date = to_utc_naive(datetime.combine(local_start.date(), time(), tz))
+    if all_day:
+        return event_date, None
+    if ends_at is None:
+        return event_date, f'{local_start:%H:%M}'
+    local_end = ends_at.replace(tzinfo=timezone.utc).astimezone(tz)
+    return event_date, f'{local_start:%H:%M}-{local_end:%H:%M}'
+
+
+def _build_event(user_id, item, tz_name):
+    if 'DTSTART' not in item:
+        raise InvalidCalendar('DTSTART is required')
+    starts_at, all_day = item['DTSTART']
+    if 'DTEND' in item:
+        ends_at = item['DTEND'][0]
+    elif all_day:
+        ends_at = starts_at + timedelta(days=1)
+    else:
+        ends_at = None
+    event_date, meeting_time = _local_label(starts_at, ends_at, all_day, tz_name)
+    event = Event(
+        event_name=(item.get('SUMMARY') or 'Untitled')[:100],
+        event_date=event_date,
+        meeting_time=meeting_time,
+        meeting_place=(item.get('LOCATION') or '')[:100] or None,
+        description=item.get('DESCRIPTION'),
+        created_by=user_id,
+        ical_uid=item.get('UID', '')[:255] or None,
+    )
+    apply_event_times(event, starts_at, ends_at)
+    apply_recurrence(event, item.get('RRULE'))
+    return event
+
+
+def import_batch(user_id, items, invitee_ids):
+    # 1バッチ分の予定・参加者・カレンダー・招待をまとめて登録する。
+    # 取り込み済みの UID は飛ばす。コミットは呼び出し側で行う
+    tz_name = current_app.config['APP_TIMEZONE']
+    uids = {item['UID'] for item in items if item.get('UID')}
+    existing = (
+        {
+            row.ical_uid
+            for row in db.session.query(Event.ical_uid).filter(
+                Event.created_by == user_id, Event.ical_uid.in_(uids)
+            )
+        }
+        if uids
+        else set()
+    )
+
+    events = []
+    skipped = []
+    errors = []
+    for item in items:
+        uid = item.get('UID')
+        if 'RECURRENCE-ID' in item or (uid and uid in existing):
+            skipped.append(uid)
+            continue
+        try:
+            events.append(_build_event(user_id, item, tz_name))
+        except (InvalidCalendar, InvalidRange) as e:
+            errors.append({'uid': uid, 'error': str(e)})
+            continue
+        if uid:
+            existing.add(uid)
+
+    invites = {'added': [], 'rejected': []}
+    if events:
+        db.session.add_all(events)
+        db.session.flush()
+        db.session.execute(
+            EventParticipant.__table__.insert(),
+            [{'event_id': event.id, 'user_id': user_id} for event in events],
+        )
+        add_event_calendar_entries(events, user_id)
+        invites = invite_users_to_events(
+            [event.id for event in events], user_id, invitee_ids
+        )
+
+    return {
+        'created': [event.id for event in events],
+        'skipped': skipped,
+        'errors': errors,
+        'invites': invites,
+    }
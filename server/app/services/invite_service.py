@@ -0,0 +1,103 @@
+from sqlalchemy import union
+
+from app.models import db, EventInvite, EventParticipant
+from app.models.user_model import friends_association_table
+from app.services.resource_versions import bump_versions, event_key, user_key
+from app.utils.db_utils import insert_ignore
+
+
+def normalize_ids(user_ids):
+    normalized = []
+    invalid = []
+    for user_id in user_ids:
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            invalid.append(user_id)
+            continue
+        if user_id not in normalized:
+            normalized.append(user_id)
+    return normalized, invalid
+
+
+def _friend_ids(inviter_id, user_ids):
+    friends = friends_association_table.c
+    return {
+        row.friend_id
+        for row in db.session.query(friends.friend_id).filter(
+            friends.user_id == inviter_id, friends.friend_id.in_(user_ids)
+        )
+    }
+
+
+def invite_users(event_id, inviter_id, invitee_ids):
+    # 招待をまとめて登録する。コミットは呼び出し側で行い、1トランザクションにする
+    #   added   : 新しく招待した
+    #   skipped : 招待済み、または既に参加している
+    #   rejected: 招待者のフレンドではない
+    requested, rejected = normalize_ids(invitee_ids)
+    if not requested:
+        return {'added': [], 'skipped': [], 'rejected': rejected}
+
+    friend_ids = _friend_ids(inviter_id, requested)
+    rejected += [user_id for user_id in requested if user_id not in friend_ids]
+    candidates = [user_id for user_id in requested if user_id in friend_ids]
+    if not candidates:
+        return {'added': [], 'skipped': [], 'rejected': rejected}
+
+    existing_query = union(
+        db.session.query(EventInvite.user_id)
+        .filter(EventInvite.event_id == event_id, EventInvite.user_id.in_(candidates))
+        .statement,
+        db.session.query(EventParticipant.user_id)
+        .filter(
+            EventParticipant.event_id == event_id,
+            EventParticipant.user_id.in_(candidates),
+        )
+        .statement,
+    )
+    existing_ids = {row[0] for row in db.session.execute(existing_query)}
+
+    skipped = [user_id for user_id in candidates if user_id in existing_ids]
+    added = [user_id for user_id in candidates if user_id not in existing_ids]
+
+    if added:
+        # 同時に招待された場合も一意制約で重複を防ぐ
+        db.session.execute(
+            insert_ignore(EventInvite.__table__, 'unique_event_user_invite'),
+            [
+                {'event_id': event_id, 'user_id': user_id, 'status': 'pending'}
+                for user_id in added
+            ],
+        )
+        bump_versions(
+            [event_key(event_id)] + [user_key(user_id, 'invites') for user_id in added]
+        )
+
+    return {'added': added, 'skipped': skipped, 'rejected': rejected}
+
+
+def invite_users_to_events(event_ids, inviter_id, invitee_ids):
+    # 作成したばかりの複数のイベントに同じフレンドを招待する(ICS の取り込み)。
+    # フレンドの確認は1回、招待は1回の INSERT で行う
+    requested, rejected = normalize_ids(invitee_ids)
+    if not requested or not event_ids:
+        return {'added': [], 'rejected': rejected}
+
+    friend_ids = _friend_ids(inviter_id, requested)
+    rejected += [user_id for user_id in requested if user_id not in friend_ids]
+    added = [user_id for user_id in requested if user_id in friend_ids]
+    if added:
+        db.session.execute(
+            insert_ignore(EventInvite.__table__, 'unique_event_user_invite'),
+            [
+                {'event_id': event_id, 'user_id': user_id, 'status': 'pending'}
+                for event_id in event_ids
+                for user_id in added
+            ],
+        )
+        bump_versions(
+            [event_key(event_id) for event_id in event_ids]
+            + [user_key(user_id, 'invites') for user_id in added]
+        )
+    return {'added': added, 'rejected': rejected}
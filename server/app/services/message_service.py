@@ -0,0 +1,136 @@
+import base64
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from app.models import db, Message, User
+from app.utils.time_utils import format_utc
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, message_id):
+    raw = f'{timestamp.isoformat()}|{message_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        timestamp_str, message_id = raw.split('|', 1)
+        return datetime.fromisoformat(timestamp_str), message_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+
+
+def resolve_page_size(limit):
+    default = current_app.config['MESSAGE_PAGE_SIZE']
+    maximum = current_app.config['MESSAGE_PAGE_MAX_SIZE']
+    if limit is None:
+        return default
+    return max(1, min(int(limit), maximum))
+
+
+def latest_message_marker(event_id):
+    # 最新メッセージの (timestamp, id)。メッセージは追記のみなので、これが
+    # 変わらなければ一覧も変わらない。ETag の材料にしてメッセージごとの
+    # バージョン更新を不要にする。(event_id, timestamp, id) のインデックスで1行読む
+    row = (
+        db.session.query(Message.timestamp, Message.id)
+        .filter(Message.event_id == event_id)
+        .order_by(Message.timestamp.desc(), Message.id.desc())
+        .first()
+    )
+    return encode_cursor(row.timestamp, row.id) if row else ''
+
+
+def fetch_message_page(event_id, before=None, limit=None):
+    page_size = resolve_page_size(limit)
+
+    query = (
+        db.session.query(
+            Message.id,
+            Message.message,
+            Message.timestamp,
+            User.username,
+        )
+        .join(User, User.id == Message.user_id)
+        .filter(Message.event_id == event_id)
+    )
+
+    if before:
+        timestamp, message_id = decode_cursor(before)
+        query = query.filter(
+            or_(
+                Message.timestamp < timestamp,
+                and_(Message.timestamp == timestamp, Message.id < message_id),
+            )
+        )
+
+    # 1件多く取得して、さらに古いメッセージがあるかを判定する
+    rows = (
+        query.order_by(Message.timestamp.desc(), Message.id.desc())
+        .limit(page_size + 1)
+        .all()
+    )
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    next_cursor = None
+    if has_more:
+        oldest = rows[-1]
+        next_cursor = encode_cursor(oldest.timestamp, oldest.id)
+
+    messages = [
+        {
+            'id': row.id,
+            'user': row.username,
+            'message': row.message,
+            'timestamp': format_utc(row.timestamp),
+            'cursor': encode_cursor(row.timestamp, row.id),
+        }
+        for row in reversed(rows)
+    ]
+
+    return {'messages': messages, 'next_cursor': next_cursor, 'has_more': has_more}
+
+
+def fetch_messages_after(event_id, after, limit):
+    # after の (timestamp, id) より新しいメッセージを古い順に最大 limit 件返す。
+    # (event_id, timestamp, id) のインデックスを範囲で読む
+    timestamp, message_id = after
+    rows = (
+        db.session.query(
+            Message.id,
+            Message.message,
+            Message.timestamp,
+            User.username,
+        )
+        .join(User, User.id == Message.user_id)
+        .filter(
+            Message.event_id == event_id,
+            or_(
+                Message.timestamp > timestamp,
+                and_(Message.timestamp == timestamp, Message.id > message_id),
+            ),
+        )
+        .order_by(Message.timestamp, Message.id)
+        .limit(limit + 1)
+        .all()
+    )
+    messages = [
+        {
+            'id': row.id,
+            'user': row.username,
+            'message': row.message,
+            'timestamp': format_utc(row.timestamp),
+            'cursor': encode_cursor(row.timestamp, row.id),
+        }
+        for row in rows[:limit]
+    ]
+    return messages, len(rows) > limit
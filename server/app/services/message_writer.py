@@ -0,0 +1,270 @@
+import atexit
+import logging
+import threading
+import weakref
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import exc
+
+from app import db, socketio
+from app.models import Message
+from app.utils.time_utils import as_utc
+
+logger = logging.getLogger(__name__)
+
+# 再試行すれば成功しうるエラー(接続断・ロック待ちのタイムアウトなど)
+_RETRYABLE_ERRORS = (
+    exc.OperationalError,
+    exc.InterfaceError,
+    exc.DisconnectionError,
+    exc.TimeoutError,
+)
+
+# プロセス終了時に書き込みを終えるライター。atexit の登録は1回だけにする
+_open_writers = weakref.WeakSet()
+
+
+class MessageBufferFull(Exception):
+    pass
+
+
+class SyncMessageWriter:
+    # 1メッセージごとにコミットしてからブロードキャストする従来の動作
+    def write(self, row):
+        db.session.add(Message(**row))
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def flush(self):
+        return 0
+
+    def discard_event(self, event_id):
+        return 0
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {'mode': 'sync'}
+
+
+class _PendingMessage:
+    __slots__ = ('row', 'done', 'error')
+
+    def __init__(self, row):
+        self.row = row
+        self.done = threading.Event()
+        self.error = None
+
+
+class WriteBehindMessageWriter:
+    # メッセージをバッファに溜め、件数または時間のしきい値でまとめて INSERT する
+    #   durability='buffered'  : バッファに入った時点で応答する(最大 flush_interval 分を失う可能性)
+    #   durability='committed' : 送信者はバッチのコミットを待つ(グループコミット)
+    def __init__(
+        self,
+        app,
+        batch_size=200,
+        flush_interval=0.2,
+        max_pending=5000,
+        durability='buffered',
+        max_deleted_events=1000,
+    ):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.durability = durability
+        self.max_deleted_events = max_deleted_events
+        self._pending = deque()
+        # 削除されたイベント -> 削除した時刻(UTC)
+        self._deleted_events = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._closed = False
+        self.dropped = 0
+        self.retries = 0
+        self.discarded = 0
+        _open_writers.add(self)
+
+    def write(self, row):
+        if self._is_deleted(row):
+            # 削除前に送られ、削除の後に届いた行
+            self.discarded += 1
+            return
+
+        self._ensure_flusher()
+
+        if len(self._pending) >= self.max_pending:
+            # バックプレッシャー: 呼び出し側で書き込みを肩代わりする
+            self.flush()
+            if len(self._pending) >= self.max_pending:
+                raise MessageBufferFull('Message buffer is full')
+
+        item = _PendingMessage(row)
+        with self._lock:
+            self._pending.append(item)
+            pending_count = len(self._pending)
+
+        if pending_count >= self.batch_size:
+            self.flush()
+
+        if self.durability == 'committed':
+            if not item.done.wait(self.flush_interval * 2):
+                self.flush()
+            if item.error is not None:
+                raise item.error
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+                self._pending.clear()
+            if not batch:
+                return 0
+
+            written, requeue = self._write(batch)
+            if requeue:
+                # ブロードキャスト済みなので破棄せず次回に再試行する
+                self.retries += 1
+                with self._lock:
+                    self._pending.extendleft(reversed(requeue))
+            logger.debug(f"Flushed {written} messages")
+            return written
+
+    def discard_event(self, event_id):
+        # イベント削除時。書き込み中のバッチを待ってから未書き込みの行を捨て、
+        # 削除の時刻より前に送られた行はこの後に届いても書き込まない。
+        # SQLite ではイベントの ID が再利用されるため、ID だけでは判断しない
+        deleted_at = datetime.now(timezone.utc)
+        key = str(event_id)
+        with self._flush_lock:
+            with self._lock:
+                self._deleted_events[key] = deleted_at
+                self._deleted_events.move_to_end(key)
+                while len(self._deleted_events) > self.max_deleted_events:
+                    self._deleted_events.popitem(last=False)
+                kept, discarded = deque(), []
+                for item in self._pending:
+                    (discarded if self._is_deleted(item.row) else kept).append(item)
+                self._pending = kept
+        for item in discarded:
+            item.done.set()
+        self.discarded += len(discarded)
+        return len(discarded)
+
+    def _is_deleted(self, row):
+        deleted_at = self._deleted_events.get(str(row['event_id']))
+        return deleted_at is not None and as_utc(row['timestamp']) <= deleted_at
+
+    def _insert(self, items):
+        with db.get_engine(self.app).begin() as connection:
+            connection.execute(Message.__table__.insert(), [item.row for item in items])
+
+    def _write(self, items):
+        # (書き込んだ件数, 再試行する項目) を返す。接続断などは再試行し、
+        # それ以外の失敗は半分ずつに分けて書き直し、単独でも失敗する行は破棄する
+        try:
+            self._insert(items)
+        except _RETRYABLE_ERRORS as e:
+            logger.error(f"Failed to flush {len(items)} messages: {str(e)}")
+            if self.durability == 'committed' or self._closed:
+                if self._closed:
+                    self.dropped += len(items)
+                self._fail(items, e)
+                return 0, []
+            return 0, items
+        except Exception as e:
+            if len(items) == 1:
+                logger.error(
+                    f"Dropping message {items[0].row['id']} for event "
+                    f"{items[0].row['event_id']}: {str(e)}"
+                )
+                self.dropped += 1
+                self._fail(items, e)
+                return 0, []
+            middle = len(items) // 2
+            written, requeue = self._write(items[:middle])
+            if requeue:
+                return written, requeue + items[middle:]
+            more, requeue = self._write(items[middle:])
+            return written + more, requeue
+
+        for item in items:
+            item.done.set()
+        return len(items), []
+
+    def _fail(self, items, error):
+        for item in items:
+            item.error = error
+            item.done.set()
+
+    def close(self):
+        # 定期書き込みを止め、残りを書き込む
+        self._closed = True
+        flusher, self._flusher = self._flusher, None
+        if flusher is not None and hasattr(flusher, 'kill'):
+            flusher.kill()
+        _open_writers.discard(self)
+        return self.flush()
+
+    def stats(self):
+        return {
+            'mode': 'write_behind',
+            'pending': len(self._pending),
+            'dropped': self.dropped,
+            'retries': self.retries,
+            'discarded': self.discarded,
+        }
+
+    def _ensure_flusher(self):
+        if self._flusher is None and not self._closed:
+            self._flusher = socketio.start_background_task(self._run)
+
+    def _run(self):
+        while not self._closed:
+            socketio.sleep(self.flush_interval)
+            if self._closed:
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Message flusher error: {str(e)}")
+
+
+def init_message_writer(app):
+    mode = app.config['MESSAGE_WRITE_MODE']
+    if mode == 'sync':
+        writer = SyncMessageWriter()
+    elif mode == 'write_behind':
+        writer = WriteBehindMessageWriter(
+            app,
+            batch_size=app.config['MESSAGE_WRITE_BATCH_SIZE'],
+            flush_interval=app.config['MESSAGE_WRITE_FLUSH_INTERVAL'],
+            max_pending=app.config['MESSAGE_WRITE_MAX_PENDING'],
+            durability=app.config['MESSAGE_WRITE_DURABILITY'],
+        )
+    else:
+        raise ValueError(f'Unknown message write mode: {mode}')
+
+    app.extensions['message_writer'] = writer
+
+
+def get_message_writer():
+    return current_app.extensions['message_writer']
+
+
+@atexit.register
+def _close_open_writers():
+    # ワーカー終了時に未書き込みのメッセージを保存する
+    for writer in list(_open_writers):
+        try:
+            writer.close()
+        except Exception as e:
+            logger.error(f"Failed to close message writer: {str(e)}")
@@ -0,0 +1,243 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# ミリ秒単位のバケット境界(最後は +Inf)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(
+    r'\((?:\s*(?:\?|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|:\w+)\s*\)'
+)
+
+
+def normalize_statement(statement):
+    # 値や IN のプレースホルダ数の違いをまとめ、同じ形のクエリを同一視する
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    return _PLACEHOLDER_LIST.sub('(...)', statement)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self):
+        labels = [str(bound) for bound in self.buckets] + ['+Inf']
+        return {
+            'count': self.count,
+            'sum_ms': round(self.total, 3),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = defaultdict(int)
+        self.queries = 0
+        self.db_time_ms = 0.0
+
+    def snapshot(self):
+        return {
+            'latency_ms': self.latency.snapshot(),
+            'statuses': dict(self.statuses),
+            'queries': self.queries,
+            'db_time_ms': round(self.db_time_ms, 3),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self, slow_query_threshold_ms=200):
+        self.slow_query_threshold_ms = slow_query_threshold_ms
+        self.started_at = time.time()
+        self._requests = defaultdict(_EndpointStats)
+        self._socket_events = defaultdict(_EndpointStats)
+        self._slow_queries = 0
+        self._lock = threading.Lock()
+
+    def observe_request(self, endpoint, status, duration_ms, queries, db_time_ms):
+        with self._lock:
+            self._observe(
+                self._requests[endpoint], status, duration_ms, queries, db_time_ms
+            )
+
+    def observe_socket_event(self, name, status, duration_ms, queries, db_time_ms):
+        with self._lock:
+            self._observe(
+                self._socket_events[name], status, duration_ms, queries, db_time_ms
+            )
+
+    def _observe(self, stats, status, duration_ms, queries, db_time_ms):
+        stats.latency.observe(duration_ms)
+        stats.statuses[str(status)] += 1
+        stats.queries += queries
+        stats.db_time_ms += db_time_ms
+
+    def record_slow_query(self, statement, duration_ms, source):
+        with self._lock:
+            self._slow_queries += 1
+        logger.warning(
+            f"Slow query ({duration_ms:.1f}ms) from {source}: "
+            f"{normalize_statement(statement)}"
+        )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'requests': {
+                    name: stats.snapshot()
+                    for name, stats in sorted(self._requests.items())
+                },
+                'socket_events': {
+                    name: stats.snapshot()
+                    for name, stats in sorted(self._socket_events.items())
+                },
+                'slow_queries': self._slow_queries,
+            }
+
+
+def _get_registry():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('metrics')
+
+
+def _current_source():
+    source = g.get('metrics_source')
+    if source:
+        return source
+    if has_request_context():
+        return request.endpoint or request.path
+    return 'background'
+
+
+def _start_tracking(source):
+    g.metrics_source = source
+    g.metrics_started = time.perf_counter()
+    g.metrics_queries = 0
+    g.metrics_db_time_ms = 0.0
+
+
+def _finish_tracking():
+    duration_ms = (time.perf_counter() - g.pop('metrics_started')) * 1000
+    return duration_ms, g.pop('metrics_queries', 0), g.pop('metrics_db_time_ms', 0.0)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    starts = conn.info.get('metrics_query_start')
+    if not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+
+    registry = _get_registry()
+    if registry is None:
+        return
+    if 'metrics_started' in g:
+        g.metrics_queries += 1
+        g.metrics_db_time_ms += duration_ms
+    if duration_ms >= registry.slow_query_threshold_ms:
+        registry.record_slow_query(statement, duration_ms, _current_source())
+
+
+def _install_engine_listeners():
+    # テストなどでアプリ作成後に DB の URL が変わってもよいよう、全 Engine に登録する
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def instrument_socket_event(name):
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            registry = _get_registry()
+            if registry is None:
+                return handler(*args, **kwargs)
+
+            _start_tracking(f'socket:{name}')
+            status = 'ok'
+            try:
+                return handler(*args, **kwargs)
+            except Exception:
+                status = 'error'
+                raise
+            finally:
+                duration_ms, queries, db_time_ms = _finish_tracking()
+                g.pop('metrics_source', None)
+                registry.observe_socket_event(
+                    name, status, duration_ms, queries, db_time_ms
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def init_metrics(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    registry = MetricsRegistry(
+        slow_query_threshold_ms=app.config['SLOW_QUERY_THRESHOLD_MS']
+    )
+    app.extensions['metrics'] = registry
+    _install_engine_listeners()
+
+    @app.before_request
+    def start_request_metrics():
+        _start_tracking(None)
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'metrics_started' in g:
+            duration_ms, queries, db_time_ms = _finish_tracking()
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            registry.observe_request(
+                f'{request.method} {endpoint}',
+                response.status_code,
+                duration_ms,
+                queries,
+                db_time_ms,
+            )
+            response.headers['Server-Timing'] = (
+                f'app;dur={duration_ms:.1f}, db;dur={db_time_ms:.1f}'
+            )
+        return response
+
+
+def metrics_snapshot():
+    registry = _get_registry()
+    if registry is None:
+        return None
+    snapshot = registry.snapshot()
+    snapshot['response_cache'] = current_app.extensions['response_cache'].stats()
+    snapshot['rate_limits'] = current_app.extensions['rate_limiter'].stats()
+    snapshot['message_writer'] = current_app.extensions['message_writer'].stats()
+    return snapshot
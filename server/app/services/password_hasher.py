@@ -0,0 +1,86 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from gevent import monkey
+from gevent.threadpool import ThreadPool
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS,
+    check_password_hash,
+    generate_password_hash,
+)
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def hash_prefix(method):
+    # 'scrypt' や 'pbkdf2:sha256' のように省略された設定を、werkzeug が
+    # 実際に作るハッシュの先頭('scrypt:32768:8:1' など)にそろえる。
+    # イベントループを止めないよう、ハッシュを計算せずに文字列から求める
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        return 'scrypt:32768:8:1'
+    if name == 'pbkdf2' and len(args) < 2:
+        hash_name = args[0] if args else 'sha256'
+        return f'pbkdf2:{hash_name}:{DEFAULT_PBKDF2_ITERATIONS}'
+    return method
+
+
+class PasswordHasher:
+    # パスワードのハッシュ計算(PBKDF2/scrypt)を専用のネイティブスレッドで行う。
+    # gevent のワーカーでは計算中もイベントループ(チャットのソケット)が止まらない。
+    # 同時に計算するのは workers 件、待ちは max_queue 件までで、超えると断る。
+    # workers=0 ならその場で計算する
+    def __init__(self, method, workers=2, max_queue=32):
+        self.method = method
+        self.workers = workers
+        self.max_queue = max_queue
+        self.prefix = hash_prefix(method)
+        self._pending = 0
+        self._lock = threading.Lock()
+        if workers <= 0:
+            self._pool = None
+        elif monkey.is_module_patched('threading'):
+            # 待っている間は他の greenlet に切り替わる
+            self._pool = ThreadPool(workers)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=workers)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        # 'pbkdf2:sha256:600000$salt$hash' の方式とコストが設定と違えば作り直す
+        return password_hash.split('$', 1)[0] != self.prefix
+
+    def _run(self, func, *args):
+        if self._pool is None:
+            return func(*args)
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                raise PasswordHasherBusy()
+            self._pending += 1
+        try:
+            if isinstance(self._pool, ThreadPool):
+                return self._pool.apply(func, args)
+            return self._pool.submit(func, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+def init_password_hasher(app):
+    app.extensions['password_hasher'] = PasswordHasher(
+        app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_queue=app.config['PASSWORD_HASH_MAX_QUEUE'],
+    )
+
+
+def get_password_hasher():
+    return current_app.extensions['password_hasher']
@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+
+from flask import current_app
+
+from app import socketio
+
+logger = logging.getLogger(__name__)
+
+
+class TooManyRooms(Exception):
+    pass
+
+
+class PresenceTracker:
+    # ルームごとのオンライン中・入力中のユーザー。変更はすぐには送らず、
+    # interval 秒ごとに変更のあったルームだけ presence として送る。
+    # 前回送った内容と同じなら送らないため、入力通知を連打されても増えない。
+    # 1接続が参加できるルーム数は max_rooms_per_connection まで。
+    # 遅れて動くタスクが別のアプリのサーバーへ送らないよう、作成時の
+    # Socket.IO サーバーを使う
+    def __init__(
+        self, server, interval=1.0, typing_ttl=5.0, max_rooms_per_connection=50
+    ):
+        self._server = server
+        self.interval = interval
+        self.typing_ttl = typing_ttl
+        self.max_rooms_per_connection = max_rooms_per_connection
+        # sid -> (user_id, username, 参加中のルーム)
+        self._connections = {}
+        # room -> {user_id: [username, 接続数]}
+        self._online = {}
+        # room -> {user_id: 入力中の期限(time.monotonic)}
+        self._typing = {}
+        self._sent = {}
+        self._dirty = set()
+        self._flush_scheduled = False
+        self._expiring = set()
+        self._lock = threading.Lock()
+
+    def join(self, sid, user_id, username, room):
+        with self._lock:
+            connection = self._connections.get(sid)
+            if connection is not None and connection[0] != user_id:
+                self._discard_connection(sid)
+                connection = None
+            if connection is None:
+                connection = self._connections[sid] = (user_id, username, set())
+            rooms = connection[2]
+            if room in rooms:
+                return
+            if len(rooms) >= self.max_rooms_per_connection:
+                raise TooManyRooms(room)
+            rooms.add(room)
+            entry = self._online.setdefault(room, {}).setdefault(user_id, [username, 0])
+            entry[1] += 1
+            if entry[1] == 1:
+                self._mark_dirty(room)
+
+    def leave(self, sid, room):
+        with self._lock:
+            connection = self._connections.get(sid)
+            if connection is not None and room in connection[2]:
+                connection[2].discard(room)
+                if not connection[2]:
+                    del self._connections[sid]
+                self._leave_room(connection[0], room)
+
+    def disconnect(self, sid):
+        with self._lock:
+            self._discard_connection(sid)
+
+    def remove_room(self, room):
+        # イベント削除時。ルームごと閉じるため通知はしない
+        with self._lock:
+            for sid, connection in list(self._connections.items()):
+                connection[2].discard(room)
+                if not connection[2]:
+                    del self._connections[sid]
+            self._online.pop(room, None)
+            self._typing.pop(room, None)
+            self._sent.pop(room, None)
+            self._dirty.discard(room)
+
+    def set_typing(self, sid, room, typing):
+        with self._lock:
+            connection = self._connections.get(sid)
+            if connection is None or room not in connection[2]:
+                return False
+            user_id = connection[0]
+            typing_users = self._typing.setdefault(room, {})
+            if typing:
+                # 入力中の延長だけなら送らない
+                if user_id not in typing_users:
+                    self._mark_dirty(room)
+                typing_users[user_id] = time.monotonic() + self.typing_ttl
+                if room not in self._expiring:
+                    self._expiring.add(room)
+                    self._server.start_background_task(self._expire_typing, room)
+            elif typing_users.pop(user_id, None) is not None:
+                self._mark_dirty(room)
+            if not typing_users:
+                del self._typing[room]
+            return True
+
+    def snapshot(self, room):
+        with self._lock:
+            return self._snapshot(room, time.monotonic())
+
+    def flush(self):
+        now = time.monotonic()
+        updates = []
+        with self._lock:
+            self._flush_scheduled = False
+            rooms, self._dirty = self._dirty, set()
+            for room in rooms:
+                if room not in self._online:
+                    self._sent.pop(room, None)
+                    continue
+                state = self._snapshot(room, now)
+                if state != self._sent.get(room):
+                    self._sent[room] = state
+                    updates.append((room, state))
+        for room, state in updates:
+            self._server.emit('presence', state, to=room, namespace='/')
+        return len(updates)
+
+    def _snapshot(self, room, now):
+        online = self._online.get(room, {})
+        typing_users = self._typing.get(room, {})
+        return {
+            'event_id': room,
+            'online': [
+                {'user_id': user_id, 'username': entry[0]}
+                for user_id, entry in sorted(online.items())
+            ],
+            'typing': sorted(
+                user_id
+                for user_id, expires_at in typing_users.items()
+                if expires_at > now
+            ),
+        }
+
+    def _mark_dirty(self, room):
+        self._dirty.add(room)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._server.start_background_task(self._flush_later)
+
+    def _flush_later(self):
+        self._server.sleep(self.interval)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Failed to broadcast presence: {str(e)}")
+
+    def _expire_typing(self, room):
+        # 入力中の通知が途絶えたユーザーを期限で外す。ルームごとに1タスク
+        delay = self.typing_ttl
+        while True:
+            self._server.sleep(delay)
+            with self._lock:
+                now = time.monotonic()
+                typing_users = self._typing.get(room, {})
+                expired = [
+                    user_id
+                    for user_id, expires_at in typing_users.items()
+                    if expires_at <= now
+                ]
+                for user_id in expired:
+                    del typing_users[user_id]
+                if expired:
+                    self._mark_dirty(room)
+                if not typing_users:
+                    self._typing.pop(room, None)
+                    self._expiring.discard(room)
+                    return
+                delay = min(typing_users.values()) - now
+
+    def _discard_connection(self, sid):
+        connection = self._connections.pop(sid, None)
+        if connection is not None:
+            for room in connection[2]:
+                self._leave_room(connection[0], room)
+
+    def _leave_room(self, user_id, room):
+        online = self._online.get(room)
+        entry = online.get(user_id) if online else None
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        del online[user_id]
+        if not online:
+            del self._online[room]
+        typing_users = self._typing.get(room)
+        if typing_users is not None:
+            typing_users.pop(user_id, None)
+        self._mark_dirty(room)
+
+
+def init_presence(app):
+    app.extensions['presence'] = PresenceTracker(
+        socketio.server,
+        interval=app.config['PRESENCE_BROADCAST_INTERVAL_MS'] / 1000,
+        typing_ttl=app.config['PRESENCE_TYPING_TTL'],
+        max_rooms_per_connection=app.config['PRESENCE_MAX_ROOMS_PER_CONNECTION'],
+    )
+
+
+def get_presence():
+    return current_app.extensions['presence']
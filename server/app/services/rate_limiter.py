@@ -0,0 +1,242 @@
+import logging
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from flask_socketio import emit
+
+logger = logging.getLogger(__name__)
+
+
+def parse_policy(value):
+    # 'count/seconds' を (毎秒の補充量, バケットの容量) にする。空なら制限なし
+    if not value:
+        return None
+    count, _, seconds = str(value).partition('/')
+    count, seconds = int(count), float(seconds or 1)
+    if count <= 0 or seconds <= 0:
+        raise ValueError(f'Invalid rate limit policy: {value}')
+    return count / seconds, count
+
+
+class MemoryRateLimitBackend:
+    # プロセス内のトークンバケット。キー数は max_keys までで、古いものから捨てる
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        # cost=0 は残りが1以上あるかだけを調べ、消費しない
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= max(cost, 1):
+                bucket[0] -= cost
+                return True, 0.0
+            return False, (max(cost, 1) - bucket[0]) / rate
+
+
+_TAKE_SCRIPT = '''
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local need = math.max(cost, 1)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+local allowed = 0
+if tokens >= need then
+  tokens = tokens - cost
+  allowed = 1
+else
+  retry_after = (need - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(retry_after)}
+'''
+
+
+class RedisRateLimitBackend:
+    # ワーカー/インスタンス間で共有するバケット。redis パッケージが必要。
+    # 補充と消費は Lua スクリプトで1往復・アトミックに行う
+    def __init__(self, url, prefix='calendar-chat:ratelimit:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(_TAKE_SCRIPT)
+
+    def take(self, key, rate, burst, cost=1):
+        allowed, retry_after = self._take(
+            keys=[self.prefix + key], args=[rate, burst, time.time(), cost]
+        )
+        return bool(allowed), float(retry_after)
+
+
+class RateLimiter:
+    # Config.RATE_LIMITS のポリシーごとに、キー(ユーザー・IP・アカウント・ルーム)単位で制限する。
+    # バックエンドの障害時はリクエストを止めないよう通す
+    def __init__(self, backend, policies, enabled=True):
+        self.backend = backend
+        self.policies = {name: parse_policy(value) for name, value in policies.items()}
+        self.enabled = enabled
+        self.allowed = Counter()
+        self.rejected = Counter()
+        self.errors = Counter()
+
+    def check(self, policy, key, cost=1):
+        # (許可するか, 再試行までの秒数) を返す。cost=0 なら枠を消費しない
+        limit = self.policies.get(policy)
+        if not self.enabled or limit is None or key is None:
+            return True, 0.0
+        rate, burst = limit
+        try:
+            allowed, retry_after = self.backend.take(
+                f'{policy}:{key}', rate, burst, cost
+            )
+        except Exception as e:
+            logger.warning(f"Rate limiter backend failed: {str(e)}")
+            self.errors[policy] += 1
+            return True, 0.0
+        if not allowed:
+            self.rejected[policy] += 1
+        elif cost:
+            self.allowed[policy] += 1
+        return allowed, retry_after
+
+    def stats(self):
+        return {
+            policy: {
+                'allowed': self.allowed[policy],
+                'rejected': self.rejected[policy],
+                'errors': self.errors[policy],
+            }
+            for policy in sorted(
+                set(self.allowed) | set(self.rejected) | set(self.errors)
+            )
+        }
+
+
+def by_user(*args, **kwargs):
+    return get_jwt_identity()
+
+
+def by_remote_addr(*args, **kwargs):
+    # プロキシ越しの場合は PROXY_FIX_X_FOR を設定して実際の接続元にする
+    return request.remote_addr
+
+
+def by_submitted_email_and_addr(*args, **kwargs):
+    # 送られたメールアドレスと接続元の組。他人の IP からの失敗で本人が
+    # 締め出されないよう、アドレスだけでは数えない
+    data = request.get_json(silent=True)
+    email = data.get('email') if isinstance(data, dict) else None
+    if not isinstance(email, str) or not email.strip():
+        return None
+    return f'{email.strip().lower()}:{request.remote_addr}'
+
+
+def _too_many_requests(retry_after):
+    response = jsonify({'error': 'Too many requests'})
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response, 429
+
+
+def rate_limit(policy, key=by_user):
+    # REST 用。jwt_required() の内側に付け、超過時は DB に触れず 429 を返す
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            allowed, retry_after = get_rate_limiter().check(
+                policy, key(*args, **kwargs)
+            )
+            if not allowed:
+                return _too_many_requests(retry_after)
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def rate_limit_failures(policy, key=by_user, failure_status=401):
+    # 失敗(failure_status の応答)だけを数える REST 用の制限。枠が残っているかを
+    # 先に調べて尽きていれば 429 を返し、成功した呼び出しでは消費しない
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = get_rate_limiter()
+            limit_key = key(*args, **kwargs)
+            allowed, retry_after = limiter.check(policy, limit_key, cost=0)
+            if not allowed:
+                return _too_many_requests(retry_after)
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == failure_status:
+                limiter.check(policy, limit_key)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def socket_rate_limit(policy, key=by_user):
+    # Socket.IO 用。超過時は送信元にだけ error を返してハンドラーを実行しない
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            allowed, retry_after = get_rate_limiter().check(
+                policy, key(*args, **kwargs)
+            )
+            if not allowed:
+                emit(
+                    'error',
+                    {
+                        'error': 'Rate limit exceeded',
+                        'retry_after': round(retry_after, 3),
+                    },
+                    to=request.sid,
+                )
+                return
+            return handler(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def init_rate_limiter(app):
+    backend_name = app.config['RATE_LIMIT_BACKEND']
+    if backend_name == 'memory':
+        backend = MemoryRateLimitBackend(max_keys=app.config['RATE_LIMIT_MAX_KEYS'])
+    elif backend_name == 'redis':
+        backend = RedisRateLimitBackend(app.config['RATE_LIMIT_URL'])
+    else:
+        raise ValueError(f'Unknown rate limit backend: {backend_name}')
+
+    app.extensions['rate_limiter'] = RateLimiter(
+        backend,
+        app.config['RATE_LIMITS'],
+        enabled=app.config['RATE_LIMIT_ENABLED'],
+    )
+
+
+def get_rate_limiter():
+    return current_app.extensions['rate_limiter']
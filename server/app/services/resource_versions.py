@@ -0,0 +1,73 @@
+import hashlib
+
+from flask import current_app, request
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.models import ResourceVersion
+
+
+def event_key(event_id):
+    return f'event:{event_id}'
+
+
+def user_key(user_id, resource):
+    return f'user:{user_id}:{resource}'
+
+
+def _increment_statement():
+    table = ResourceVersion.__table__
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        insert = postgresql.insert(table)
+    elif dialect == 'sqlite':
+        insert = sqlite.insert(table)
+    else:
+        raise NotImplementedError(f'bump_versions is not supported on {dialect}')
+    return insert.on_conflict_do_update(
+        index_elements=[table.c.key], set_={'version': table.c.version + 1}
+    )
+
+
+def bump_versions(keys, connection=None):
+    # 書き込みと同じトランザクションでカウンタを進める。
+    # キー順に更新してデッドロックを避ける
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    executor = connection if connection is not None else db.session
+    executor.execute(
+        _increment_statement(), [{'key': key, 'version': 1} for key in keys]
+    )
+
+
+def get_versions(keys):
+    rows = db.session.query(ResourceVersion.key, ResourceVersion.version).filter(
+        ResourceVersion.key.in_(keys)
+    )
+    versions = {key: 0 for key in keys}
+    versions.update({row.key: row.version for row in rows})
+    return versions
+
+
+def compute_etag(keys, *extra):
+    # データ本体は読まず、カウンタ(と範囲などのパラメータ)だけから ETag を作る
+    versions = get_versions(keys)
+    parts = [f'{key}={versions[key]}' for key in sorted(versions)]
+    parts += [str(value) for value in extra]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def check_not_modified(keys, *extra):
+    # (etag, 304レスポンス or None) を返す。None のときは通常どおり応答を組み立てる
+    etag = compute_etag(keys, *extra)
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag, weak=True)
+        return etag, response
+    return etag, None
+
+
+def tag_response(response, etag):
+    response.set_etag(etag, weak=True)
+    return response
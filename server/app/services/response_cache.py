@@ -0,0 +1,137 @@
+import json
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    # プロセス内の LRU。ttl を過ぎたエントリは参照時に取り除く
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+class RedisCacheBackend:
+    # ワーカー/インスタンス間で共有するキャッシュ。redis パッケージが必要
+    def __init__(self, url, prefix='calendar-chat:cache:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+
+class NullCacheBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+
+class ResponseCache:
+    # 組み立て済みのレスポンスを (validator, payload) で保持する。
+    # validator には ETag を使い、他のワーカーでの更新も検出できるようにする
+    def __init__(self, backend, ttl=30):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def get_or_load(self, namespace, key, validator, loader):
+        cache_key = f'{namespace}:{key}'
+        try:
+            entry = self.backend.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Response cache read failed: {str(e)}")
+            entry = None
+
+        if entry is not None and entry[0] == validator:
+            self.hits[namespace] += 1
+            return entry[1]
+
+        self.misses[namespace] += 1
+        payload = loader()
+        try:
+            self.backend.set(cache_key, [validator, payload], self.ttl)
+        except Exception as e:
+            logger.warning(f"Response cache write failed: {str(e)}")
+        return payload
+
+    def invalidate(self, namespace, *keys):
+        try:
+            self.backend.delete(*[f'{namespace}:{key}' for key in keys])
+        except Exception as e:
+            logger.warning(f"Response cache invalidation failed: {str(e)}")
+
+    def stats(self):
+        return {
+            namespace: {
+                'hits': self.hits[namespace],
+                'misses': self.misses[namespace],
+            }
+            for namespace in sorted(set(self.hits) | set(self.misses))
+        }
+
+
+def init_response_cache(app):
+    backend_name = app.config['RESPONSE_CACHE_BACKEND']
+    if backend_name == 'memory':
+        backend = MemoryCacheBackend(max_size=app.config['RESPONSE_CACHE_SIZE'])
+    elif backend_name == 'redis':
+        backend = RedisCacheBackend(app.config['RESPONSE_CACHE_URL'])
+    elif backend_name == 'none':
+        backend = NullCacheBackend()
+    else:
+        raise ValueError(f'Unknown response cache backend: {backend_name}')
+
+    app.extensions['response_cache'] = ResponseCache(
+        backend, ttl=app.config['RESPONSE_CACHE_TTL']
+    )
+
+
+def get_response_cache():
+    return current_app.extensions['response_cache']
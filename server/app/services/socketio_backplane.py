@@ -0,0 +1,86 @@
+import threading
+
+from socketio import PubSubManager
+
+
+class LocalBroker:
+    # 同一プロセス内のサーバー同士をつなぐ pub/sub。テストやローカル検証用
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel, queue):
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(queue)
+
+    def unsubscribe(self, channel, queue):
+        with self._lock:
+            queues = self._subscribers.get(channel, [])
+            if queue in queues:
+                queues.remove(queue)
+
+    def publish(self, channel, message):
+        with self._lock:
+            queues = list(self._subscribers.get(channel, []))
+        for queue in queues:
+            queue.put(message)
+
+
+_local_brokers = {}
+
+
+def get_local_broker(url):
+    return _local_brokers.setdefault(url, LocalBroker())
+
+
+class LocalPubSubManager(PubSubManager):
+    name = 'local'
+
+    def __init__(
+        self, url='local://', channel='flask-socketio', write_only=False, logger=None
+    ):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.broker = get_local_broker(url)
+        self.queue = None
+
+    def initialize(self):
+        if not self.write_only:
+            # 非同期モード(gevent/threading)に合わせたキューを使う
+            self.queue = self.server.eio.create_queue()
+            self.broker.subscribe(self.channel, self.queue)
+        super().initialize()
+
+    def close(self):
+        # 購読をやめてリスナーを止める。同じプロセスでアプリを作り直す場合に使う
+        if self.queue is not None:
+            self.broker.unsubscribe(self.channel, self.queue)
+            self.queue = None
+        thread = getattr(self, 'thread', None)
+        if thread is not None and hasattr(thread, 'kill'):
+            thread.kill()
+        self.thread = None
+
+    def _publish(self, data):
+        self.broker.publish(self.channel, self.json.dumps(data))
+
+    def _listen(self):
+        while True:
+            yield self.queue.get()
+
+
+def socketio_options(config):
+    url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    channel = config.get('SOCKETIO_CHANNEL')
+    options = {'transports': config.get('SOCKETIO_TRANSPORTS')}
+
+    # init_app の設定は SocketIO インスタンスに残るため、未使用時も明示的に打ち消す
+    if not url:
+        options.update(client_manager=None, message_queue=None)
+    elif url.startswith('local://'):
+        options.update(
+            client_manager=LocalPubSubManager(url, channel=channel),
+            message_queue=None,
+        )
+    else:
+        options.update(message_queue=url, channel=channel)
+    return options
@@ -0,0 +1,161 @@
+import threading
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import and_, case, exists, func, or_
+
+from app.models import db, User
+from app.models.user_model import friends_association_table
+
+SIMILARITY_THRESHOLD = 0.3
+
+
+def _trigrams(text, pad_end=True):
+    # pg_trgm と同じく先頭に空白2つ、末尾に空白1つを付けて3-gramを作る
+    padded = f'  {text.lower()}' + (' ' if pad_end else '')
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class NgramIndex:
+    def __init__(self):
+        self._postings = defaultdict(set)
+        self._usernames = {}
+        self._max_user_id = 0
+        self._lock = threading.Lock()
+
+    def add(self, user_id, username):
+        self._usernames[user_id] = username
+        for gram in _trigrams(username):
+            self._postings[gram].add(user_id)
+        self._max_user_id = max(self._max_user_id, user_id)
+
+    def sync(self):
+        # 他のワーカーで登録されたユーザーも含め、未取り込み分だけを読み込む
+        with self._lock:
+            rows = (
+                db.session.query(User.id, User.username)
+                .filter(User.id > self._max_user_id)
+                .order_by(User.id)
+                .all()
+            )
+            for row in rows:
+                self.add(row.id, row.username)
+
+    def rank(self, query):
+        needle = query.lower()
+        grams = _trigrams(query, pad_end=False)
+
+        hits = defaultdict(int)
+        for gram in grams:
+            for user_id in self._postings.get(gram, ()):
+                hits[user_id] += 1
+        if len(needle) < 3:
+            # 先頭の 3-gram では前方一致しか拾えないため、短い語は Postgres の
+            # ILIKE '%query%' と同じく部分一致で候補を集める
+            for user_id, username in self._usernames.items():
+                if needle in username.lower():
+                    hits.setdefault(user_id, 0)
+
+        ranked = []
+        for user_id, count in hits.items():
+            username = self._usernames[user_id].lower()
+            similarity = count / len(grams)
+            if username == needle:
+                tier = 0
+            elif username.startswith(needle):
+                tier = 1
+            elif needle in username:
+                tier = 2
+            elif len(needle) >= 3 and similarity >= SIMILARITY_THRESHOLD:
+                tier = 3
+            else:
+                continue
+            ranked.append((tier, -similarity, len(username), username, user_id))
+
+        ranked.sort()
+        return [entry[-1] for entry in ranked]
+
+
+def _not_friend_of(user_id):
+    return ~exists().where(
+        and_(
+            friends_association_table.c.user_id == user_id,
+            friends_association_table.c.friend_id == User.id,
+        )
+    )
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def resolve_search_limit(limit):
+    default = current_app.config['USER_SEARCH_LIMIT']
+    maximum = current_app.config['USER_SEARCH_MAX_LIMIT']
+    if limit is None:
+        return default
+    return max(1, min(int(limit), maximum))
+
+
+def _search_postgresql(query, current_user_id, limit):
+    escaped = _escape_like(query)
+    prefix_match = User.username.ilike(f'{escaped}%', escape='\\')
+    substring_match = User.username.ilike(f'%{escaped}%', escape='\\')
+
+    rows = (
+        db.session.query(User.id, User.username)
+        .filter(
+            User.id != current_user_id,
+            or_(substring_match, User.username.op('%')(query)),
+            _not_friend_of(current_user_id),
+        )
+        .order_by(
+            case((func.lower(User.username) == query.lower(), 0), else_=1),
+            case((prefix_match, 0), else_=1),
+            func.similarity(User.username, query).desc(),
+            User.username,
+        )
+        .limit(limit)
+        .all()
+    )
+    return [{'id': row.id, 'username': row.username} for row in rows]
+
+
+def _get_ngram_index():
+    index = current_app.extensions.get('user_search_index')
+    if index is None:
+        index = current_app.extensions['user_search_index'] = NgramIndex()
+    return index
+
+
+def _search_ngram_index(query, current_user_id, limit):
+    index = _get_ngram_index()
+    index.sync()
+    ranked_ids = [
+        user_id for user_id in index.rank(query) if user_id != current_user_id
+    ]
+
+    # フレンドを除外すると件数が減るため、上位候補から順にまとめて確認する
+    results = []
+    batch_size = limit * 4
+    for start in range(0, len(ranked_ids), batch_size):
+        batch = ranked_ids[start : start + batch_size]
+        rows = (
+            db.session.query(User.id, User.username)
+            .filter(User.id.in_(batch), _not_friend_of(current_user_id))
+            .all()
+        )
+        usernames = {row.id: row.username for row in rows}
+        for user_id in batch:
+            if user_id in usernames:
+                results.append({'id': user_id, 'username': usernames[user_id]})
+                if len(results) == limit:
+                    return results
+    return results
+
+
+def search_users_by_name(query, current_user_id, limit=None):
+    limit = resolve_search_limit(limit)
+    if db.engine.dialect.name == 'postgresql':
+        return _search_postgresql(query, current_user_id, limit)
+    return _search_ngram_index(query, current_user_id, limit)
@@ -0,0 +1,24 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+
+
+def _unique_columns(table, constraint_name):
+    for constraint in table.constraints:
+        if constraint.name == constraint_name:
+            return [column.name for column in constraint.columns]
+    raise ValueError(f'{table.name} has no constraint named {constraint_name}')
+
+
+def insert_ignore(table, constraint_name):
+    # 一意制約に衝突した行は無視する INSERT (ON CONFLICT DO NOTHING)
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing(
+            constraint=constraint_name
+        )
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing(
+            index_elements=_unique_columns(table, constraint_name)
+        )
+    raise NotImplementedError(f'insert_ignore is not supported on {dialect}')
@@ -0,0 +1,200 @@
+import calendar
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app.utils.time_utils import local_to_utc_naive, to_utc_naive
+
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+MAX_COUNT = 1000
+_UNTIL = re.compile(r'^(\d{8})(?:T(\d{6})Z)?$')
+
+RecurrenceRule = namedtuple(
+    'RecurrenceRule', ['freq', 'interval', 'count', 'until', 'byday']
+)
+
+
+class InvalidRecurrence(ValueError):
+    pass
+
+
+def parse_rule(value, tz_name):
+    # RFC 5545 の RRULE のうち FREQ(DAILY/WEEKLY/MONTHLY)、INTERVAL、COUNT、
+    # UNTIL、BYDAY(WEEKLY のみ)に対応する。UNTIL は UTC の naive datetime にする
+    if not isinstance(value, str) or not value.strip():
+        raise InvalidRecurrence('Recurrence rule is empty')
+    parts = {}
+    for part in value.strip().upper().removeprefix('RRULE:').split(';'):
+        key, _, part_value = part.partition('=')
+        if not part_value or key in parts:
+            raise InvalidRecurrence(f'Invalid recurrence rule: {value}')
+        parts[key] = part_value
+
+    unknown = set(parts) - {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL', 'BYDAY'}
+    if unknown:
+        names = ', '.join(sorted(unknown))
+        raise InvalidRecurrence(f'Unsupported rule parts: {names}')
+
+    freq = parts.get('FREQ')
+    if freq not in FREQUENCIES:
+        raise InvalidRecurrence(f'Unsupported FREQ: {freq}')
+    try:
+        interval = int(parts.get('INTERVAL', 1))
+        count = int(parts['COUNT']) if 'COUNT' in parts else None
+    except ValueError:
+        raise InvalidRecurrence('INTERVAL and COUNT must be integers')
+    if interval < 1 or (count is not None and not 1 <= count <= MAX_COUNT):
+        raise InvalidRecurrence('Invalid INTERVAL or COUNT')
+    if count is not None and 'UNTIL' in parts:
+        raise InvalidRecurrence('COUNT and UNTIL are mutually exclusive')
+
+    until = None
+    if 'UNTIL' in parts:
+        match = _UNTIL.match(parts['UNTIL'])
+        try:
+            if match is None:
+                raise ValueError
+            if match.group(2):
+                until = datetime.strptime(''.join(match.groups()), '%Y%m%d%H%M%S')
+            else:
+                # 日付のみの UNTIL は現地のその日の終わりまでを含む
+                day = datetime.strptime(match.group(1), '%Y%m%d')
+                until = local_to_utc_naive(day + timedelta(days=1), tz_name)
+                until -= timedelta(microseconds=1)
+        except ValueError:
+            raise InvalidRecurrence(f'Invalid UNTIL: {parts["UNTIL"]}')
+
+    byday = None
+    if 'BYDAY' in parts:
+        if freq != 'WEEKLY':
+            raise InvalidRecurrence('BYDAY is only supported with FREQ=WEEKLY')
+        days = parts['BYDAY'].split(',')
+        if any(day not in WEEKDAYS for day in days):
+            raise InvalidRecurrence(f'Invalid BYDAY: {parts["BYDAY"]}')
+        byday = tuple(sorted({WEEKDAYS.index(day) for day in days}))
+
+    return RecurrenceRule(freq, interval, count, until, byday)
+
+
+def format_rule(rule):
+    parts = [f'FREQ={rule.freq}']
+    if rule.interval != 1:
+        parts.append(f'INTERVAL={rule.interval}')
+    if rule.byday:
+        parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in rule.byday))
+    if rule.count is not None:
+        parts.append(f'COUNT={rule.count}')
+    if rule.until is not None:
+        parts.append(f'UNTIL={rule.until:%Y%m%dT%H%M%S}Z')
+    return ';'.join(parts)
+
+
+def _to_local(value, tz):
+    return value.replace(tzinfo=timezone.utc).astimezone(tz).replace(tzinfo=None)
+
+
+def _month_index(value):
+    return value.year * 12 + value.month - 1
+
+
+def _period(rule, first, p):
+    # p 番目の周期に含まれる現地時刻の候補を返す
+    if rule.freq == 'DAILY':
+        return [first + timedelta(days=p * rule.interval)]
+    if rule.freq == 'WEEKLY':
+        monday = first.date() - timedelta(days=first.weekday())
+        week = monday + timedelta(weeks=p * rule.interval)
+        days = rule.byday or (first.weekday(),)
+        return [
+            datetime.combine(week + timedelta(days=day), first.time()) for day in days
+        ]
+    index = _month_index(first) + p * rule.interval
+    year, month = divmod(index, 12)
+    if first.day > calendar.monthrange(year, month + 1)[1]:
+        # 31日など、その月に存在しない日は飛ばす
+        return []
+    return [first.replace(year=year, month=month + 1)]
+
+
+def _skip_periods(rule, first, after):
+    # COUNT がなければ番号を数える必要がないため、after より前の周期を飛ばす
+    if rule.count is not None or after is None or after <= first:
+        return 0
+    if rule.freq == 'DAILY':
+        periods = (after - first).days // rule.interval
+    elif rule.freq == 'WEEKLY':
+        monday = first.date() - timedelta(days=first.weekday())
+        periods = (after.date() - monday).days // (7 * rule.interval)
+    else:
+        periods = (_month_index(after) - _month_index(first)) // rule.interval
+    return max(0, periods - 1)
+
+
+def iter_starts(rule, starts_at, tz_name, after=None):
+    # 各回の開始時刻を UTC の naive datetime で順に返す。繰り返しは現地時刻で
+    # 数えるため、夏時間があっても同じ時刻に開催される
+    tz = ZoneInfo(tz_name)
+    first = _to_local(starts_at, tz)
+    p = _skip_periods(rule, first, _to_local(after, tz) if after else None)
+    produced = 0
+    while True:
+        for candidate in _period(rule, first, p):
+            if candidate < first:
+                continue
+            start = to_utc_naive(candidate.replace(tzinfo=tz))
+            if rule.until is not None and start > rule.until:
+                return
+            yield start
+            produced += 1
+            if rule.count is not None and produced >= rule.count:
+                return
+        p += 1
+
+
+def series_end(rule, starts_at, ends_at, tz_name):
+    # 最後の回の終了時刻。無期限なら None
+    duration = ends_at - starts_at
+    if rule.count is not None:
+        last = starts_at
+        for last in iter_starts(rule, starts_at, tz_name):
+            pass
+        return last + duration
+    if rule.until is not None:
+        return rule.until + duration
+    return None
+
+
+def is_occurrence(rule, starts_at, tz_name, value):
+    for start in iter_starts(rule, starts_at, tz_name, after=value):
+        if start >= value:
+            return start == value
+    return False
+
+
+def occurrences(
+    rule, starts_at, ends_at, window_start, window_end, tz_name, exceptions=None
+):
+    # [window_start, window_end) と重なる回を (元の開始, 開始, 終了) で返す。
+    # exceptions は元の開始時刻ごとの (cancelled, starts_at, ends_at)
+    exceptions = exceptions or {}
+    duration = ends_at - starts_at
+    result = []
+    for start in iter_starts(rule, starts_at, tz_name, after=window_start - duration):
+        if start >= window_end:
+            break
+        if start + duration <= window_start:
+            continue
+        if start not in exceptions:
+            result.append((start, start, start + duration))
+
+    for original, (cancelled, moved_start, moved_end) in exceptions.items():
+        if cancelled:
+            continue
+        moved_start = moved_start or original
+        moved_end = moved_end or moved_start + duration
+        # 範囲外から移動してきた回も含める
+        if moved_start < window_end and moved_end > window_start:
+            result.append((original, moved_start, moved_end))
+    return sorted(result, key=lambda occurrence: occurrence[1])
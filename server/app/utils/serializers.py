@@ -0,0 +1,14 @@
+def isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def serialize_rows(query, formatters=None):
+    # カラム指定のクエリ結果をそのまま dict に変換する(ORM オブジェクトを生成しない)
+    formatters = formatters or {}
+    return [
+        {
+            key: formatters[key](value) if key in formatters else value
+            for key, value in row._mapping.items()
+        }
+        for row in query
+    ]
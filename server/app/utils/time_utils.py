@@ -0,0 +1,98 @@
+import re
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+_JAPANESE_TIMES = [
+    (re.compile(r'(\d{1,2})時半'), r'\1:30'),
+    (re.compile(r'(\d{1,2})時(\d{2})分?'), r'\1:\2'),
+    (re.compile(r'(\d{1,2})時'), r'\1:00'),
+]
+_TIME = r'(\d{1,2})(?::(\d{2}))?'
+_MEETING_TIME = re.compile(rf'^\s*{_TIME}\s*(?:[-~〜～–]\s*{_TIME})?\s*$')
+
+
+def _to_time(hour, minute):
+    hour = int(hour)
+    minute = int(minute or 0)
+    if hour == 24 and minute == 0:
+        return time(0, 0)
+    if hour > 23 or minute > 59:
+        raise ValueError
+    return time(hour, minute)
+
+
+def parse_meeting_time(value):
+    # '18:00'、'18時'、'18:00-20:00'、'18時〜20時半' などの自由入力から
+    # (開始, 終了 or None) を取り出す。'未定' など解釈できなければ None
+    if not value:
+        return None
+    value = value.replace('：', ':')
+    for pattern, replacement in _JAPANESE_TIMES:
+        value = pattern.sub(replacement, value)
+    match = _MEETING_TIME.match(value)
+    if not match:
+        return None
+    try:
+        start = _to_time(match.group(1), match.group(2))
+        end = (
+            _to_time(match.group(3), match.group(4))
+            if match.group(3) is not None
+            else None
+        )
+    except ValueError:
+        return None
+    return start, end
+
+
+def to_utc_naive(value):
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def as_utc(value):
+    # naive な値は UTC とみなす。timezone=True のカラムへ書き込むときに使う
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def utc_naive(value):
+    # SQLite は naive、Postgres は aware で返すため、読み出し時にそろえる
+    if value is None or value.tzinfo is None:
+        return value
+    return to_utc_naive(value)
+
+
+def format_utc(value):
+    return as_utc(value).isoformat() if value is not None else None
+
+
+def local_to_utc_naive(value, tz_name):
+    # naive な現地時刻を UTC の naive datetime にする
+    return to_utc_naive(value.replace(tzinfo=ZoneInfo(tz_name)))
+
+
+def event_interval(event_date, meeting_time, tz_name, default_minutes):
+    # 予定が占める時間を UTC の naive datetime の [start, end) で返す。
+    # event_date はクライアントの現地日付の 0 時を UTC にしたもの、
+    # meeting_time は現地の時刻のため、tz_name のタイムゾーンで組み合わせる
+    if event_date is None:
+        return None
+    tz = ZoneInfo(tz_name)
+    local_date = event_date.replace(tzinfo=timezone.utc).astimezone(tz).date()
+
+    parsed = parse_meeting_time(meeting_time)
+    if parsed is None:
+        # 時刻が未定の予定は現地の一日をふさぐ
+        start = datetime.combine(local_date, time(0, 0), tz)
+        return to_utc_naive(start), to_utc_naive(start + timedelta(days=1))
+
+    start = datetime.combine(local_date, parsed[0], tz)
+    if parsed[1] is None:
+        end = start + timedelta(minutes=default_minutes)
+    else:
+        end = datetime.combine(local_date, parsed[1], tz)
+        if end <= start:
+            end += timedelta(days=1)
+    return to_utc_naive(start), to_utc_naive(end)
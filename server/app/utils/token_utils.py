@@ -1,16 +1,119 @@
 import logging
-from app import jwt
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import current_app
+from app import db, jwt
+from app.models import RevokedToken
 
 logging.basicConfig(level=logging.INFO)
 
-BLACKLIST = set()
+
+def _utc_from_timestamp(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+class MemoryRevocationStore:
+    # 単一プロセス・テスト用。期限切れのエントリは参照時に取り除く
+    def __init__(self):
+        self._revoked = {}
+
+    def revoke(self, jti, expires_at):
+        self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti, expires_at):
+        revoked_until = self._revoked.get(jti)
+        if revoked_until is None:
+            return False
+        if revoked_until <= time.time():
+            del self._revoked[jti]
+            return False
+        return True
+
+
+class DatabaseRevocationStore:
+    # ワーカー間で共有され、再起動後も失効情報が残る
+    def revoke(self, jti, expires_at):
+        now = datetime.utcnow()
+        RevokedToken.query.filter(RevokedToken.expires_at <= now).delete()
+        db.session.merge(
+            RevokedToken(jti=jti, expires_at=_utc_from_timestamp(expires_at))
+        )
+        db.session.commit()
+
+    def is_revoked(self, jti, expires_at):
+        return (
+            db.session.query(RevokedToken.jti)
+            .filter(
+                RevokedToken.jti == jti,
+                RevokedToken.expires_at > datetime.utcnow(),
+            )
+            .first()
+            is not None
+        )
+
+
+class CachedRevocationStore:
+    # 失効済みは期限まで、未失効は短いTTLの間だけキャッシュしてDB参照を減らす
+    def __init__(self, backend, max_size=10000, ttl=5):
+        self.backend = backend
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, jti, revoked, valid_until):
+        with self._lock:
+            self._entries[jti] = (revoked, valid_until)
+            self._entries.move_to_end(jti)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def revoke(self, jti, expires_at):
+        self.backend.revoke(jti, expires_at)
+        self._remember(jti, True, expires_at)
+
+    def is_revoked(self, jti, expires_at):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(jti)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+
+        revoked = self.backend.is_revoked(jti, expires_at)
+        self._remember(jti, revoked, expires_at if revoked else now + self.ttl)
+        return revoked
+
+
+REVOCATION_BACKENDS = {
+    'memory': MemoryRevocationStore,
+    'database': DatabaseRevocationStore,
+}
+
+
+def init_revocation_store(app):
+    backend_name = app.config['TOKEN_REVOCATION_BACKEND']
+    if backend_name not in REVOCATION_BACKENDS:
+        raise ValueError(f'Unknown token revocation backend: {backend_name}')
+
+    app.extensions['token_revocation'] = CachedRevocationStore(
+        REVOCATION_BACKENDS[backend_name](),
+        max_size=app.config['TOKEN_REVOCATION_CACHE_SIZE'],
+        ttl=app.config['TOKEN_REVOCATION_CACHE_TTL'],
+    )
+
+
+def get_revocation_store():
+    return current_app.extensions['token_revocation']
 
 
-def revoke_token(jti):
-    BLACKLIST.add(jti)
+def revoke_token(jti, expires_at):
+    get_revocation_store().revoke(jti, expires_at)
 
 
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blacklist(jwt_header, jwt_payload):
     jti = jwt_payload.get('jti')
-    return jti in BLACKLIST
+    return get_revocation_store().is_revoked(jti, jwt_payload.get('exp'))
@@ -0,0 +1,113 @@
+import argparse
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import create_app, db
+from benchmarks.dataset import DEFAULT_SIZES, seed_dataset
+from benchmarks.runner import run_benchmark
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='合成データを投入し、HTTP と Socket.IO の負荷試験を行う',
+    )
+    parser.add_argument(
+        '--database-url',
+        help='省略時は一時ディレクトリの SQLite。既存のテーブルは作り直される',
+    )
+    for name, default in DEFAULT_SIZES.items():
+        parser.add_argument(f'--{name.replace("_", "-")}', type=int, default=default)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--config',
+        action='append',
+        default=[],
+        metavar='KEY=VALUE',
+        help='アプリの設定を上書きする。例: --config RESPONSE_CACHE_BACKEND=none',
+    )
+    parser.add_argument('--output', help='結果の JSON の保存先')
+    return parser.parse_args()
+
+
+def _parse_config(pairs):
+    config = {}
+    for pair in pairs:
+        key, _, value = pair.partition('=')
+        try:
+            config[key] = json.loads(value)
+        except ValueError:
+            config[key] = value
+    return config
+
+
+def main():
+    args = parse_args()
+    database_url = args.database_url
+    if not database_url:
+        database_url = f'sqlite:///{tempfile.mkdtemp()}/benchmark.db'
+
+    app = create_app(
+        {
+            'SQLALCHEMY_DATABASE_URI': database_url,
+            'METRICS_ENABLED': True,
+            # 計測中のログ出力がレイテンシに影響しないようにする
+            'SLOW_QUERY_THRESHOLD_MS': float('inf'),
+            **_parse_config(args.config),
+        }
+    )
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    sizes = {name: getattr(args, name) for name in DEFAULT_SIZES}
+    with app.app_context():
+        db.drop_all()
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            db.session.commit()
+        db.create_all()
+        dataset = seed_dataset(sizes, seed=args.seed)
+
+    results = run_benchmark(
+        app,
+        dataset,
+        clients=args.clients,
+        iterations=args.iterations,
+        messages=args.messages,
+        seed=args.seed,
+    )
+    results['meta']['config'] = _parse_config(args.config)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = datetime.now().strftime('%Y%m%d-%H%M%S')
+        if results['meta']['git_commit']:
+            name += f'-{results["meta"]["git_commit"]}'
+        output = os.path.join(RESULTS_DIR, f'{name}.json')
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    print(f'{"scenario":40} {"rps":>9} {"p50":>8} {"p95":>8} {"p99":>8} {"q/req":>6}')
+    for name, result in results['scenarios'].items():
+        latency = result['latency_ms']
+        print(
+            f'{name:40} {result["throughput_rps"]:>9} {latency["p50"]:>8} '
+            f'{latency["p95"]:>8} {latency["p99"]:>8} '
+            f'{result.get("queries_per_request", "-"):>6}'
+        )
+    print(f'saved: {output}')
+
+
+if __name__ == '__main__':
+    main()
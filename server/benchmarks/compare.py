@@ -0,0 +1,71 @@
+import argparse
+import json
+
+
+def compare(before, after):
+    # シナリオごとの p95 とクエリ数の変化を返す
+    rows = []
+    for name in sorted(set(before['scenarios']) | set(after['scenarios'])):
+        old = before['scenarios'].get(name)
+        new = after['scenarios'].get(name)
+        if old is None or new is None:
+            rows.append(
+                {'scenario': name, 'status': 'added' if old is None else 'removed'}
+            )
+            continue
+        old_p95 = old['latency_ms']['p95']
+        new_p95 = new['latency_ms']['p95']
+        rows.append(
+            {
+                'scenario': name,
+                'p95_before': old_p95,
+                'p95_after': new_p95,
+                'p95_change_pct': (
+                    round((new_p95 - old_p95) / old_p95 * 100, 1) if old_p95 else None
+                ),
+                'queries_before': old.get('queries_per_request'),
+                'queries_after': new.get('queries_per_request'),
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.compare', description='2つの結果を比較する'
+    )
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=20.0,
+        help='p95 がこの割合(%%)以上悪化したシナリオがあれば終了コード1を返す',
+    )
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    regressed = False
+    for row in compare(before, after):
+        if 'status' in row:
+            print(f'{row["scenario"]:40} {row["status"]}')
+            continue
+        change = row['p95_change_pct']
+        flag = ''
+        if change is not None and change >= args.threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        print(
+            f'{row["scenario"]:40} p95 {row["p95_before"]} -> {row["p95_after"]} '
+            f'({change}%) queries {row["queries_before"]} -> {row["queries_after"]}'
+            f'{flag}'
+        )
+    raise SystemExit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
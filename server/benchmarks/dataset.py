@@ -0,0 +1,163 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import db
+from app.models import (
+    Event,
+    EventInvite,
+    EventParticipant,
+    FriendRequest,
+    Message,
+    User,
+    UserCalendarEntry,
+)
+from app.models.user_model import friends_association_table
+
+DEFAULT_SIZES = {
+    'users': 200,
+    'friends_per_user': 20,
+    'friend_requests_per_user': 3,
+    'events': 300,
+    'participants_per_event': 5,
+    'invites_per_event': 5,
+    'messages_per_event': 50,
+}
+
+START_DATE = datetime(2024, 10, 1)
+DATE_RANGE_DAYS = 90
+
+
+def _insert(table, rows, chunk_size=1000):
+    for i in range(0, len(rows), chunk_size):
+        db.session.execute(table.insert(), rows[i : i + chunk_size])
+
+
+def seed_dataset(sizes=None, seed=0):
+    # ベンチマーク用の合成データを一括 INSERT で作る。テーブルは空である前提
+    sizes = {**DEFAULT_SIZES, **(sizes or {})}
+    rng = random.Random(seed)
+
+    user_ids = list(range(1, sizes['users'] + 1))
+    _insert(
+        User.__table__,
+        [
+            {
+                'id': user_id,
+                'username': f'user{user_id}',
+                'email': f'user{user_id}@example.com',
+                'password_hash': 'x',
+            }
+            for user_id in user_ids
+        ],
+    )
+
+    friends = {user_id: set() for user_id in user_ids}
+    for user_id in user_ids:
+        count = min(sizes['friends_per_user'], len(user_ids) - 1)
+        for friend_id in rng.sample(user_ids, count + 1):
+            if friend_id != user_id and len(friends[user_id]) < count:
+                friends[user_id].add(friend_id)
+                friends[friend_id].add(user_id)
+    _insert(
+        friends_association_table,
+        [
+            {'user_id': user_id, 'friend_id': friend_id}
+            for user_id, friend_ids in friends.items()
+            for friend_id in friend_ids
+        ],
+    )
+
+    friend_requests = []
+    for user_id in user_ids:
+        strangers = [
+            other
+            for other in rng.sample(user_ids, min(len(user_ids), 50))
+            if other != user_id and other not in friends[user_id]
+        ]
+        for sender_id in strangers[: sizes['friend_requests_per_user']]:
+            friend_requests.append(
+                {'sender_id': sender_id, 'receiver_id': user_id, 'status': 'pending'}
+            )
+    _insert(FriendRequest.__table__, friend_requests)
+
+    events, participants, invites, calendar, messages = [], [], [], [], []
+    participations = {user_id: [] for user_id in user_ids}
+    for event_id in range(1, sizes['events'] + 1):
+        creator_id = rng.choice(user_ids)
+        event_date = START_DATE + timedelta(
+            days=rng.randrange(DATE_RANGE_DAYS), hours=rng.randrange(9, 21)
+        )
+        events.append(
+            {
+                'id': event_id,
+                'event_name': f'event{event_id}',
+                'event_date': event_date,
+                'meeting_time': f'{event_date.hour}:00',
+                'meeting_place': 'Tokyo',
+                'description': 'benchmark',
+                'created_by': creator_id,
+            }
+        )
+
+        candidates = sorted(friends[creator_id])
+        rng.shuffle(candidates)
+        member_ids = [creator_id] + candidates[: sizes['participants_per_event']]
+        invitee_ids = candidates[
+            sizes['participants_per_event'] : sizes['participants_per_event']
+            + sizes['invites_per_event']
+        ]
+
+        for user_id in member_ids:
+            participations[user_id].append(event_id)
+            participants.append({'event_id': event_id, 'user_id': user_id})
+            calendar.append(
+                {
+                    'user_id': user_id,
+                    'event_id': event_id,
+                    'event_name': f'event{event_id}',
+                    'event_date': event_date,
+                }
+            )
+        invites += [
+            {'event_id': event_id, 'user_id': user_id, 'status': 'pending'}
+            for user_id in invitee_ids
+        ]
+        for i in range(sizes['messages_per_event']):
+            messages.append(
+                {
+                    'id': str(uuid.UUID(int=rng.getrandbits(128))),
+                    'event_id': event_id,
+                    'user_id': rng.choice(member_ids),
+                    'message': f'message {i}',
+                    'timestamp': event_date - timedelta(minutes=i),
+                }
+            )
+
+    _insert(Event.__table__, events)
+    _insert(EventParticipant.__table__, participants)
+    _insert(EventInvite.__table__, invites)
+    _insert(UserCalendarEntry.__table__, calendar)
+    _insert(Message.__table__, messages)
+
+    if db.engine.dialect.name == 'postgresql':
+        # id を明示して入れたため、シーケンスを追いつかせる
+        for table in ('user', 'event'):
+            db.session.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                    f'(SELECT MAX(id) FROM "{table}"))'
+                )
+            )
+    db.session.commit()
+
+    return {
+        'sizes': sizes,
+        'participations': {
+            user_id: event_ids
+            for user_id, event_ids in participations.items()
+            if event_ids
+        },
+    }
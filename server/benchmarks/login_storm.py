@@ -0,0 +1,195 @@
+# ログインが集中している間のチャットの遅延を測る。本番の gevent ワーカーと同じく
+# 1スレッドの greenlet で動かすため、アプリを読み込む前に monkey patch する
+if __name__ == '__main__':
+    from gevent import monkey
+
+    monkey.patch_all()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import logging  # noqa: E402
+import os  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+from datetime import datetime, timezone  # noqa: E402
+
+import gevent  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import create_app, db, socketio  # noqa: E402
+from app.models import Event, EventParticipant, User  # noqa: E402
+from benchmarks.runner import _git_commit, summarize  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+PASSWORD = 'benchmark-password'
+
+
+def seed_users(count, method):
+    # ハッシュは1回だけ計算して全員で使い回す
+    password_hash = generate_password_hash(PASSWORD, method)
+    users = [
+        User(
+            username=f'storm{i}',
+            email=f'storm{i}@example.com',
+            password_hash=password_hash,
+        )
+        for i in range(count)
+    ]
+    db.session.add_all(users)
+    db.session.flush()
+    event = Event(
+        event_name='storm',
+        event_date=datetime(2024, 10, 1),
+        created_by=users[0].id,
+    )
+    db.session.add(event)
+    db.session.flush()
+    db.session.add(EventParticipant(event_id=event.id, user_id=users[0].id))
+    db.session.commit()
+    return [user.email for user in users], users[0].id, event.id
+
+
+def run_login_storm(app, emails, chat_user_id, event_id, options):
+    # concurrency 個の greenlet がログインを繰り返す間、別の greenlet が
+    # interval 秒ごとにメッセージを送る。チャットの遅延は「送るはずだった時刻」
+    # からの時間で測るため、イベントループが止まっていた時間も含まれる
+    login_samples = []
+    chat_samples = []
+    errors = {'login': 0, 'chat': 0}
+    remaining = [options['logins']]
+
+    def login_worker(worker):
+        with app.app_context():
+            client = app.test_client()
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                email = emails[(remaining[0] + worker) % len(emails)]
+                started = time.perf_counter()
+                response = client.post(
+                    '/auth/login', json={'email': email, 'password': PASSWORD}
+                )
+                if response.status_code == 200:
+                    login_samples.append((time.perf_counter() - started) * 1000)
+                else:
+                    errors['login'] += 1
+                gevent.sleep(0)
+
+    def chat_sender():
+        with app.app_context():
+            client = app.test_client()
+            client.set_cookie(
+                'access_token_cookie', create_access_token(identity=chat_user_id)
+            )
+            socket_client = socketio.test_client(app, flask_test_client=client)
+            socket_client.emit('join_event_chat', {'event_id': event_id})
+            socket_client.get_received()
+            scheduled = time.perf_counter()
+            for i in range(options['messages']):
+                scheduled += options['interval']
+                gevent.sleep(max(0, scheduled - time.perf_counter()))
+                socket_client.emit(
+                    'send_message', {'event_id': event_id, 'message': f'storm {i}'}
+                )
+                if any(
+                    packet['name'] == 'error' for packet in socket_client.get_received()
+                ):
+                    errors['chat'] += 1
+                else:
+                    chat_samples.append((time.perf_counter() - scheduled) * 1000)
+            socket_client.disconnect()
+
+    started = time.perf_counter()
+    greenlets = [gevent.spawn(chat_sender)] + [
+        gevent.spawn(login_worker, worker) for worker in range(options['concurrency'])
+    ]
+    gevent.joinall(greenlets, raise_error=True)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'chat': summarize(chat_samples, errors['chat'], elapsed),
+        'login': summarize(login_samples, errors['login'], elapsed),
+    }
+
+
+def _run_mode(workers, logins, args):
+    path = os.path.join(tempfile.mkdtemp(), 'login_storm.db')
+    app = create_app(
+        {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+            'PASSWORD_HASH_METHOD': args.method,
+            'PASSWORD_HASH_WORKERS': workers,
+            'PASSWORD_HASH_MAX_QUEUE': args.concurrency,
+            'RATE_LIMIT_ENABLED': False,
+            'SLOW_QUERY_THRESHOLD_MS': float('inf'),
+        }
+    )
+    with app.app_context():
+        db.create_all()
+        emails, chat_user_id, event_id = seed_users(args.users, args.method)
+    options = {
+        'logins': logins,
+        'concurrency': args.concurrency,
+        'messages': args.messages,
+        'interval': args.interval_ms / 1000,
+    }
+    return run_login_storm(app, emails, chat_user_id, event_id, options)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.login_storm',
+        description='ログイン集中時のチャットの遅延を、ハッシュ計算をその場で'
+        '行う場合とスレッドプールで行う場合とで比べる',
+    )
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--logins', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--interval-ms', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--method', default='pbkdf2:sha256:600000')
+    parser.add_argument('--output', help='結果の JSON の保存先')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    modes = {
+        'idle': _run_mode(args.workers, 0, args),
+        'inline': _run_mode(0, args.logins, args),
+        'threadpool': _run_mode(args.workers, args.logins, args),
+    }
+    results = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_commit': _git_commit(),
+            'method': args.method,
+            'workers': args.workers,
+            'logins': args.logins,
+            'concurrency': args.concurrency,
+            'messages': args.messages,
+            'interval_ms': args.interval_ms,
+        },
+        'modes': modes,
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = datetime.now().strftime('login-storm-%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f'{name}.json')
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    print(f'{"mode":12} {"chat p50":>9} {"chat p95":>9} {"chat p99":>9} {"login/s":>8}')
+    for name, result in modes.items():
+        latency = result['chat']['latency_ms']
+        print(
+            f'{name:12} {latency["p50"]:>9} {latency["p95"]:>9} '
+            f'{latency["p99"]:>9} {result["login"]["throughput_rps"] or "-":>8}'
+        )
+    print(f'saved: {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+import platform
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask_jwt_extended import create_access_token
+
+from app import db, socketio
+
+# (メトリクスのキー, URL を作る関数)。キーは app.services.metrics の集計キーと同じ
+HTTP_SCENARIOS = [
+    ('GET /user/friends', lambda ctx: '/user/friends'),
+    ('GET /user/event-invites', lambda ctx: '/user/event-invites'),
+    ('GET /friend/requests', lambda ctx: '/friend/requests'),
+    (
+        'GET /event/user/calendar',
+        lambda ctx: '/event/user/calendar?year=2024&month=10&months=2',
+    ),
+    (
+        'GET /event/<int:event_id>/detail',
+        lambda ctx: f'/event/{ctx["event_id"]}/detail',
+    ),
+    (
+        'GET /event/<int:event_id>/messages',
+        lambda ctx: f'/event/{ctx["event_id"]}/messages?limit=50',
+    ),
+    ('GET /user/search', lambda ctx: f'/user/search?query=user{ctx["search"]}'),
+]
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(samples, errors, elapsed):
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'p50': _round(percentile(samples, 50)),
+            'p95': _round(percentile(samples, 95)),
+            'p99': _round(percentile(samples, 99)),
+            'mean': _round(sum(samples) / len(samples)) if samples else None,
+            'max': _round(max(samples)) if samples else None,
+        },
+    }
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+def _git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except Exception:
+        return None
+
+
+class _Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, duration_ms, ok):
+        with self._lock:
+            self.samples.setdefault(name, [])
+            self.errors.setdefault(name, 0)
+            if ok:
+                self.samples[name].append(duration_ms)
+            else:
+                self.errors[name] += 1
+
+
+def _timed(recorder, name, func):
+    started = time.perf_counter()
+    try:
+        ok = func()
+    except Exception:
+        ok = False
+    recorder.record(name, (time.perf_counter() - started) * 1000, ok)
+
+
+def _run_client(app, user_id, event_ids, options, recorder, rng):
+    with app.app_context():
+        client = app.test_client()
+        client.set_cookie('access_token_cookie', create_access_token(identity=user_id))
+        ctx = {'event_id': rng.choice(event_ids), 'search': rng.randrange(1, 100)}
+
+        for _ in range(options['iterations']):
+            for name, url in HTTP_SCENARIOS:
+                _timed(
+                    recorder,
+                    name,
+                    lambda: client.get(url(ctx)).status_code < 400,
+                )
+
+        if options['messages']:
+            socket_client = socketio.test_client(app, flask_test_client=client)
+
+            def join():
+                socket_client.emit('join_event_chat', {'event_id': ctx['event_id']})
+                return not any(
+                    packet['name'] == 'error' for packet in socket_client.get_received()
+                )
+
+            _timed(recorder, 'socket join_event_chat', join)
+            for i in range(options['messages']):
+
+                def send():
+                    socket_client.emit(
+                        'send_message',
+                        {'event_id': ctx['event_id'], 'message': f'bench {i}'},
+                    )
+                    return not any(
+                        packet['name'] == 'error'
+                        for packet in socket_client.get_received()
+                    )
+
+                _timed(recorder, 'socket send_message', send)
+            socket_client.disconnect()
+
+        db.session.remove()
+
+
+def run_benchmark(app, dataset, clients=8, iterations=20, messages=20, seed=0):
+    # 参加イベントのあるユーザーを同時接続のクライアントとして動かし、
+    # クライアント側のレイテンシとサーバー側のクエリ数を集計する
+    rng = random.Random(seed)
+    participations = dataset['participations']
+    user_ids = rng.sample(sorted(participations), min(clients, len(participations)))
+    options = {'iterations': iterations, 'messages': messages}
+    recorder = _Recorder()
+
+    threads = [
+        threading.Thread(
+            target=_run_client,
+            args=(
+                app,
+                user_id,
+                participations[user_id],
+                options,
+                recorder,
+                random.Random(rng.random()),
+            ),
+        )
+        for user_id in user_ids
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    server = app.extensions['metrics'].snapshot()
+    server_stats = {**server['requests']}
+    server_stats.update(
+        {f'socket {name}': stats for name, stats in server['socket_events'].items()}
+    )
+
+    scenarios = {}
+    for name in sorted(recorder.samples):
+        result = summarize(recorder.samples[name], recorder.errors[name], elapsed)
+        stats = server_stats.get(name)
+        if stats and stats['latency_ms']['count']:
+            result['queries_per_request'] = round(
+                stats['queries'] / stats['latency_ms']['count'], 2
+            )
+        scenarios[name] = result
+
+    all_samples = [value for values in recorder.samples.values() for value in values]
+    with app.app_context():
+        dialect = db.engine.dialect.name
+
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'database': dialect,
+            'dataset': dataset['sizes'],
+            'clients': len(user_ids),
+            'iterations': iterations,
+            'messages': messages,
+            'elapsed_seconds': round(elapsed, 3),
+        },
+        'total': summarize(all_samples, sum(recorder.errors.values()), elapsed),
+        'scenarios': scenarios,
+    }
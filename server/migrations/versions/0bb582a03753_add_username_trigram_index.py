@@ -0,0 +1,34 @@
+"""Add username trigram index
+
+Revision ID: 0bb582a03753
+Revises: 1068edc1d733
+Create Date: 2026-10-18 11:03:27.118452
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0bb582a03753'
+down_revision = '1068edc1d733'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite では通常のインデックスになり、検索はアプリ側の n-gram インデックスを使う
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    op.create_index(
+        'ix_user_username_trgm',
+        'user',
+        ['username'],
+        postgresql_using='gin',
+        postgresql_ops={'username': 'gin_trgm_ops'},
+    )
+
+
+def downgrade():
+    op.drop_index('ix_user_username_trgm', table_name='user')
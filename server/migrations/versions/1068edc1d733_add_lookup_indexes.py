@@ -0,0 +1,84 @@
+"""Add lookup indexes
+
+Revision ID: 1068edc1d733
+Revises: d388083e8060
+Create Date: 2026-10-18 10:12:04.512301
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1068edc1d733'
+down_revision = 'd388083e8060'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 一意制約を追加する前に既存の重複行を取り除く
+    op.execute(
+        'DELETE FROM event_participant WHERE id NOT IN '
+        '(SELECT MIN(id) FROM event_participant GROUP BY event_id, user_id)'
+    )
+    op.execute(
+        'CREATE TABLE friends_dedup AS '
+        'SELECT DISTINCT user_id, friend_id FROM friends'
+    )
+    op.execute('DELETE FROM friends')
+    op.execute(
+        'INSERT INTO friends (user_id, friend_id) '
+        'SELECT user_id, friend_id FROM friends_dedup'
+    )
+    op.drop_table('friends_dedup')
+
+    with op.batch_alter_table('event_participant') as batch_op:
+        batch_op.create_unique_constraint(
+            'unique_event_participant', ['event_id', 'user_id']
+        )
+    with op.batch_alter_table('friends') as batch_op:
+        batch_op.create_unique_constraint(
+            'unique_friends_pair', ['user_id', 'friend_id']
+        )
+
+    op.create_index(
+        'ix_event_created_by_event_date', 'event', ['created_by', 'event_date']
+    )
+    op.create_index(
+        'ix_event_invite_user_id_status', 'event_invite', ['user_id', 'status']
+    )
+    op.create_index(
+        'ix_event_participant_user_id', 'event_participant', ['user_id']
+    )
+    op.create_index(
+        'ix_message_event_id_timestamp', 'message', ['event_id', 'timestamp', 'id']
+    )
+    op.create_index(
+        'ix_friend_request_receiver_id_status',
+        'friend_request',
+        ['receiver_id', 'status'],
+    )
+    op.create_index(
+        'ix_friend_request_sender_id_receiver_id',
+        'friend_request',
+        ['sender_id', 'receiver_id'],
+    )
+    op.create_index('ix_friends_friend_id', 'friends', ['friend_id'])
+
+
+def downgrade():
+    op.drop_index('ix_friends_friend_id', table_name='friends')
+    op.drop_index(
+        'ix_friend_request_sender_id_receiver_id', table_name='friend_request'
+    )
+    op.drop_index('ix_friend_request_receiver_id_status', table_name='friend_request')
+    op.drop_index('ix_message_event_id_timestamp', table_name='message')
+    op.drop_index('ix_event_participant_user_id', table_name='event_participant')
+    op.drop_index('ix_event_invite_user_id_status', table_name='event_invite')
+    op.drop_index('ix_event_created_by_event_date', table_name='event')
+
+    with op.batch_alter_table('friends') as batch_op:
+        batch_op.drop_constraint('unique_friends_pair', type_='unique')
+    with op.batch_alter_table('event_participant') as batch_op:
+        batch_op.drop_constraint('unique_event_participant', type_='unique')
@@ -0,0 +1,33 @@
+"""Widen user password hash
+
+Revision ID: 4f6a2c8e1d37
+Revises: b7d3e1c5a824
+Create Date: 2026-10-19 01:04:41.208519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f6a2c8e1d37'
+down_revision = 'b7d3e1c5a824'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # scrypt のハッシュは 128 文字に収まらない
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=128),
+               type_=sa.String(length=255),
+               existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=255),
+               type_=sa.String(length=128),
+               existing_nullable=False)
@@ -0,0 +1,167 @@
+"""Add event time range
+
+Revision ID: 5c1f7a9d2e43
+Revises: 37e29956bd1e
+Create Date: 2026-10-18 21:40:11.204583
+
+"""
+import re
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1f7a9d2e43'
+down_revision = '37e29956bd1e'
+branch_labels = None
+depends_on = None
+
+# このリビジョン時点の設定とロジックを固定したもの。アプリ側の変更や
+# 実行時の設定でデータ移行の結果が変わらないよう、ここでは import しない
+TZ_NAME = 'Asia/Tokyo'
+DEFAULT_MINUTES = 120
+
+_JAPANESE_TIMES = [
+    (re.compile(r'(\d{1,2})時半'), r'\1:30'),
+    (re.compile(r'(\d{1,2})時(\d{2})分?'), r'\1:\2'),
+    (re.compile(r'(\d{1,2})時'), r'\1:00'),
+]
+_TIME = r'(\d{1,2})(?::(\d{2}))?'
+_MEETING_TIME = re.compile(rf'^\s*{_TIME}\s*(?:[-~〜～–]\s*{_TIME})?\s*$')
+
+
+def _to_time(hour, minute):
+    hour = int(hour)
+    minute = int(minute or 0)
+    if hour == 24 and minute == 0:
+        return time(0, 0)
+    if hour > 23 or minute > 59:
+        raise ValueError
+    return time(hour, minute)
+
+
+def _parse_meeting_time(value):
+    if not value:
+        return None
+    value = value.replace('：', ':')
+    for pattern, replacement in _JAPANESE_TIMES:
+        value = pattern.sub(replacement, value)
+    match = _MEETING_TIME.match(value)
+    if not match:
+        return None
+    try:
+        start = _to_time(match.group(1), match.group(2))
+        end = (
+            _to_time(match.group(3), match.group(4))
+            if match.group(3) is not None
+            else None
+        )
+    except ValueError:
+        return None
+    return start, end
+
+
+def _to_utc_naive(value):
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _event_interval(event_date, meeting_time):
+    tz = ZoneInfo(TZ_NAME)
+    local_date = event_date.replace(tzinfo=timezone.utc).astimezone(tz).date()
+
+    parsed = _parse_meeting_time(meeting_time)
+    if parsed is None:
+        start = datetime.combine(local_date, time(0, 0), tz)
+        return _to_utc_naive(start), _to_utc_naive(start + timedelta(days=1))
+
+    start = datetime.combine(local_date, parsed[0], tz)
+    if parsed[1] is None:
+        end = start + timedelta(minutes=DEFAULT_MINUTES)
+    else:
+        end = datetime.combine(local_date, parsed[1], tz)
+        if end <= start:
+            end += timedelta(days=1)
+    return _to_utc_naive(start), _to_utc_naive(end)
+
+
+def upgrade():
+    op.add_column('event', sa.Column('starts_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('event', sa.Column('ends_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_event_starts_at_ends_at', 'event', ['starts_at', 'ends_at'], unique=False)
+    op.add_column('user_calendar_entry', sa.Column('starts_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('user_calendar_entry', sa.Column('ends_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_user_calendar_entry_user_id_starts_at', 'user_calendar_entry', ['user_id', 'starts_at'], unique=False)
+
+    # 既存の event_date + meeting_time(自由入力)から時間帯を求める
+    bind = op.get_bind()
+    event = sa.table(
+        'event',
+        sa.column('id', sa.Integer),
+        sa.column('event_date', sa.DateTime),
+        sa.column('meeting_time', sa.String),
+        sa.column('starts_at', sa.DateTime(timezone=True)),
+        sa.column('ends_at', sa.DateTime(timezone=True)),
+    )
+    rows = bind.execute(
+        sa.select(event.c.id, event.c.event_date, event.c.meeting_time).where(
+            event.c.event_date.isnot(None)
+        )
+    ).fetchall()
+    updates = []
+    for row in rows:
+        starts_at, ends_at = _event_interval(row.event_date, row.meeting_time)
+        updates.append({'event_id': row.id, 'starts_at': starts_at, 'ends_at': ends_at})
+    if updates:
+        bind.execute(
+            event.update()
+            .where(event.c.id == sa.bindparam('event_id'))
+            .values(starts_at=sa.bindparam('starts_at'), ends_at=sa.bindparam('ends_at')),
+            updates,
+        )
+
+    op.execute(
+        """
+        UPDATE user_calendar_entry
+        SET starts_at = (SELECT event.starts_at FROM event WHERE event.id = user_calendar_entry.event_id),
+            ends_at = (SELECT event.ends_at FROM event WHERE event.id = user_calendar_entry.event_id)
+        """
+    )
+
+    # created_at は JST(+09:00、夏時間なし)の壁時計時刻で保存されていたため
+    # UTC に直す。どちらの DB でも Asia/Tokyo 固定で変換する
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            "ALTER TABLE event ALTER COLUMN created_at TYPE TIMESTAMP WITH TIME ZONE "
+            f"USING created_at AT TIME ZONE '{TZ_NAME}'"
+        )
+    else:
+        op.execute(
+            "UPDATE event SET created_at = datetime(created_at, '-9 hours') "
+            "WHERE created_at IS NOT NULL"
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            "ALTER TABLE event ALTER COLUMN created_at TYPE TIMESTAMP WITHOUT TIME ZONE "
+            f"USING created_at AT TIME ZONE '{TZ_NAME}'"
+        )
+    else:
+        op.execute(
+            "UPDATE event SET created_at = datetime(created_at, '+9 hours') "
+            "WHERE created_at IS NOT NULL"
+        )
+
+    op.drop_index('ix_user_calendar_entry_user_id_starts_at', table_name='user_calendar_entry')
+    with op.batch_alter_table('user_calendar_entry') as batch_op:
+        batch_op.drop_column('ends_at')
+        batch_op.drop_column('starts_at')
+    op.drop_index('ix_event_starts_at_ends_at', table_name='event')
+    with op.batch_alter_table('event') as batch_op:
+        batch_op.drop_column('ends_at')
+        batch_op.drop_column('starts_at')
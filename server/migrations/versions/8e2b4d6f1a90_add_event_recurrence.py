@@ -0,0 +1,42 @@
+"""Add event recurrence
+
+Revision ID: 8e2b4d6f1a90
+Revises: 5c1f7a9d2e43
+Create Date: 2026-10-18 22:31:47.660138
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e2b4d6f1a90'
+down_revision = '5c1f7a9d2e43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('event', sa.Column('recurrence_rule', sa.String(length=200), nullable=True))
+    op.add_column('event', sa.Column('series_ends_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('user_calendar_entry', sa.Column('recurrence_rule', sa.String(length=200), nullable=True))
+    op.add_column('user_calendar_entry', sa.Column('series_ends_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_table('event_occurrence_exception',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('occurrence_start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('cancelled', sa.Boolean(), nullable=False),
+    sa.Column('starts_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('ends_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['event.id'], ),
+    sa.PrimaryKeyConstraint('event_id', 'occurrence_start', name='pk_event_occurrence_exception')
+    )
+
+
+def downgrade():
+    op.drop_table('event_occurrence_exception')
+    with op.batch_alter_table('user_calendar_entry') as batch_op:
+        batch_op.drop_column('series_ends_at')
+        batch_op.drop_column('recurrence_rule')
+    with op.batch_alter_table('event') as batch_op:
+        batch_op.drop_column('series_ends_at')
+        batch_op.drop_column('recurrence_rule')
@@ -0,0 +1,37 @@
+"""Add iCalendar feed token and event UID
+
+Revision ID: b7d3e1c5a824
+Revises: 8e2b4d6f1a90
+Create Date: 2026-10-18 23:12:05.318472
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e1c5a824'
+down_revision = '8e2b4d6f1a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_feed_token',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('token_hash', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id'),
+    sa.UniqueConstraint('token_hash')
+    )
+    with op.batch_alter_table('event') as batch_op:
+        batch_op.add_column(sa.Column('ical_uid', sa.String(length=255), nullable=True))
+        batch_op.create_unique_constraint('unique_event_creator_ical_uid', ['created_by', 'ical_uid'])
+
+
+def downgrade():
+    with op.batch_alter_table('event') as batch_op:
+        batch_op.drop_constraint('unique_event_creator_ical_uid', type_='unique')
+        batch_op.drop_column('ical_uid')
+    op.drop_table('calendar_feed_token')
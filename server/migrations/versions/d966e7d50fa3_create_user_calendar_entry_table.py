@@ -0,0 +1,50 @@
+"""Create user calendar entry table
+
+Revision ID: d966e7d50fa3
+Revises: bd0d64664c8b
+Create Date: 2026-10-18 13:05:27.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd966e7d50fa3'
+down_revision = 'bd0d64664c8b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_calendar_entry',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('event_name', sa.String(length=100), nullable=False),
+    sa.Column('event_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['event.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'event_id', name='pk_user_calendar_entry')
+    )
+    op.create_index('ix_user_calendar_entry_user_id_event_date', 'user_calendar_entry', ['user_id', 'event_date'], unique=False)
+    op.create_index('ix_user_calendar_entry_event_id', 'user_calendar_entry', ['event_id'], unique=False)
+
+    # 既存の参加者・作成者からカレンダーを作る(UNION で重複を除く)
+    op.execute(
+        """
+        INSERT INTO user_calendar_entry (user_id, event_id, event_name, event_date)
+        SELECT event_participant.user_id, event.id, event.event_name, event.event_date
+        FROM event_participant
+        JOIN event ON event.id = event_participant.event_id
+        UNION
+        SELECT event.created_by, event.id, event.event_name, event.event_date
+        FROM event
+        WHERE event.created_by IS NOT NULL
+        """
+    )
+
+
+def downgrade():
+    op.drop_index('ix_user_calendar_entry_event_id', table_name='user_calendar_entry')
+    op.drop_index('ix_user_calendar_entry_user_id_event_date', table_name='user_calendar_entry')
+    op.drop_table('user_calendar_entry')
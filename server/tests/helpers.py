@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+from flask_jwt_extended import create_access_token, get_csrf_token
+from sqlalchemy import event
+from app import db
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        counter.statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def login(client, user_id):
+    # アクセストークンを Cookie に設定し、変更系のリクエストに付ける CSRF ヘッダーを返す
+    token = create_access_token(identity=user_id)
+    client.set_cookie('access_token_cookie', token)
+    return {'X-CSRF-TOKEN': get_csrf_token(token)}
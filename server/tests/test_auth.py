@@ -1,8 +1,22 @@
+import time
 import unittest
 from datetime import timedelta
-from flask_jwt_extended import create_access_token
+from unittest import mock
+from flask_jwt_extended import create_access_token, get_csrf_token
+from werkzeug.security import check_password_hash, generate_password_hash
 from app import create_app, db
+from app.models import RevokedToken
 from app.models.user_model import User
+from app.services.password_hasher import (
+    PasswordHasher,
+    PasswordHasherBusy,
+    hash_prefix,
+)
+from app.utils.token_utils import (
+    CachedRevocationStore,
+    DatabaseRevocationStore,
+    MemoryRevocationStore,
+)
 
 
 class TestAuth(unittest.TestCase):
@@ -89,6 +103,40 @@ class TestAuth(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn('Logout successful', response.get_json()['message'])
 
+    def test_revoked_token_is_rejected(self):
+        with self.app.app_context():
+            token = create_access_token(identity=1)
+            csrf_token = get_csrf_token(token)
+
+        self.client.set_cookie('access_token_cookie', token)
+        response = self.client.post(
+            '/auth/logout', headers={'X-CSRF-TOKEN': csrf_token}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(RevokedToken.query.count(), 1)
+
+        # 別ワーカーを想定し、キャッシュを持たない新しいストアでも失効を検知する
+        self.client.set_cookie('access_token_cookie', token)
+        self.app.extensions['token_revocation'] = CachedRevocationStore(
+            DatabaseRevocationStore()
+        )
+        response = self.client.get('/auth/protected')
+        self.assertEqual(response.status_code, 401)
+
+    def test_revocation_entries_expire(self):
+        store = CachedRevocationStore(MemoryRevocationStore(), max_size=2, ttl=60)
+        now = time.time()
+
+        store.revoke('expired', now - 1)
+        store.revoke('active', now + 60)
+        self.assertFalse(store.is_revoked('expired', now - 1))
+        self.assertTrue(store.is_revoked('active', now + 60))
+
+        store.is_revoked('other-1', now + 60)
+        store.is_revoked('other-2', now + 60)
+        self.assertLessEqual(len(store._entries), 2)
+        self.assertTrue(store.is_revoked('active', now + 60))
+
     def test_token_expiry(self):
         with self.app.app_context():
             token = create_access_token(identity=1, expires_delta=timedelta(seconds=1))
@@ -113,6 +161,65 @@ class TestAuth(unittest.TestCase):
         self.assertTrue(db_user.check_password('password'))
         self.assertNotEqual(db_user.password_hash, 'password')
 
+    def test_login_rehashes_with_configured_method(self):
+        user = User(username='testuser', email='test@example.com')
+        user.password_hash = generate_password_hash('password', 'pbkdf2:sha256:1000')
+        db.session.add(user)
+        db.session.commit()
+
+        self.app.extensions['password_hasher'] = PasswordHasher('pbkdf2:sha256:2000')
+        response = self.client.post(
+            '/auth/login', json={'email': 'test@example.com', 'password': 'password'}
+        )
+        self.assertEqual(response.status_code, 200)
+        password_hash = User.query.get(user.id).password_hash
+        self.assertTrue(password_hash.startswith('pbkdf2:sha256:2000$'))
+        self.assertTrue(check_password_hash(password_hash, 'password'))
+
+    def test_needs_rehash_accepts_methods_without_cost(self):
+        for method in (
+            'scrypt',
+            'scrypt:16384:8:1',
+            'pbkdf2',
+            'pbkdf2:sha256',
+            'pbkdf2:sha256:1000',
+        ):
+            self.assertEqual(
+                hash_prefix(method),
+                generate_password_hash('', method).split('$', 1)[0],
+            )
+
+        hasher = PasswordHasher('scrypt', workers=0)
+        scrypt_hash = generate_password_hash('password', 'scrypt')
+        pbkdf2_hash = generate_password_hash('password', 'pbkdf2:sha256:1000')
+        # ログイン中に判定するため、ハッシュの計算はしない
+        with mock.patch(
+            'app.services.password_hasher.generate_password_hash'
+        ) as generate:
+            self.assertFalse(hasher.needs_rehash(scrypt_hash))
+            self.assertTrue(hasher.needs_rehash(pbkdf2_hash))
+        generate.assert_not_called()
+
+    def test_login_is_rejected_when_hasher_queue_is_full(self):
+        user = User(username='testuser', email='test@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+
+        hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, max_queue=0)
+        hasher._pending = 1
+        self.app.extensions['password_hasher'] = hasher
+        response = self.client.post(
+            '/auth/login', json={'email': 'test@example.com', 'password': 'password'}
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        with self.assertRaises(PasswordHasherBusy):
+            hasher.hash('password')
+
+        hasher._pending = 0
+        self.assertTrue(hasher.verify(hasher.hash('password'), 'password'))
+
 
 if __name__ == '__main__':
     unittest.main()
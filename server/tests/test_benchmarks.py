@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from app.models import EventParticipant, User, UserCalendarEntry
+from benchmarks.compare import compare
+from benchmarks.dataset import seed_dataset
+from benchmarks.login_storm import run_login_storm, seed_users
+from benchmarks.runner import percentile, run_benchmark
+
+TINY_DATASET = {
+    'users': 12,
+    'friends_per_user': 4,
+    'friend_requests_per_user': 1,
+    'events': 6,
+    'participants_per_event': 2,
+    'invites_per_event': 1,
+    'messages_per_event': 3,
+}
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def setUp(self):
+        # クライアントはスレッドごとに接続するため、ファイルの SQLite を使う
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.app = create_app(
+            {
+                'TESTING': True,
+                'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            }
+        )
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+        self.dataset = seed_dataset(TINY_DATASET)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.ctx.pop()
+        os.remove(self.db_path)
+
+    def test_seed_dataset(self):
+        self.assertEqual(User.query.count(), 12)
+        self.assertEqual(
+            UserCalendarEntry.query.count(), EventParticipant.query.count()
+        )
+        for user_id, event_ids in self.dataset['participations'].items():
+            self.assertTrue(event_ids)
+
+    def test_run_benchmark_reports_latency_and_queries(self):
+        results = run_benchmark(
+            self.app, self.dataset, clients=2, iterations=1, messages=2
+        )
+
+        self.assertEqual(results['total']['errors'], 0)
+        detail = results['scenarios']['GET /event/<int:event_id>/detail']
+        self.assertEqual(detail['requests'], 2)
+        self.assertEqual(
+            set(detail['latency_ms']), {'p50', 'p95', 'p99', 'mean', 'max'}
+        )
+        self.assertGreater(detail['queries_per_request'], 0)
+        self.assertEqual(results['scenarios']['socket send_message']['requests'], 4)
+
+        rows = compare(results, results)
+        self.assertTrue(all(row['p95_change_pct'] in (0, None) for row in rows))
+
+    def test_login_storm_reports_chat_and_login_latency(self):
+        self.app.extensions['rate_limiter'].enabled = False
+        emails, user_id, event_id = seed_users(3, 'pbkdf2:sha256:1000')
+        results = run_login_storm(
+            self.app,
+            emails,
+            user_id,
+            event_id,
+            {'logins': 4, 'concurrency': 2, 'messages': 3, 'interval': 0},
+        )
+
+        self.assertEqual(results['login']['requests'], 4)
+        self.assertEqual(results['chat']['requests'], 3)
+        self.assertEqual(results['login']['errors'] + results['chat']['errors'], 0)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50.5)
+        self.assertAlmostEqual(percentile(values, 99), 99.01)
+        self.assertIsNone(percentile([], 50))
+
+
+if __name__ == '__main__':
+    unittest.main()
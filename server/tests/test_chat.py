@@ -0,0 +1,480 @@
+import unittest
+import uuid
+from datetime import datetime
+from unittest import mock
+from sqlalchemy.exc import OperationalError
+from flask_jwt_extended import create_access_token
+from app import create_app, db, socketio
+from app.models import Event, EventParticipant, Message, User
+from tests.helpers import count_queries, login
+
+
+class ChatTestCase(unittest.TestCase):
+    config = {}
+
+    def setUp(self):
+        self.app = create_app(
+            {
+                'TESTING': True,
+                'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                **self.config,
+            }
+        )
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.user = User(username='owner', email='owner@example.com', password_hash='x')
+        db.session.add(self.user)
+        db.session.commit()
+
+        self.event = Event(
+            event_name='chat', event_date=datetime(2024, 10, 1), created_by=self.user.id
+        )
+        db.session.add(self.event)
+        db.session.commit()
+        db.session.add(EventParticipant(event_id=self.event.id, user_id=self.user.id))
+        db.session.commit()
+
+    def tearDown(self):
+        self.app.extensions['message_writer'].close()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _connect(self, user):
+        client = self.app.test_client()
+        token = create_access_token(
+            identity=user.id, additional_claims={'username': user.username}
+        )
+        client.set_cookie('access_token_cookie', token)
+        socket_client = socketio.test_client(self.app, flask_test_client=client)
+        socket_client.emit('join_event_chat', {'event_id': self.event.id})
+        return socket_client
+
+    def _send(self, socket_client, text):
+        socket_client.emit('send_message', {'event_id': self.event.id, 'message': text})
+
+    def _received(self, socket_client, name):
+        return [
+            packet['args'][0]
+            for packet in socket_client.get_received()
+            if packet['name'] == name
+        ]
+
+
+class TestSyncMessages(ChatTestCase):
+    def test_message_is_saved_before_broadcast(self):
+        socket_client = self._connect(self.user)
+        self._send(socket_client, 'hello')
+
+        received = self._received(socket_client, 'receive_message')
+        self.assertEqual([m['message'] for m in received], ['hello'])
+        self.assertEqual(Message.query.get(received[0]['id']).message, 'hello')
+
+
+class TestChatMembership(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.outsider = User(
+            username='outsider', email='outsider@example.com', password_hash='x'
+        )
+        db.session.add(self.outsider)
+        db.session.commit()
+
+    def test_send_message_needs_no_queries_after_join(self):
+        socket_client = self._connect(self.user)
+
+        with count_queries() as counter:
+            self._send(socket_client, 'hello')
+
+        # RevokedToken の確認もキャッシュされるため、メッセージの INSERT のみになる
+        self.assertEqual(
+            [s.split()[0] for s in counter.statements],
+            ['INSERT'],
+            counter.statements,
+        )
+        received = self._received(socket_client, 'receive_message')
+        self.assertEqual(received[0]['user'], 'owner')
+
+    def test_non_participant_cannot_join_or_send(self):
+        socket_client = self._connect(self.outsider)
+        self.assertEqual(
+            self._received(socket_client, 'error'),
+            [{'message': 'Unauthorized to join this chat'}],
+        )
+
+        self._send(socket_client, 'intrusion')
+        self.assertEqual(
+            self._received(socket_client, 'error'),
+            [{'error': 'Unauthorized to send message'}],
+        )
+        self.assertEqual(Message.query.count(), 0)
+
+    def test_leave_and_delete_invalidate_membership(self):
+        socket_client = self._connect(self.user)
+        socket_client.emit('leave_room', {'event_id': self.event.id})
+        self._send(socket_client, 'after leave')
+        self.assertEqual(len(self._received(socket_client, 'error')), 1)
+
+        socket_client.emit('join_event_chat', {'event_id': self.event.id})
+        client = self.app.test_client()
+        headers = login(client, self.user.id)
+        response = client.delete(
+            f'/event/{self.event.id}/delete',
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self._send(socket_client, 'after delete')
+        self.assertEqual(len(self._received(socket_client, 'error')), 1)
+        self.assertEqual(Message.query.count(), 0)
+
+    def test_disconnect_clears_membership(self):
+        socket_client = self._connect(self.user)
+        membership = self.app.extensions['chat_membership']
+        self.assertEqual(len(membership._connections), 1)
+
+        socket_client.disconnect()
+        self.assertEqual(membership._connections, {})
+        self.assertEqual(dict(membership._event_sids), {})
+
+
+class TestReconnectReplay(ChatTestCase):
+    config = {'CHAT_REPLAY_BUFFER_SIZE': 3, 'CHAT_REPLAY_MAX_MESSAGES': 2}
+
+    def _rejoin(self, last_cursor):
+        socket_client = self._connect(self.user)
+        socket_client.get_received()
+        socket_client.emit(
+            'join_event_chat', {'event_id': self.event.id, 'last_cursor': last_cursor}
+        )
+        return self._received(socket_client, 'missed_messages')
+
+    def test_replays_from_buffer_without_reading_messages(self):
+        sender = self._connect(self.user)
+        for text in ['one', 'two', 'three']:
+            self._send(sender, text)
+        cursors = [m['cursor'] for m in self._received(sender, 'receive_message')]
+
+        with count_queries() as counter:
+            replay = self._rejoin(cursors[0])
+        self.assertFalse(
+            [s for s in counter.statements if 'FROM message' in s], counter.statements
+        )
+        self.assertEqual(
+            [m['message'] for m in replay[0]['messages']], ['two', 'three']
+        )
+        self.assertEqual(replay[0]['source'], 'buffer')
+        self.assertFalse(replay[0]['has_more'])
+
+        self.assertEqual(self._rejoin(cursors[-1])[0]['messages'], [])
+
+    def test_falls_back_to_database_when_buffer_is_too_short(self):
+        sender = self._connect(self.user)
+        for text in ['one', 'two', 'three', 'four']:
+            self._send(sender, text)
+        cursors = [m['cursor'] for m in self._received(sender, 'receive_message')]
+
+        # バッファは直近3件のみのため、最初のカーソルからは DB を読む
+        replay = self._rejoin(cursors[0])[0]
+        self.assertEqual(replay['source'], 'database')
+        self.assertEqual([m['message'] for m in replay['messages']], ['two', 'three'])
+        self.assertTrue(replay['has_more'])
+
+        replay = self._rejoin(replay['messages'][-1]['cursor'])[0]
+        self.assertEqual([m['message'] for m in replay['messages']], ['four'])
+        self.assertFalse(replay['has_more'])
+
+    def test_cursor_from_event_detail_and_invalid_cursor(self):
+        self._send(self._connect(self.user), 'hello')
+        self.app.extensions['chat_replay'].discard(str(self.event.id))
+
+        client = self.app.test_client()
+        login(client, self.user.id)
+        detail = client.get(f'/event/{self.event.id}/detail').get_json()
+        self.assertEqual(
+            self._rejoin(detail['messages'][-1]['cursor'])[0]['messages'], []
+        )
+
+        socket_client = self._connect(self.user)
+        socket_client.emit(
+            'join_event_chat', {'event_id': self.event.id, 'last_cursor': 'broken'}
+        )
+        self.assertEqual(
+            self._received(socket_client, 'error'), [{'message': 'Invalid cursor'}]
+        )
+
+
+class TestCoalescedBroadcasts(ChatTestCase):
+    config = {
+        'CHAT_BROADCAST_MODE': 'coalesce',
+        'CHAT_BROADCAST_WINDOW_MS': 20,
+        'CHAT_BROADCAST_MAX_BATCH': 3,
+    }
+
+    def test_messages_in_window_are_sent_as_one_frame(self):
+        socket_client = self._connect(self.user)
+        socket_client.get_received()
+        self._send(socket_client, 'first')
+        self._send(socket_client, 'second')
+        self.assertEqual(socket_client.get_received(), [])
+
+        socketio.sleep(0.1)
+        batches = self._received(socket_client, 'receive_messages')
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(
+            [m['message'] for m in batches[0]['messages']], ['first', 'second']
+        )
+        self.assertEqual(batches[0]['event_id'], str(self.event.id))
+
+    def test_full_batch_is_sent_without_waiting_in_order(self):
+        socket_client = self._connect(self.user)
+        for text in ['a', 'b', 'c', 'd']:
+            self._send(socket_client, text)
+        batches = self._received(socket_client, 'receive_messages')
+        self.assertEqual(
+            [m['message'] for m in batches[0]['messages']], ['a', 'b', 'c']
+        )
+
+        self.assertEqual(self.app.extensions['chat_broadcaster'].flush(), 1)
+        batches = self._received(socket_client, 'receive_messages')
+        self.assertEqual([m['message'] for m in batches[0]['messages']], ['d'])
+        self.assertEqual(self._received(socket_client, 'receive_message'), [])
+
+
+class TestPresence(ChatTestCase):
+    config = {
+        'PRESENCE_BROADCAST_INTERVAL_MS': 60000,
+        'PRESENCE_TYPING_TTL': 0.05,
+        'PRESENCE_MAX_ROOMS_PER_CONNECTION': 1,
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.guest = User(
+            username='guest', email='guest@example.com', password_hash='x'
+        )
+        db.session.add(self.guest)
+        db.session.commit()
+        db.session.add(EventParticipant(event_id=self.event.id, user_id=self.guest.id))
+        db.session.commit()
+        self.presence = self.app.extensions['presence']
+
+    def _typing(self, socket_client, typing=True):
+        socket_client.emit('typing', {'event_id': self.event.id, 'typing': typing})
+
+    def test_changes_are_sent_once_per_interval(self):
+        owner = self._connect(self.user)
+        guest = self._connect(self.guest)
+        for _ in range(5):
+            self._typing(guest)
+        self.assertEqual(self._received(owner, 'presence'), [])
+
+        self.assertEqual(self.presence.flush(), 1)
+        updates = self._received(owner, 'presence')
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            [user['username'] for user in updates[0]['online']], ['owner', 'guest']
+        )
+        self.assertEqual(updates[0]['typing'], [self.guest.id])
+
+        # 状態が変わらなければ送らない
+        self._typing(guest)
+        self.assertEqual(self.presence.flush(), 0)
+
+        # メッセージを送ると入力中は解除される
+        self._send(guest, 'hi')
+        self.presence.flush()
+        self.assertEqual(self._received(owner, 'presence')[-1]['typing'], [])
+
+    def test_typing_expires(self):
+        owner = self._connect(self.user)
+        self._typing(self._connect(self.guest))
+        socketio.sleep(0.2)
+        self.presence.flush()
+        self.assertEqual(self._received(owner, 'presence')[-1]['typing'], [])
+        self.assertEqual(self.presence._typing, {})
+
+    def test_disconnect_and_leave_update_online_list(self):
+        owner = self._connect(self.user)
+        guest = self._connect(self.guest)
+        second_tab = self._connect(self.guest)
+        self.presence.flush()
+
+        guest.disconnect()
+        self.assertEqual(self.presence.flush(), 0)
+        second_tab.emit('leave_room', {'event_id': self.event.id})
+        self.presence.flush()
+        online = self._received(owner, 'presence')[-1]['online']
+        self.assertEqual([user['username'] for user in online], ['owner'])
+
+        owner.emit('get_presence', {'event_id': self.event.id})
+        self.assertEqual(self._received(owner, 'presence')[0]['online'], online)
+
+        owner.disconnect()
+        self.presence.flush()
+        self.assertEqual(self.presence._connections, {})
+        self.assertEqual(self.presence._online, {})
+        self.assertEqual(self.presence._sent, {})
+
+    def test_removed_room_drops_empty_connections(self):
+        self._connect(self.user)
+        self._connect(self.guest)
+
+        self.presence.remove_room(str(self.event.id))
+        self.assertEqual(self.presence._connections, {})
+        self.assertEqual(self.presence._online, {})
+
+    def test_rooms_per_connection_are_limited(self):
+        other = Event(
+            event_name='other',
+            event_date=datetime(2024, 10, 2),
+            created_by=self.user.id,
+        )
+        db.session.add(other)
+        db.session.commit()
+        db.session.add(EventParticipant(event_id=other.id, user_id=self.user.id))
+        db.session.commit()
+
+        socket_client = self._connect(self.user)
+        socket_client.emit('join_event_chat', {'event_id': other.id})
+        self.assertEqual(
+            self._received(socket_client, 'error'),
+            [{'message': 'Too many chat rooms joined'}],
+        )
+        socket_client.emit('send_message', {'event_id': other.id, 'message': 'x'})
+        self.assertEqual(len(self._received(socket_client, 'error')), 1)
+
+    def test_typing_requires_joining(self):
+        socket_client = self._connect(self.user)
+        socket_client.emit('typing', {'event_id': 999, 'typing': True})
+        self.assertEqual(
+            self._received(socket_client, 'error'), [{'error': 'Not in this chat'}]
+        )
+
+
+class TestWriteBehindMessages(ChatTestCase):
+    config = {
+        'MESSAGE_WRITE_MODE': 'write_behind',
+        'MESSAGE_WRITE_BATCH_SIZE': 3,
+        'MESSAGE_WRITE_MAX_PENDING': 10,
+    }
+
+    def test_messages_are_broadcast_then_flushed_in_batches(self):
+        socket_client = self._connect(self.user)
+        self._send(socket_client, 'first')
+        self._send(socket_client, 'second')
+
+        received = self._received(socket_client, 'receive_message')
+        self.assertEqual([m['message'] for m in received], ['first', 'second'])
+        self.assertEqual(Message.query.count(), 0)
+
+        self._send(socket_client, 'third')
+        self.assertEqual(Message.query.count(), 3)
+
+    def test_flush_writes_remaining_messages(self):
+        socket_client = self._connect(self.user)
+        self._send(socket_client, 'pending')
+        self.assertEqual(Message.query.count(), 0)
+
+        self.app.extensions['message_writer'].flush()
+        self.assertEqual(Message.query.count(), 1)
+
+    def test_full_buffer_applies_back_pressure(self):
+        writer = self.app.extensions['message_writer']
+        writer.batch_size = 100
+        writer.max_pending = 2
+
+        socket_client = self._connect(self.user)
+        for text in ['a', 'b', 'c']:
+            self._send(socket_client, text)
+
+        # 3件目の送信者がバッファ内の2件を書き込んでから追加する
+        self.assertEqual(Message.query.count(), 2)
+        self.assertEqual(len(self._received(socket_client, 'receive_message')), 3)
+
+    def _row(self, text, message_id=None):
+        return {
+            'id': message_id or str(uuid.uuid4()),
+            'event_id': self.event.id,
+            'user_id': self.user.id,
+            'message': text,
+            'timestamp': datetime.utcnow(),
+        }
+
+    def test_failing_row_is_dropped_without_blocking_others(self):
+        writer = self.app.extensions['message_writer']
+        duplicate = self._row('first')
+        writer.write(duplicate)
+        writer.flush()
+
+        # 3件目でバッチサイズに達して書き込まれる
+        with self.assertLogs('app.services.message_writer', level='ERROR'):
+            writer.write(self._row('a'))
+            writer.write(self._row('again', duplicate['id']))
+            writer.write(self._row('b'))
+
+        self.assertEqual(Message.query.count(), 3)
+        self.assertEqual(writer.stats()['pending'], 0)
+        self.assertEqual(writer.stats()['dropped'], 1)
+
+    def test_deleted_event_drops_buffered_messages(self):
+        socket_client = self._connect(self.user)
+        self._send(socket_client, 'hi')
+        late = self._row('late')
+        writer = self.app.extensions['message_writer']
+        self.assertEqual(writer.stats()['pending'], 1)
+
+        client = self.app.test_client()
+        headers = login(client, self.user.id)
+        client.delete(f'/event/{self.event.id}/delete', headers=headers)
+        # SQLite では新しいイベントが同じ ID を使う
+        event_id = client.post(
+            '/event/create',
+            json={'event_name': 'new', 'event_date': '2024-10-02T00:00:00Z'},
+            headers=headers,
+        ).get_json()['event_id']
+        self.assertEqual(event_id, self.event.id)
+
+        # 削除前に送られた行は後から届いても書き込まず、新しいイベントの行は書き込む
+        writer.write(late)
+        writer.write(self._row('new event'))
+        writer.flush()
+
+        detail = client.get(f'/event/{event_id}/detail').get_json()
+        self.assertEqual([m['message'] for m in detail['messages']], ['new event'])
+        self.assertEqual(writer.stats()['discarded'], 2)
+
+    def test_retryable_error_requeues_batch(self):
+        writer = self.app.extensions['message_writer']
+        writer.write(self._row('a'))
+        error = OperationalError('INSERT', {}, Exception('connection lost'))
+        with mock.patch.object(writer, '_insert', side_effect=error):
+            with self.assertLogs('app.services.message_writer', level='ERROR'):
+                self.assertEqual(writer.flush(), 0)
+        self.assertEqual(writer.stats()['pending'], 1)
+
+        self.assertEqual(writer.close(), 1)
+        self.assertEqual(Message.query.count(), 1)
+
+
+class TestCommittedWriteBehindMessages(ChatTestCase):
+    config = {
+        'MESSAGE_WRITE_MODE': 'write_behind',
+        'MESSAGE_WRITE_FLUSH_INTERVAL': 0.01,
+        'MESSAGE_WRITE_DURABILITY': 'committed',
+    }
+
+    def test_sender_waits_for_commit(self):
+        socket_client = self._connect(self.user)
+        self._send(socket_client, 'durable')
+
+        self.assertEqual(Message.query.count(), 1)
+        self.assertEqual(len(self._received(socket_client, 'receive_message')), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
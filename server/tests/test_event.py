@@ -0,0 +1,580 @@
+import unittest
+from datetime import datetime, time, timedelta
+from app import create_app, db
+from app.models import (
+    Event,
+    EventInvite,
+    EventParticipant,
+    Message,
+    User,
+    UserCalendarEntry,
+)
+from app.services.friendship_service import add_friendships
+from app.utils.time_utils import parse_meeting_time
+from tests.helpers import count_queries, login
+
+
+class TestEventMessages(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['MESSAGE_PAGE_SIZE'] = 3
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.user = User(username='owner', email='owner@example.com', password_hash='x')
+        self.outsider = User(
+            username='outsider', email='outsider@example.com', password_hash='x'
+        )
+        db.session.add_all([self.user, self.outsider])
+        db.session.commit()
+
+        self.event = Event(
+            event_name='chat',
+            event_date=datetime(2024, 10, 1),
+            created_by=self.user.id,
+        )
+        db.session.add(self.event)
+        db.session.commit()
+        db.session.add(EventParticipant(event_id=self.event.id, user_id=self.user.id))
+
+        base = datetime(2024, 10, 1, 12, 0, 0)
+        for i in range(7):
+            db.session.add(
+                Message(
+                    id=f'00000000-0000-0000-0000-{i:012d}',
+                    event_id=self.event.id,
+                    user_id=self.user.id,
+                    message=f'message {i}',
+                    timestamp=base + timedelta(minutes=i // 2),
+                )
+            )
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_event_detail_returns_newest_page(self):
+        login(self.client, self.user.id)
+
+        response = self.client.get(f'/event/{self.event.id}/detail')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(
+            [m['message'] for m in data['messages']],
+            ['message 4', 'message 5', 'message 6'],
+        )
+        self.assertEqual(data['messages'][0]['user'], 'owner')
+        self.assertIsNotNone(data['messages_cursor'])
+
+    def test_message_history_walks_back_with_cursor(self):
+        login(self.client, self.user.id)
+
+        seen = []
+        cursor = None
+        while True:
+            url = f'/event/{self.event.id}/messages'
+            if cursor:
+                url += f'?before={cursor}'
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.get_json()
+            seen = [m['message'] for m in data['messages']] + seen
+            cursor = data['next_cursor']
+            if not data['has_more']:
+                break
+
+        self.assertEqual(seen, [f'message {i}' for i in range(7)])
+        self.assertIsNone(cursor)
+
+    def test_message_history_limit_and_invalid_cursor(self):
+        login(self.client, self.user.id)
+
+        response = self.client.get(f'/event/{self.event.id}/messages?limit=5')
+        self.assertEqual(len(response.get_json()['messages']), 5)
+
+        response = self.client.get(f'/event/{self.event.id}/messages?before=@@@')
+        self.assertEqual(response.status_code, 400)
+
+    def test_message_history_requires_access(self):
+        login(self.client, self.outsider.id)
+
+        response = self.client.get(f'/event/{self.event.id}/messages')
+        self.assertEqual(response.status_code, 403)
+
+
+class TestEventInvites(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.host = self._create_user('host')
+        self.friends = [self._create_user(f'friend{i}') for i in range(60)]
+        self.stranger = self._create_user('stranger')
+        for friend in self.friends:
+            self.host.friends.append(friend)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _create_user(self, name):
+        user = User(username=name, email=f'{name}@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    def _post(self, url, user, payload):
+        headers = login(self.client, user.id)
+        return self.client.post(url, json=payload, headers=headers)
+
+    def _create_event(self, invitees):
+        return self._post(
+            '/event/create',
+            self.host,
+            {
+                'event_name': 'party',
+                'event_date': '2024-10-01T00:00:00Z',
+                'invitees': invitees,
+            },
+        )
+
+    def test_create_event_validates_invitees_against_friends(self):
+        friend = self.friends[0]
+        response = self._create_event(
+            [friend.id, friend.id, self.stranger.id, self.host.id, 'abc']
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.get_json()['invites'],
+            {
+                'added': [friend.id],
+                'skipped': [],
+                'rejected': ['abc', self.stranger.id, self.host.id],
+            },
+        )
+        self.assertEqual(EventInvite.query.count(), 1)
+
+    def test_invite_more_friends_skips_existing_invites_and_participants(self):
+        event_id = self._create_event([self.friends[0].id]).get_json()['event_id']
+        db.session.add(EventParticipant(event_id=event_id, user_id=self.friends[1].id))
+        db.session.commit()
+
+        response = self._post(
+            f'/event/{event_id}/invite',
+            self.host,
+            {'invitees': [f.id for f in self.friends[:3]]},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.get_json()['invites'],
+            {
+                'added': [self.friends[2].id],
+                'skipped': [self.friends[0].id, self.friends[1].id],
+                'rejected': [],
+            },
+        )
+
+    def test_invite_more_friends_requires_participation(self):
+        event_id = self._create_event([]).get_json()['event_id']
+
+        response = self._post(
+            f'/event/{event_id}/invite', self.stranger, {'invitees': [self.host.id]}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_invite_query_count_does_not_grow_with_invitees(self):
+        friend_ids = [f.id for f in self.friends]
+        with count_queries() as few:
+            self._create_event(friend_ids[:5])
+        with count_queries() as many:
+            self._create_event(friend_ids)
+
+        self.assertEqual(EventInvite.query.count(), 65)
+        self.assertLessEqual(many.count, few.count)
+
+
+class TestCalendarEvents(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.host = User(username='host', email='host@example.com', password_hash='x')
+        self.guest = User(
+            username='guest', email='guest@example.com', password_hash='x'
+        )
+        db.session.add_all([self.host, self.guest])
+        db.session.commit()
+        self.host.friends.append(self.guest)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _create_event(self, name, event_date, invitees=()):
+        headers = login(self.client, self.host.id)
+        response = self.client.post(
+            '/event/create',
+            json={
+                'event_name': name,
+                'event_date': event_date,
+                'invitees': list(invitees),
+            },
+            headers=headers,
+        )
+        return response.get_json()['event_id']
+
+    def _calendar(self, user, **params):
+        login(self.client, user.id)
+        return self.client.get('/event/user/calendar', query_string=params)
+
+    def test_range_spans_months_sorted_without_duplicates(self):
+        self._create_event('november', '2024-11-05T10:00:00Z')
+        self._create_event('october', '2024-10-20T10:00:00Z')
+        self._create_event('december', '2024-12-01T10:00:00Z')
+
+        response = self._calendar(self.host, year=2024, month=10, months=2)
+        self.assertEqual(response.status_code, 200)
+        names = [e['event_name'] for e in response.get_json()['events']]
+        self.assertEqual(names, ['october', 'november'])
+
+        response = self._calendar(
+            self.host, start='2024-10-21T00:00:00Z', end='2024-12-02'
+        )
+        names = [e['event_name'] for e in response.get_json()['events']]
+        self.assertEqual(names, ['november', 'december'])
+
+    def test_week_view(self):
+        self._create_event('monday', '2024-10-07T09:00:00Z')
+        self._create_event('next monday', '2024-10-14T09:00:00Z')
+
+        response = self._calendar(self.host, view='week', date='2024-10-10')
+        data = response.get_json()
+        self.assertEqual(data['start'], '2024-10-06T15:00:00+00:00')
+        self.assertEqual([e['event_name'] for e in data['events']], ['monday'])
+
+    def test_entries_follow_accept_update_and_delete(self):
+        event_id = self._create_event(
+            'party', '2024-10-01T10:00:00Z', invitees=[self.guest.id]
+        )
+        self.assertEqual(
+            self._calendar(self.guest, year=2024, month=10).json['events'], []
+        )
+
+        headers = login(self.client, self.guest.id)
+        self.client.post(
+            '/event/respond',
+            json={'event_id': event_id, 'response': 'accepted'},
+            headers=headers,
+        )
+        events = self._calendar(self.guest, year=2024, month=10).json['events']
+        self.assertEqual([e['id'] for e in events], [event_id])
+
+        headers = login(self.client, self.host.id)
+        self.client.put(
+            f'/event/{event_id}/update',
+            json={'event_name': 'moved', 'event_date': '2024-11-03T10:00:00Z'},
+            headers=headers,
+        )
+        events = self._calendar(self.guest, year=2024, month=11).json['events']
+        self.assertEqual([e['event_name'] for e in events], ['moved'])
+
+        headers = login(self.client, self.host.id)
+        self.client.delete(f'/event/{event_id}/delete', headers=headers)
+        self.assertEqual(UserCalendarEntry.query.count(), 0)
+
+    def test_etag_returns_not_modified(self):
+        self._create_event('party', '2024-10-01T10:00:00Z')
+
+        response = self._calendar(self.host, year=2024, month=10)
+        etag = response.headers['ETag']
+
+        login(self.client, self.host.id)
+        response = self.client.get(
+            '/event/user/calendar',
+            query_string={'year': 2024, 'month': 10},
+            headers={'If-None-Match': etag},
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalid_range(self):
+        self.assertEqual(self._calendar(self.host, start='2024-10-01').status_code, 400)
+        self.assertEqual(
+            self._calendar(self.host, start='2024-10-01', end='2023-10-01').status_code,
+            400,
+        )
+        self.assertEqual(
+            self._calendar(self.host, year=2024, month=1, months=24).status_code, 400
+        )
+
+    def test_participated_events_uses_calendar(self):
+        self._create_event('party', '2024-10-01T10:00:00Z')
+
+        login(self.client, self.host.id)
+        response = self.client.get(
+            '/event/user/participated-events', query_string={'year': 2024, 'month': 10}
+        )
+        self.assertEqual([e['event_name'] for e in response.get_json()], ['party'])
+
+
+class TestMeetingTime(unittest.TestCase):
+    def test_parse_meeting_time(self):
+        self.assertEqual(parse_meeting_time('18:00'), (time(18, 0), None))
+        self.assertEqual(
+            parse_meeting_time('18時〜20時半'), (time(18, 0), time(20, 30))
+        )
+        self.assertIsNone(parse_meeting_time('未定'))
+        self.assertIsNone(parse_meeting_time('25:00'))
+
+
+class TestAvailability(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.host = self._create_user('host')
+        self.guest = self._create_user('guest')
+        self.stranger = self._create_user('stranger')
+        add_friendships([(self.host.id, self.guest.id)])
+        db.session.commit()
+
+        # 現地(Asia/Tokyo)の 10/1 0:00 は UTC の 9/30 15:00
+        self._create_event(self.host, '2024-09-30T15:00:00Z', '10:00')
+        self._create_event(self.guest, '2024-09-30T15:00:00Z', '12:00-13:00')
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _create_user(self, name):
+        user = User(username=name, email=f'{name}@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    def _create_event(self, user, event_date, meeting_time):
+        headers = login(self.client, user.id)
+        self.client.post(
+            '/event/create',
+            json={
+                'event_name': 'busy',
+                'event_date': event_date,
+                'meeting_time': meeting_time,
+            },
+            headers=headers,
+        )
+
+    def _slots(self, user_ids, **params):
+        login(self.client, self.host.id)
+        response = self.client.get(
+            '/event/availability',
+            query_string={
+                'user_ids': ','.join(str(user_id) for user_id in user_ids),
+                'start': '2024-10-01T00:00:00+09:00',
+                'end': '2024-10-02T00:00:00+09:00',
+                **params,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_common_free_slots(self):
+        data = self._slots([self.guest.id, self.stranger.id])
+        self.assertEqual(data['users'], [self.host.id, self.guest.id])
+        self.assertEqual(data['rejected'], [self.stranger.id])
+        self.assertEqual(
+            data['slots'],
+            [
+                {
+                    'start': '2024-09-30T15:00:00+00:00',
+                    'end': '2024-10-01T01:00:00+00:00',
+                },
+                {
+                    'start': '2024-10-01T04:00:00+00:00',
+                    'end': '2024-10-01T15:00:00+00:00',
+                },
+            ],
+        )
+
+    def test_daily_window_and_minimum_length(self):
+        data = self._slots([self.guest.id], day_start=9, day_end=18, min_minutes=90)
+        self.assertEqual(
+            data['slots'],
+            [
+                {
+                    'start': '2024-10-01T04:00:00+00:00',
+                    'end': '2024-10-01T09:00:00+00:00',
+                }
+            ],
+        )
+
+    def test_index_reloads_only_changed_users(self):
+        self._slots([self.guest.id])
+        index = self.app.extensions['availability_index']
+        host_entry = index._users[self.host.id]
+
+        # 時刻未定の予定は一日をふさぐ
+        self._create_event(self.guest, '2024-09-30T15:00:00Z', '未定')
+        self.assertEqual(self._slots([self.guest.id])['slots'], [])
+        self.assertIs(index._users[self.host.id], host_entry)
+
+    def test_large_group_uses_constant_queries(self):
+        friends = [self._create_user(f'friend{i}') for i in range(60)]
+        friend_ids = [friend.id for friend in friends]
+        add_friendships([(self.host.id, friend_id) for friend_id in friend_ids])
+        db.session.commit()
+        login(self.client, self.host.id)
+
+        with count_queries() as counter:
+            data = self._slots(friend_ids)
+        self.assertEqual(len(data['users']), 61)
+        self.assertLessEqual(counter.count, 4, counter.statements)
+
+
+class TestEventTimes(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.host = User(username='host', email='host@example.com', password_hash='x')
+        db.session.add(self.host)
+        db.session.commit()
+        self.host_id = self.host.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _create_event(self, **payload):
+        headers = login(self.client, self.host_id)
+        return self.client.post(
+            '/event/create',
+            json={
+                'event_name': 'event',
+                'event_date': '2024-09-30T15:00:00Z',
+                **payload,
+            },
+            headers=headers,
+        )
+
+    def test_times_are_derived_from_meeting_time(self):
+        response = self._create_event(meeting_time='10:00-11:30')
+        event_id = response.get_json()['event_id']
+
+        detail = self.client.get(f'/event/{event_id}/detail').get_json()
+        self.assertEqual(detail['meeting_time'], '10:00-11:30')
+        self.assertEqual(detail['starts_at'], '2024-10-01T01:00:00+00:00')
+        self.assertEqual(detail['ends_at'], '2024-10-01T02:30:00+00:00')
+
+        entry = UserCalendarEntry.query.filter_by(event_id=event_id).one()
+        self.assertEqual(entry.starts_at, datetime(2024, 10, 1, 1, 0))
+
+    def test_explicit_times_and_overlaps(self):
+        first = self._create_event(
+            starts_at='2024-10-01T10:00:00', ends_at='2024-10-01T12:00:00'
+        ).get_json()
+
+        # オフセットのない値は現地時刻(Asia/Tokyo)として扱う
+        response = self._create_event(starts_at='2024-10-01T02:30:00Z')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [c['id'] for c in response.get_json()['conflicts']], [first['event_id']]
+        )
+
+        response = self._create_event(
+            starts_at='2024-10-01T02:45:00Z', reject_overlap=True
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(response.get_json()['conflicts']), 2)
+
+        response = self._create_event(
+            starts_at='2024-10-01T07:00:00Z', reject_overlap=True
+        )
+        self.assertEqual(response.get_json()['conflicts'], [])
+        self.assertEqual(Event.query.count(), 3)
+
+    def test_event_without_event_date_takes_it_from_starts_at(self):
+        response = self._create_event(event_date=None, starts_at='2024-10-01T16:30:00Z')
+        self.assertEqual(response.status_code, 201)
+        event_id = response.get_json()['event_id']
+
+        # 現地(Asia/Tokyo)では 10/2 の予定
+        detail = self.client.get(f'/event/{event_id}/detail')
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.get_json()['event_date'], '2024-10-01T15:00:00')
+
+        for url in ('/event/user/participated-events', '/event/user/calendar'):
+            response = self.client.get(url, query_string={'year': 2024, 'month': 10})
+            self.assertEqual(response.status_code, 200)
+        events = response.get_json()['events']
+        self.assertEqual(events[0]['event_date'], '2024-10-01T15:00:00')
+
+    def test_invalid_times(self):
+        response = self._create_event(
+            starts_at='2024-10-01T12:00:00Z', ends_at='2024-10-01T10:00:00Z'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self._create_event(starts_at='tomorrow')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Event.query.count(), 0)
+
+    def test_update_recomputes_times(self):
+        event_id = self._create_event(meeting_time='10:00').get_json()['event_id']
+        headers = login(self.client, self.host_id)
+        response = self.client.put(
+            f'/event/{event_id}/update',
+            json={'meeting_time': '18:00-20:00'},
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 200)
+
+        entry = UserCalendarEntry.query.filter_by(event_id=event_id).one()
+        self.assertEqual(
+            (entry.starts_at, entry.ends_at),
+            (datetime(2024, 10, 1, 9, 0), datetime(2024, 10, 1, 11, 0)),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+from app import create_app, db
+from app.models import FriendRequest, User
+from app.models.user_model import friends_association_table
+from app.services.friendship_service import add_friendships
+from tests.helpers import count_queries, login
+
+
+class TestFriendRequests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.user = User(username='receiver', email='r@example.com', password_hash='x')
+        db.session.add(self.user)
+        db.session.commit()
+
+        login(self.client, self.user.id)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _add_requests(self, count):
+        for _ in range(count):
+            number = User.query.count()
+            sender = User(
+                username=f'sender{number}',
+                email=f'sender{number}@example.com',
+                password_hash='x',
+            )
+            db.session.add(sender)
+            db.session.commit()
+            db.session.add(FriendRequest(sender_id=sender.id, receiver_id=self.user.id))
+        db.session.commit()
+
+    def _get_requests(self):
+        with count_queries() as counter:
+            response = self.client.get('/friend/requests')
+        self.assertEqual(response.status_code, 200)
+        return response.get_json(), counter.count
+
+    def test_friend_requests_include_sender_username(self):
+        self._add_requests(1)
+
+        requests, _ = self._get_requests()
+        self.assertEqual(
+            requests, [{'id': 1, 'sender_id': 2, 'sender_username': 'sender1'}]
+        )
+
+    def test_friend_requests_query_budget_is_constant(self):
+        self._add_requests(1)
+        _, few_queries = self._get_requests()
+
+        self._add_requests(20)
+        requests, many_queries = self._get_requests()
+
+        self.assertEqual(len(requests), 21)
+        # 失効確認・ETag 用のバージョン取得・本体の1クエリ
+        self.assertLessEqual(few_queries, 3)
+        self.assertLessEqual(many_queries, few_queries)
+
+
+class TestFriendAcceptance(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.users = []
+        for i in range(6):
+            user = User(
+                username=f'user{i}', email=f'user{i}@example.com', password_hash='x'
+            )
+            db.session.add(user)
+            db.session.commit()
+            self.users.append(user)
+        self.alice, self.bob = self.users[:2]
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _post(self, user, url, payload=None):
+        headers = login(self.client, user.id)
+        return self.client.post(url, json=payload or {}, headers=headers)
+
+    def _friend_rows(self):
+        return sorted(
+            tuple(row) for row in db.session.query(friends_association_table).all()
+        )
+
+    def test_accept_writes_both_rows_once(self):
+        self._post(self.alice, '/friend/request', {'receiver_id': self.bob.id})
+        request_id = FriendRequest.query.one().id
+
+        response = self._post(
+            self.bob, f'/friend/request/{request_id}/respond', {'action': 'accept'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.get_json()['friend'], {'id': self.alice.id, 'username': 'user0'}
+        )
+
+        response = self._post(
+            self.bob, f'/friend/request/{request_id}/respond', {'action': 'accept'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self._friend_rows(),
+            [(self.alice.id, self.bob.id), (self.bob.id, self.alice.id)],
+        )
+
+    def test_crossed_request_is_accepted(self):
+        self._post(self.alice, '/friend/request', {'receiver_id': self.bob.id})
+
+        response = self._post(
+            self.bob, '/friend/request', {'receiver_id': self.alice.id}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['friend']['id'], self.alice.id)
+        self.assertEqual(FriendRequest.query.count(), 1)
+        self.assertEqual(FriendRequest.query.one().status, 'accepted')
+        self.assertEqual(len(self._friend_rows()), 2)
+
+        response = self._post(
+            self.alice, '/friend/request', {'receiver_id': self.bob.id}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_accept_all(self):
+        for sender in self.users[1:]:
+            self._post(sender, '/friend/request', {'receiver_id': self.alice.id})
+
+        with count_queries() as counter:
+            response = self._post(self.alice, '/friend/requests/accept-all')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [friend['id'] for friend in response.get_json()['accepted']],
+            [user.id for user in self.users[1:]],
+        )
+        # 件数に依存しない文数で承認する
+        self.assertLessEqual(counter.count, 8, counter.statements)
+        self.assertEqual(len(self._friend_rows()), 10)
+
+        response = self._post(self.alice, '/friend/requests/accept-all')
+        self.assertEqual(response.get_json()['accepted'], [])
+
+    def test_add_friendships_ignores_existing_rows(self):
+        add_friendships([(self.alice.id, self.bob.id)])
+        add_friendships([(self.bob.id, self.alice.id), (self.alice.id, self.alice.id)])
+        db.session.commit()
+        self.assertEqual(len(self._friend_rows()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
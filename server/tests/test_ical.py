@@ -0,0 +1,188 @@
+import unittest
+from app import create_app, db
+from app.models import Event, EventInvite, User, UserCalendarEntry
+from app.services.friendship_service import add_friendships
+from app.services.ical_service import fold_line, parse_calendar
+from tests.helpers import count_queries, login
+
+CALENDAR = '\r\n'.join(
+    [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'BEGIN:VEVENT',
+        'UID:standup@example.com',
+        'DTSTART;TZID=Asia/Tokyo:20241001T100000',
+        'DTEND;TZID=Asia/Tokyo:20241001T103000',
+        'RRULE:FREQ=WEEKLY;BYDAY=TU',
+        'SUMMARY:Standup\\, weekly',
+        'END:VEVENT',
+        'BEGIN:VEVENT',
+        'UID:standup@example.com',
+        'RECURRENCE-ID:20241008T010000Z',
+        'DTSTART:20241008T020000Z',
+        'SUMMARY:Standup (moved)',
+        'END:VEVENT',
+        'BEGIN:VEVENT',
+        'UID:holiday@example.com',
+        'DTSTART;VALUE=DATE:20241014',
+        'SUMMARY:Holiday',
+        'END:VEVENT',
+        'BEGIN:VEVENT',
+        'UID:dinner@example.com',
+        'DTSTART:20241020T100000Z',
+        'DTEND:20241020T120000Z',
+        'SUMMARY:Dinner',
+        'LOCATION:Shibuya',
+        'DESCRIPTION:Line one\\nline two',
+        'END:VEVENT',
+        'END:VCALENDAR',
+        '',
+    ]
+)
+
+
+class TestIcalFormat(unittest.TestCase):
+    def test_fold_line_splits_on_character_boundaries(self):
+        line = 'DESCRIPTION:' + 'カレンダー' * 20
+        folded = fold_line(line)
+        self.assertTrue(
+            all(len(part.encode('utf-8')) <= 75 for part in folded.split('\r\n'))
+        )
+        self.assertEqual(folded.replace('\r\n ', ''), line + '\r\n')
+
+    def test_parse_calendar(self):
+        events = parse_calendar(CALENDAR, 'Asia/Tokyo')
+        self.assertEqual(len(events), 4)
+        self.assertEqual(events[0]['SUMMARY'], 'Standup, weekly')
+        self.assertEqual(events[0]['DTSTART'][0].hour, 1)
+        self.assertEqual(events[2]['DTSTART'][1], True)
+        self.assertEqual(events[3]['DESCRIPTION'], 'Line one\nline two')
+
+
+class TestCalendarFeed(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['ICS_FEED_PAGE_SIZE'] = 2
+        self.app.config['ICS_IMPORT_BATCH_SIZE'] = 2
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.host = User(username='host', email='host@example.com', password_hash='x')
+        self.guest = User(
+            username='guest', email='guest@example.com', password_hash='x'
+        )
+        db.session.add_all([self.host, self.guest])
+        db.session.commit()
+        self.host_id, self.guest_id = self.host.id, self.guest.id
+        add_friendships([(self.host_id, self.guest_id)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _import(self, **params):
+        return self.client.post(
+            '/event/import',
+            data=CALENDAR.encode('utf-8'),
+            query_string=params,
+            content_type='text/calendar',
+            headers=login(self.client, self.host_id),
+        )
+
+    def _feed_url(self):
+        response = self.client.post(
+            '/event/user/calendar-feed', headers=login(self.client, self.host_id)
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['url'].replace('http://localhost', '')
+
+    def test_import_creates_events_and_invites_in_batches(self):
+        response = self._import(invitees=f'{self.guest_id},999')
+        self.assertEqual(response.status_code, 201)
+        data = response.get_json()
+        self.assertEqual(len(data['created']), 3)
+        self.assertEqual(data['skipped'], ['standup@example.com'])
+        self.assertEqual(data['invites'], {'added': [self.guest_id], 'rejected': [999]})
+        self.assertEqual(EventInvite.query.count(), 3)
+        self.assertEqual(UserCalendarEntry.query.count(), 3)
+
+        standup = Event.query.filter_by(ical_uid='standup@example.com').one()
+        self.assertEqual(standup.meeting_time, '10:00-10:30')
+        self.assertEqual(standup.recurrence_rule, 'FREQ=WEEKLY;BYDAY=TU')
+        holiday = Event.query.filter_by(ical_uid='holiday@example.com').one()
+        self.assertIsNone(holiday.meeting_time)
+
+        # 同じファイルを取り込み直しても重複しない
+        data = self._import().get_json()
+        self.assertEqual(data['created'], [])
+        self.assertEqual(len(data['skipped']), 4)
+        self.assertEqual(Event.query.count(), 3)
+
+    def test_invalid_calendar(self):
+        response = self.client.post(
+            '/event/import',
+            data=b'BEGIN:VEVENT\r\nDTSTART:tomorrow\r\nEND:VEVENT\r\n',
+            headers=login(self.client, self.host_id),
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_feed_streams_events_with_conditional_get(self):
+        self._import()
+        url = self._feed_url()
+        # フィードは JWT なしでトークンだけで読める
+        self.client.delete_cookie('access_token_cookie')
+
+        with count_queries() as counter:
+            response = self.client.get(url)
+            self.assertTrue(response.is_streamed)
+            body = response.get_data(as_text=True)
+        # トークン・バージョン・3件を2件ずつのページ(と繰り返しの例外)
+        self.assertLessEqual(counter.count, 6, counter.statements)
+
+        self.assertEqual(response.mimetype, 'text/calendar')
+        self.assertEqual(body.count('BEGIN:VEVENT'), 3)
+        self.assertIn('SUMMARY:Standup\\, weekly\r\n', body)
+        self.assertIn('RRULE:FREQ=WEEKLY;BYDAY=TU\r\n', body)
+        self.assertIn('DESCRIPTION:Line one\\nline two\r\n', body)
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(len(parse_calendar(body, 'Asia/Tokyo')), 3)
+
+        etag = response.headers['ETag']
+        self.assertEqual(
+            self.client.get(url, headers={'If-None-Match': etag}).status_code, 304
+        )
+
+        # 繰り返しの回を中止すると EXDATE が加わる
+        standup_id = Event.query.filter_by(ical_uid='standup@example.com').one().id
+        self.client.post(
+            f'/event/{standup_id}/occurrence',
+            json={'occurrence_start': '2024-10-08T01:00:00Z', 'cancelled': True},
+            headers=login(self.client, self.host_id),
+        )
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('EXDATE:20241008T010000Z', response.get_data(as_text=True))
+
+    def test_rotating_and_deleting_the_feed_token(self):
+        old_url = self._feed_url()
+        new_url = self._feed_url()
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        self.assertEqual(self.client.get(new_url).status_code, 200)
+
+        response = self.client.delete(
+            '/event/user/calendar-feed', headers=login(self.client, self.host_id)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(new_url).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import os
+import tempfile
+import unittest
+from flask_migrate import upgrade
+from sqlalchemy import inspect, text
+from app import create_app, db
+from app.models import (
+    EventInvite,
+    EventParticipant,
+    FriendRequest,
+    Message,
+    UserCalendarEntry,
+)
+from app.models.user_model import friends_association_table
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+
+def explain(query):
+    statement = query.statement.compile(
+        dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}
+    )
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {statement}')).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+
+class TestQueryPlans(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_participant_lookup_uses_unique_index(self):
+        plan = explain(EventParticipant.query.filter_by(event_id=1, user_id=2))
+        # SQLite は一意制約のインデックスを sqlite_autoindex_* と命名する
+        self.assertIn('INDEX', plan)
+        self.assertIn('(event_id=? AND user_id=?)', plan)
+
+    def test_invite_lookup_uses_user_status_index(self):
+        plan = explain(EventInvite.query.filter_by(user_id=1, status='pending'))
+        self.assertIn('ix_event_invite_user_id_status', plan)
+
+    def test_message_page_uses_event_timestamp_index(self):
+        query = Message.query.filter_by(event_id=1).order_by(
+            Message.timestamp.desc(), Message.id.desc()
+        )
+        plan = explain(query)
+        self.assertIn('ix_message_event_id_timestamp', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_friend_request_lookup_uses_receiver_status_index(self):
+        plan = explain(FriendRequest.query.filter_by(receiver_id=1, status='pending'))
+        self.assertIn('ix_friend_request_receiver_id_status', plan)
+
+    def test_friends_lookup_uses_pair_index(self):
+        query = db.session.query(friends_association_table).filter(
+            friends_association_table.c.user_id == 1
+        )
+        plan = explain(query)
+        self.assertIn('INDEX', plan)
+        self.assertIn('(user_id=?)', plan)
+
+    def test_calendar_range_uses_user_date_index(self):
+        query = (
+            UserCalendarEntry.query.filter(
+                UserCalendarEntry.user_id == 1,
+                UserCalendarEntry.event_date >= '2024-10-01',
+                UserCalendarEntry.event_date < '2024-11-01',
+            )
+        ).order_by(UserCalendarEntry.event_date, UserCalendarEntry.event_id)
+        plan = explain(query)
+        self.assertIn('ix_user_calendar_entry_user_id_event_date', plan)
+
+    def test_calendar_overlap_uses_user_starts_at_index(self):
+        query = UserCalendarEntry.query.filter(
+            UserCalendarEntry.user_id == 1,
+            UserCalendarEntry.starts_at < '2024-11-01',
+            UserCalendarEntry.ends_at > '2024-10-01',
+        ).order_by(UserCalendarEntry.starts_at)
+        plan = explain(query)
+        self.assertIn('ix_user_calendar_entry_user_id_starts_at', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class TestIndexMigration(unittest.TestCase):
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{self.db_path}'
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        self.ctx.pop()
+        os.remove(self.db_path)
+
+    def test_migration_creates_model_indexes(self):
+        upgrade(directory=MIGRATIONS_DIR)
+
+        inspector = inspect(db.engine)
+        for table in db.metadata.sorted_tables:
+            expected = {index.name for index in table.indexes}
+            actual = {index['name'] for index in inspector.get_indexes(table.name)}
+            self.assertTrue(expected <= actual, f'{table.name}: {expected - actual}')
+
+            expected = {
+                constraint.name
+                for constraint in table.constraints
+                if isinstance(constraint, db.UniqueConstraint) and constraint.name
+            }
+            actual = {
+                constraint['name']
+                for constraint in inspector.get_unique_constraints(table.name)
+            }
+            self.assertTrue(expected <= actual, f'{table.name}: {expected - actual}')
+
+    def test_event_time_migration_backfills_existing_rows(self):
+        upgrade(directory=MIGRATIONS_DIR, revision='37e29956bd1e')
+        db.session.execute(
+            text(
+                "INSERT INTO user (id, username, email, password_hash) "
+                "VALUES (1, 'host', 'host@example.com', 'x')"
+            )
+        )
+        db.session.execute(
+            text(
+                "INSERT INTO event "
+                "(id, event_name, event_date, meeting_time, created_by, created_at) "
+                "VALUES (1, 'party', '2024-09-30 15:00:00.000000', '19時半', 1, "
+                "'2024-09-01 09:00:00.000000')"
+            )
+        )
+        db.session.execute(
+            text(
+                "INSERT INTO user_calendar_entry "
+                "(user_id, event_id, event_name, event_date) "
+                "VALUES (1, 1, 'party', '2024-09-30 15:00:00.000000')"
+            )
+        )
+        db.session.commit()
+
+        upgrade(directory=MIGRATIONS_DIR)
+
+        event = db.session.execute(
+            text('SELECT starts_at, ends_at, created_at FROM event')
+        ).one()
+        self.assertEqual(event.starts_at[:19], '2024-10-01 10:30:00')
+        self.assertEqual(event.ends_at[:19], '2024-10-01 12:30:00')
+        self.assertEqual(event.created_at, '2024-09-01 00:00:00')
+        entry = db.session.execute(
+            text('SELECT starts_at, ends_at FROM user_calendar_entry')
+        ).one()
+        self.assertEqual(tuple(entry), (event.starts_at, event.ends_at))
+
+
+if __name__ == '__main__':
+    unittest.main()
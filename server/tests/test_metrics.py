@@ -0,0 +1,101 @@
+import unittest
+from datetime import datetime
+from app import create_app, db, socketio
+from app.models import Event, EventParticipant, User
+from app.services.metrics import Histogram, normalize_statement
+from tests.helpers import login
+
+
+class TestMetricsHelpers(unittest.TestCase):
+    def test_normalize_statement(self):
+        statement = normalize_statement(
+            "SELECT *\n  FROM user WHERE id IN (?, ?, ?) AND name = 'bob' LIMIT 20"
+        )
+        self.assertEqual(
+            statement, 'SELECT * FROM user WHERE id IN (...) AND name = ? LIMIT ?'
+        )
+
+    def test_histogram_buckets(self):
+        histogram = Histogram(buckets=(10, 100))
+        for value in [1, 10, 50, 1000]:
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['buckets'], {'10': 2, '100': 1, '+Inf': 1})
+        self.assertEqual(snapshot['count'], 4)
+
+
+class TestRequestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(
+            {'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'}
+        )
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.user = User(username='owner', email='owner@example.com', password_hash='x')
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_records_latency_and_queries_per_endpoint(self):
+        login(self.client, self.user.id)
+        response = self.client.get('/user/friends')
+        self.assertIn('db;dur=', response.headers['Server-Timing'])
+
+        metrics = self.client.get('/metrics').get_json()
+        friends = metrics['requests']['GET /user/friends']
+        self.assertEqual(friends['latency_ms']['count'], 1)
+        self.assertEqual(friends['statuses'], {'200': 1})
+        self.assertGreater(friends['queries'], 0)
+        self.assertIn('friends', metrics['response_cache'])
+
+    def test_slow_queries_are_logged_with_endpoint(self):
+        self.app.extensions['metrics'].slow_query_threshold_ms = 0
+        login(self.client, self.user.id)
+
+        with self.assertLogs('app.services.metrics', level='WARNING') as logs:
+            self.client.get('/user/friends')
+
+        self.assertTrue(
+            any('from user_bp.get_friends' in line for line in logs.output),
+            logs.output,
+        )
+        self.assertGreater(self.client.get('/metrics').get_json()['slow_queries'], 0)
+
+    def test_socket_event_latency(self):
+        event = Event(
+            event_name='chat', event_date=datetime(2024, 10, 1), created_by=self.user.id
+        )
+        db.session.add(event)
+        db.session.commit()
+        db.session.add(EventParticipant(event_id=event.id, user_id=self.user.id))
+        db.session.commit()
+
+        login(self.client, self.user.id)
+        socket_client = socketio.test_client(self.app, flask_test_client=self.client)
+        socket_client.emit('join_event_chat', {'event_id': event.id})
+        socket_client.emit('send_message', {'event_id': event.id, 'message': 'hi'})
+
+        metrics = self.client.get('/metrics').get_json()['socket_events']
+        self.assertEqual(metrics['join_event_chat']['latency_ms']['count'], 1)
+        self.assertEqual(metrics['send_message']['statuses'], {'ok': 1})
+        self.assertGreater(metrics['send_message']['queries'], 0)
+
+
+class TestMetricsDisabled(unittest.TestCase):
+    def test_metrics_endpoint_is_not_found(self):
+        app = create_app({'TESTING': True, 'METRICS_ENABLED': False})
+        response = app.test_client().get('/metrics')
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+from app import create_app, db, socketio
+from app.models import Event, EventParticipant, Message, User
+from app.services.rate_limiter import MemoryRateLimitBackend, parse_policy
+from tests.helpers import count_queries, login
+
+
+class TestMemoryRateLimitBackend(unittest.TestCase):
+    def test_refills_over_time(self):
+        backend = MemoryRateLimitBackend()
+        with mock.patch('time.monotonic', return_value=100):
+            self.assertEqual(backend.take('a', 1, 2), (True, 0.0))
+            self.assertEqual(backend.take('a', 1, 2), (True, 0.0))
+            self.assertEqual(backend.take('a', 1, 2), (False, 1.0))
+        with mock.patch('time.monotonic', return_value=101.5):
+            self.assertEqual(backend.take('a', 1, 2), (True, 0.0))
+            self.assertEqual(backend.take('a', 1, 2), (False, 0.5))
+
+    def test_zero_cost_checks_without_consuming(self):
+        backend = MemoryRateLimitBackend()
+        with mock.patch('time.monotonic', return_value=100):
+            self.assertEqual(backend.take('a', 1, 1, cost=0), (True, 0.0))
+            self.assertEqual(backend.take('a', 1, 1), (True, 0.0))
+            self.assertEqual(backend.take('a', 1, 1, cost=0), (False, 1.0))
+
+    def test_bounds_number_of_keys(self):
+        backend = MemoryRateLimitBackend(max_keys=2)
+        for key in ('a', 'b', 'c'):
+            backend.take(key, 1, 1)
+        self.assertEqual(list(backend._buckets), ['b', 'c'])
+
+    def test_parse_policy(self):
+        self.assertEqual(parse_policy('10/60'), (10 / 60, 10))
+        self.assertIsNone(parse_policy(''))
+        with self.assertRaises(ValueError):
+            parse_policy('0/60')
+
+
+class TestRateLimits(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(
+            {
+                'TESTING': True,
+                'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                'PROXY_FIX_X_FOR': 1,
+                'RATE_LIMITS': {
+                    'login': '2/60',
+                    'login_account': '3/60',
+                    'search_users': '1/60',
+                    'send_message': '3/60',
+                    'room_messages': '2/60',
+                },
+            }
+        )
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.user = User(username='owner', email='owner@example.com')
+        self.user.set_password('password')
+        self.guest = User(username='guest', email='guest@example.com')
+        self.guest.set_password('password')
+        db.session.add_all([self.user, self.guest])
+        db.session.commit()
+
+        self.event = Event(
+            event_name='chat', event_date=datetime(2024, 10, 1), created_by=self.user.id
+        )
+        db.session.add(self.event)
+        db.session.commit()
+        db.session.add(EventParticipant(event_id=self.event.id, user_id=self.user.id))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _login(self, email='owner@example.com', **kwargs):
+        return self.client.post(
+            '/auth/login', json={'email': email, 'password': 'password'}, **kwargs
+        )
+
+    def _connect(self, user):
+        client = self.app.test_client()
+        login(client, user.id)
+        socket_client = socketio.test_client(self.app, flask_test_client=client)
+        socket_client.emit('join_event_chat', {'event_id': self.event.id})
+        return socket_client
+
+    def _errors(self, socket_client):
+        return [
+            packet['args'][0]
+            for packet in socket_client.get_received()
+            if packet['name'] == 'error'
+        ]
+
+    def test_login_is_limited_per_address_without_queries(self):
+        self.assertEqual(self._login().status_code, 200)
+        self.assertEqual(self._login().status_code, 200)
+
+        with count_queries() as counter:
+            response = self._login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '30')
+        self.assertEqual(counter.count, 0, counter.statements)
+
+        response = self._login(environ_base={'REMOTE_ADDR': '10.0.0.2'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_failed_logins_are_limited_per_account_and_address(self):
+        # IP アドレスごとの制限は外して、アカウントの枠だけを見る
+        self.app.extensions['rate_limiter'].policies['login'] = None
+        attacker = {'REMOTE_ADDR': '10.0.1.1'}
+        for _ in range(3):
+            response = self.client.post(
+                '/auth/login',
+                json={'email': ' Owner@Example.com', 'password': 'wrong'},
+                environ_base=attacker,
+            )
+            self.assertEqual(response.status_code, 401)
+        self.assertEqual(self._login(environ_base=attacker).status_code, 429)
+
+        # 他の接続元からの失敗では、正しいパスワードの本人は締め出されない
+        self.assertEqual(
+            self._login(environ_base={'REMOTE_ADDR': '10.0.1.2'}).status_code, 200
+        )
+
+        # 成功したログインは枠を消費しない
+        for i in range(2):
+            response = self._login(environ_base={'REMOTE_ADDR': f'10.0.2.{i}'})
+            self.assertEqual(response.status_code, 200)
+        stats = self.client.get('/metrics').get_json()['rate_limits']
+        self.assertEqual(
+            stats['login_account'], {'allowed': 3, 'rejected': 1, 'errors': 0}
+        )
+
+    def test_login_uses_address_from_trusted_proxy(self):
+        # 信頼するのはプロキシが付けた右端の1つだけで、クライアントが
+        # 付けた左側の値は無視する
+        def forwarded(value):
+            return {'X-Forwarded-For': value}
+
+        for email, value in [
+            ('owner@example.com', '10.0.0.5'),
+            ('guest@example.com', '1.1.1.1, 10.0.0.5'),
+            ('owner@example.com', '2.2.2.2, 10.0.0.5'),
+        ]:
+            response = self._login(email, headers=forwarded(value))
+        self.assertEqual(response.status_code, 429)
+
+        response = self._login('guest@example.com', headers=forwarded('10.0.0.6'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_is_limited_per_user(self):
+        login(self.client, self.user.id)
+        self.assertEqual(self.client.get('/user/search?query=gu').status_code, 200)
+        self.assertEqual(self.client.get('/user/search?query=gu').status_code, 429)
+
+        login(self.client, self.guest.id)
+        self.assertEqual(self.client.get('/user/search?query=ow').status_code, 200)
+
+        stats = self.client.get('/metrics').get_json()['rate_limits']
+        self.assertEqual(
+            stats['search_users'], {'allowed': 2, 'rejected': 1, 'errors': 0}
+        )
+
+    def test_send_message_is_limited_per_room(self):
+        socket_client = self._connect(self.user)
+        # 参加していないユーザーの送信はルームの枠を消費しない
+        outsider = self._connect(self.guest)
+        outsider.emit('send_message', {'event_id': self.event.id, 'message': 'x'})
+
+        for text in ('a', 'b', 'c'):
+            socket_client.emit(
+                'send_message', {'event_id': self.event.id, 'message': text}
+            )
+        errors = self._errors(socket_client)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0]['error'], 'Rate limit exceeded')
+        self.assertEqual(Message.query.count(), 2)
+
+        # ユーザーの枠も尽きると同じ拒否になる
+        socket_client.emit('send_message', {'event_id': self.event.id, 'message': 'd'})
+        self.assertEqual(len(self._errors(socket_client)), 1)
+
+    def test_disabled(self):
+        self.app.extensions['rate_limiter'].enabled = False
+        for _ in range(3):
+            self.assertEqual(self._login().status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+import unittest
+from datetime import datetime
+from app import create_app, db
+from app.models import Event, EventOccurrenceException, User, UserCalendarEntry
+from app.services.friendship_service import add_friendships
+from app.utils.recurrence import (
+    InvalidRecurrence,
+    format_rule,
+    iter_starts,
+    occurrences,
+    parse_rule,
+    series_end,
+)
+from tests.helpers import count_queries, login
+
+
+class TestRecurrenceRule(unittest.TestCase):
+    def test_parse_and_format(self):
+        rule = parse_rule('rrule:FREQ=WEEKLY;BYDAY=TH,TU;COUNT=4', 'Asia/Tokyo')
+        self.assertEqual(rule.byday, (1, 3))
+        self.assertEqual(format_rule(rule), 'FREQ=WEEKLY;BYDAY=TU,TH;COUNT=4')
+
+        # 日付のみの UNTIL は現地のその日の終わりまで
+        rule = parse_rule('FREQ=DAILY;UNTIL=20241031', 'Asia/Tokyo')
+        self.assertEqual(format_rule(rule), 'FREQ=DAILY;UNTIL=20241031T145959Z')
+
+        for value in [
+            '',
+            'FREQ=YEARLY',
+            'FREQ=DAILY;BYDAY=MO',
+            'FREQ=WEEKLY;INTERVAL=0',
+            'FREQ=WEEKLY;COUNT=2;UNTIL=20241031',
+            'FREQ=WEEKLY;BYMONTH=1',
+            'FREQ=WEEKLY;UNTIL=tomorrow',
+        ]:
+            with self.assertRaises(InvalidRecurrence, msg=value):
+                parse_rule(value, 'Asia/Tokyo')
+
+    def test_weekly_and_monthly_starts(self):
+        rule = parse_rule('FREQ=WEEKLY;BYDAY=TU,TH;COUNT=4', 'Asia/Tokyo')
+        start = datetime(2024, 10, 1, 10)
+        self.assertEqual(
+            [s.day for s in iter_starts(rule, start, 'Asia/Tokyo')], [1, 3, 8, 10]
+        )
+        self.assertEqual(
+            series_end(rule, start, datetime(2024, 10, 1, 12), 'Asia/Tokyo'),
+            datetime(2024, 10, 10, 12),
+        )
+
+        # 31日のない月は飛ばす(現地の 1/31 0:00 は UTC の 1/30 15:00)
+        rule = parse_rule('FREQ=MONTHLY;COUNT=3', 'Asia/Tokyo')
+        starts = list(iter_starts(rule, datetime(2024, 1, 30, 15), 'Asia/Tokyo'))
+        self.assertEqual([s.month for s in starts], [1, 3, 5])
+
+    def test_local_time_is_kept_across_dst(self):
+        rule = parse_rule('FREQ=WEEKLY', 'America/New_York')
+        # 現地 10:00 は夏時間の前後で UTC 15:00 から 14:00 になる
+        starts = iter_starts(rule, datetime(2024, 3, 1, 15), 'America/New_York')
+        self.assertEqual([next(starts).hour for _ in range(3)], [15, 15, 14])
+
+    def test_window_skips_ahead_and_applies_exceptions(self):
+        rule = parse_rule('FREQ=DAILY', 'Asia/Tokyo')
+        start, end = datetime(2000, 1, 1, 1), datetime(2000, 1, 1, 2)
+        window = (datetime(2024, 10, 1), datetime(2024, 10, 4))
+        exceptions = {
+            datetime(2024, 10, 2, 1): (True, None, None),
+            datetime(2024, 9, 1, 1): (
+                False,
+                datetime(2024, 10, 3, 5),
+                datetime(2024, 10, 3, 6),
+            ),
+        }
+        result = occurrences(rule, start, end, *window, 'Asia/Tokyo', exceptions)
+        self.assertEqual(
+            [(original.day, s.day, s.hour) for original, s, _ in result],
+            [(1, 1, 1), (3, 3, 1), (1, 3, 5)],
+        )
+
+
+class TestRecurringEvents(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.host = User(username='host', email='host@example.com', password_hash='x')
+        self.guest = User(
+            username='guest', email='guest@example.com', password_hash='x'
+        )
+        db.session.add_all([self.host, self.guest])
+        db.session.commit()
+        self.host_id, self.guest_id = self.host.id, self.guest.id
+        add_friendships([(self.host_id, self.guest_id)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _create_weekly(self, **payload):
+        # 毎週火曜 19:00〜21:00(現地)
+        response = self.client.post(
+            '/event/create',
+            json={
+                'event_name': 'meetup',
+                'event_date': '2024-09-30T15:00:00Z',
+                'meeting_time': '19:00-21:00',
+                'recurrence_rule': 'FREQ=WEEKLY',
+                'invitees': [self.guest_id],
+                **payload,
+            },
+            headers=login(self.client, self.host_id),
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['event_id']
+
+    def _calendar(self, user_id, year, month):
+        login(self.client, user_id)
+        response = self.client.get(
+            '/event/user/calendar', query_string={'year': year, 'month': month}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['events']
+
+    def test_occurrences_are_expanded_on_read(self):
+        event_id = self._create_weekly()
+
+        events = self._calendar(self.host_id, 2024, 10)
+        self.assertEqual(
+            [e['event_date'] for e in events],
+            [
+                '2024-09-30T15:00:00',
+                '2024-10-07T15:00:00',
+                '2024-10-14T15:00:00',
+                '2024-10-21T15:00:00',
+                '2024-10-28T15:00:00',
+            ],
+        )
+        self.assertEqual(events[1]['starts_at'], '2024-10-08T10:00:00+00:00')
+        self.assertEqual(events[1]['occurrence_start'], events[1]['starts_at'])
+        self.assertEqual({e['id'] for e in events}, {event_id})
+
+        # 遠い先の月も行を増やさずに展開する
+        login(self.client, self.host_id)
+        with count_queries() as counter:
+            events = self._calendar(self.host_id, 2030, 6)
+        self.assertEqual(len(events), 4)
+        # トークン・バージョン・エントリ・例外の 4 回で、回数によらず一定
+        self.assertLessEqual(counter.count, 4, counter.statements)
+        self.assertEqual(Event.query.count(), 1)
+        self.assertEqual(UserCalendarEntry.query.count(), 1)
+
+        response = self.client.get('/event/user/participated-events?month=10&year=2024')
+        self.assertEqual(len(response.get_json()), 5)
+
+    def test_series_is_shared_by_participants(self):
+        event_id = self._create_weekly(recurrence_rule='FREQ=WEEKLY;COUNT=3')
+        self.client.post(
+            '/event/respond',
+            json={'event_id': event_id, 'response': 'accepted'},
+            headers=login(self.client, self.guest_id),
+        )
+
+        events = self._calendar(self.guest_id, 2024, 10)
+        self.assertEqual([e['id'] for e in events], [event_id] * 3)
+        detail = self.client.get(f'/event/{event_id}/detail').get_json()
+        self.assertEqual(detail['recurrence_rule'], 'FREQ=WEEKLY;COUNT=3')
+
+    def test_exceptions_cancel_and_move_occurrences(self):
+        event_id = self._create_weekly()
+        headers = login(self.client, self.host_id)
+        url = f'/event/{event_id}/occurrence'
+
+        response = self.client.post(
+            url,
+            json={'occurrence_start': '2024-10-08T10:00:00Z', 'cancelled': True},
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        # 10/15 の回を 11/2 の現地 12:00 に移す
+        response = self.client.post(
+            url,
+            json={
+                'occurrence_start': '2024-10-15T10:00:00Z',
+                'starts_at': '2024-11-02T12:00:00',
+            },
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 200)
+
+        october = self._calendar(self.host_id, 2024, 10)
+        self.assertEqual(
+            [e['starts_at'][:10] for e in october],
+            ['2024-10-01', '2024-10-22', '2024-10-29'],
+        )
+        november = self._calendar(self.host_id, 2024, 11)
+        self.assertEqual(november[0]['starts_at'], '2024-11-02T03:00:00+00:00')
+        self.assertEqual(november[0]['ends_at'], '2024-11-02T05:00:00+00:00')
+        self.assertEqual(november[0]['occurrence_start'], '2024-10-15T10:00:00+00:00')
+
+        headers = login(self.client, self.host_id)
+        response = self.client.post(
+            url, json={'occurrence_start': '2024-10-09T10:00:00Z'}, headers=headers
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.delete(
+            url,
+            query_string={'occurrence_start': '2024-10-08T10:00:00Z'},
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self._calendar(self.host_id, 2024, 10)), 4)
+
+        # 初回の時刻を変えると例外は破棄される
+        self.client.put(
+            f'/event/{event_id}/update',
+            json={'meeting_time': '20:00'},
+            headers=login(self.client, self.host_id),
+        )
+        self.assertEqual(EventOccurrenceException.query.count(), 0)
+
+    def test_recurring_events_block_availability(self):
+        self._create_weekly(recurrence_rule='FREQ=WEEKLY;UNTIL=20241031')
+        login(self.client, self.host_id)
+        response = self.client.get(
+            '/event/availability',
+            query_string={
+                'user_ids': str(self.guest_id),
+                'start': '2024-10-22T18:00:00',
+                'end': '2024-10-22T22:00:00',
+            },
+        )
+        self.assertEqual(
+            response.get_json()['slots'],
+            [
+                {
+                    'start': '2024-10-22T09:00:00+00:00',
+                    'end': '2024-10-22T10:00:00+00:00',
+                },
+                {
+                    'start': '2024-10-22T12:00:00+00:00',
+                    'end': '2024-10-22T13:00:00+00:00',
+                },
+            ],
+        )
+
+    def test_invalid_rule(self):
+        response = self.client.post(
+            '/event/create',
+            json={
+                'event_name': 'meetup',
+                'event_date': '2024-09-30T15:00:00Z',
+                'recurrence_rule': 'FREQ=HOURLY',
+            },
+            headers=login(self.client, self.host_id),
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
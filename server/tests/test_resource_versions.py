@@ -0,0 +1,155 @@
+import unittest
+import uuid
+from datetime import datetime
+from app import create_app, db
+from app.models import Event, EventParticipant, User
+from app.services.message_writer import get_message_writer
+from app.services.resource_versions import event_key, get_versions
+from tests.helpers import count_queries, login
+
+
+class TestConditionalGet(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.host = User(username='host', email='host@example.com', password_hash='x')
+        self.guest = User(
+            username='guest', email='guest@example.com', password_hash='x'
+        )
+        db.session.add_all([self.host, self.guest])
+        db.session.commit()
+
+    def tearDown(self):
+        get_message_writer().close()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _get(self, url, user, etag=None):
+        login(self.client, user.id)
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(url, headers=headers)
+
+    def _befriend(self):
+        headers = login(self.client, self.host.id)
+        self.client.post(
+            '/friend/request', json={'receiver_id': self.guest.id}, headers=headers
+        )
+        request_id = self._get('/friend/requests', self.guest).get_json()[0]['id']
+        headers = login(self.client, self.guest.id)
+        self.client.post(
+            f'/friend/request/{request_id}/respond',
+            json={'action': 'accept'},
+            headers=headers,
+        )
+
+    def test_unchanged_friends_answer_not_modified_without_reading_data(self):
+        response = self._get('/user/friends', self.host)
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+
+        with count_queries() as counter:
+            response = self._get('/user/friends', self.host, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('FROM user' in s for s in counter.statements))
+
+        self._befriend()
+        response = self._get('/user/friends', self.host, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()[0]['username'], 'guest')
+
+    def test_friend_requests_change_when_received(self):
+        etag = self._get('/friend/requests', self.guest).headers['ETag']
+        self.assertEqual(
+            self._get('/friend/requests', self.guest, etag).status_code, 304
+        )
+
+        headers = login(self.client, self.host.id)
+        self.client.post(
+            '/friend/request', json={'receiver_id': self.guest.id}, headers=headers
+        )
+        self.assertEqual(
+            self._get('/friend/requests', self.guest, etag).status_code, 200
+        )
+
+    def test_event_detail_and_invites_follow_event_writes(self):
+        self._befriend()
+        headers = login(self.client, self.host.id)
+        event_id = self.client.post(
+            '/event/create',
+            json={
+                'event_name': 'party',
+                'event_date': '2024-10-01T10:00:00Z',
+                'invitees': [self.guest.id],
+            },
+            headers=headers,
+        ).get_json()['event_id']
+
+        detail_etag = self._get(f'/event/{event_id}/detail', self.host).headers['ETag']
+        invites_etag = self._get('/user/event-invites', self.guest).headers['ETag']
+        self.assertEqual(
+            self._get(f'/event/{event_id}/detail', self.host, detail_etag).status_code,
+            304,
+        )
+
+        headers = login(self.client, self.host.id)
+        self.client.put(
+            f'/event/{event_id}/update',
+            json={'meeting_place': 'Tokyo'},
+            headers=headers,
+        )
+        response = self._get(f'/event/{event_id}/detail', self.host, detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self._get('/user/event-invites', self.guest, invites_etag).status_code, 200
+        )
+
+        # メッセージの追加ではイベントのバージョン行を更新しない
+        detail_etag = response.headers['ETag']
+        versions = get_versions([event_key(event_id)])
+        get_message_writer().write(
+            {
+                'id': str(uuid.uuid4()),
+                'event_id': event_id,
+                'user_id': self.host.id,
+                'message': 'hello',
+                'timestamp': datetime.utcnow(),
+            }
+        )
+        response = self._get(f'/event/{event_id}/detail', self.host, detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['messages'][0]['message'], 'hello')
+        self.assertEqual(get_versions([event_key(event_id)]), versions)
+        self.assertEqual(
+            self._get(
+                f'/event/{event_id}/detail', self.host, response.headers['ETag']
+            ).status_code,
+            304,
+        )
+
+    def test_not_modified_requires_access(self):
+        event = Event(
+            event_name='private',
+            event_date=datetime(2024, 10, 1),
+            created_by=self.host.id,
+        )
+        db.session.add(event)
+        db.session.commit()
+        db.session.add(EventParticipant(event_id=event.id, user_id=self.host.id))
+        db.session.commit()
+
+        etag = self._get(f'/event/{event.id}/detail', self.host).headers['ETag']
+        response = self._get(f'/event/{event.id}/detail', self.guest, etag)
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
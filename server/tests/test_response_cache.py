@@ -0,0 +1,168 @@
+import unittest
+import uuid
+from datetime import datetime
+from unittest import mock
+from app import create_app, db
+from app.models import Event, EventParticipant, Message, User
+from app.services.resource_versions import bump_versions, event_key
+from app.services.response_cache import MemoryCacheBackend, RedisCacheBackend
+from tests.helpers import count_queries, login
+
+
+class TestMemoryCacheBackend(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        backend = MemoryCacheBackend(max_size=2)
+        backend.set('a', 1, 10)
+        backend.set('b', 2, 10)
+        backend.get('a')
+        backend.set('c', 3, 10)
+
+        self.assertEqual(backend.get('a'), 1)
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(backend.get('c'), 3)
+
+    def test_expires_after_ttl(self):
+        backend = MemoryCacheBackend()
+        with mock.patch('time.monotonic', return_value=100):
+            backend.set('a', 1, 5)
+        with mock.patch('time.monotonic', return_value=106):
+            self.assertIsNone(backend.get('a'))
+
+
+class _FakeRedisClient:
+    # redis.Redis の get/set/delete と同じく bytes を保持する
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode('utf-8')
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+class TestEventDetailCache(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+        self.cache = self.app.extensions['response_cache']
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.host = User(username='host', email='host@example.com', password_hash='x')
+        db.session.add(self.host)
+        db.session.commit()
+
+        self.event = Event(
+            event_name='party',
+            event_date=datetime(2024, 10, 1),
+            created_by=self.host.id,
+        )
+        db.session.add(self.event)
+        db.session.commit()
+        db.session.add(EventParticipant(event_id=self.event.id, user_id=self.host.id))
+        db.session.commit()
+        self.event_id = self.event.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _detail(self):
+        login(self.client, self.host.id)
+        return self.client.get(f'/event/{self.event_id}/detail')
+
+    def test_repeated_views_are_served_from_cache(self):
+        with count_queries() as first:
+            self.assertEqual(self._detail().status_code, 200)
+        with count_queries() as second:
+            response = self._detail()
+
+        self.assertEqual(response.get_json()['event_name'], 'party')
+        self.assertLess(second.count, first.count)
+        self.assertEqual(self.cache.stats()['event_detail'], {'hits': 1, 'misses': 1})
+
+    def test_detail_with_messages_round_trips_through_redis_backend(self):
+        backend = RedisCacheBackend.__new__(RedisCacheBackend)
+        backend.client = _FakeRedisClient()
+        backend.prefix = 'test:'
+        self.cache.backend = backend
+        db.session.add(
+            Message(
+                id=str(uuid.uuid4()),
+                event_id=self.event_id,
+                user_id=self.host.id,
+                message='hello',
+                timestamp=datetime(2024, 10, 1, 9, 30),
+            )
+        )
+        db.session.commit()
+
+        first = self._detail().get_json()
+        second = self._detail().get_json()
+
+        self.assertEqual(second, first)
+        self.assertEqual(
+            second['messages'][0]['timestamp'], '2024-10-01T09:30:00+00:00'
+        )
+        self.assertEqual(self.cache.stats()['event_detail'], {'hits': 1, 'misses': 1})
+
+    def test_update_invalidates_cached_detail(self):
+        self._detail()
+        headers = login(self.client, self.host.id)
+        self.client.put(
+            f'/event/{self.event_id}/update',
+            json={'meeting_place': 'Tokyo'},
+            headers=headers,
+        )
+        self.assertEqual(self._detail().get_json()['meeting_place'], 'Tokyo')
+
+    def test_version_change_from_another_worker_is_detected(self):
+        self._detail()
+        # 別ワーカーでの更新: このプロセスのキャッシュは破棄されない
+        self.event.description = 'changed elsewhere'
+        bump_versions([event_key(self.event_id)])
+        db.session.commit()
+
+        self.assertEqual(self._detail().get_json()['description'], 'changed elsewhere')
+        self.assertEqual(self.cache.stats()['event_detail']['misses'], 2)
+
+    def test_friend_list_is_cached_until_friendship_changes(self):
+        friend = User(username='friend', email='friend@example.com', password_hash='x')
+        db.session.add(friend)
+        db.session.commit()
+
+        login(self.client, self.host.id)
+        self.assertEqual(self.client.get('/user/friends').get_json(), [])
+        self.assertEqual(self.client.get('/user/friends').get_json(), [])
+        self.assertEqual(self.cache.stats()['friends'], {'hits': 1, 'misses': 1})
+
+        headers = login(self.client, self.host.id)
+        self.client.post(
+            '/friend/request', json={'receiver_id': friend.id}, headers=headers
+        )
+        headers = login(self.client, friend.id)
+        request_id = self.client.get('/friend/requests').get_json()[0]['id']
+        self.client.post(
+            f'/friend/request/{request_id}/respond',
+            json={'action': 'accept'},
+            headers=headers,
+        )
+
+        login(self.client, self.host.id)
+        friends = self.client.get('/user/friends').get_json()
+        self.assertEqual([f['username'] for f in friends], ['friend'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import uuid
+from unittest import mock
+import gevent
+from app import create_app, socketio
+
+QUEUE_URL = 'local://test-backplane'
+
+
+class TestSocketIOBackplane(unittest.TestCase):
+    def setUp(self):
+        self.managers = []
+
+    def tearDown(self):
+        for manager in self.managers:
+            manager.close()
+        # 後続のテストがメッセージキューなしのサーバーを使うように戻す
+        create_app()
+
+    def _create_instance(self):
+        create_app(
+            {
+                'TESTING': True,
+                'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                'SOCKETIO_MESSAGE_QUEUE': QUEUE_URL,
+            }
+        )
+        # init_app ごとに新しい Socket.IO サーバーが作られる
+        server = socketio.server
+        server.manager.initialize()
+        self.managers.append(server.manager)
+        return server
+
+    def _connect(self, server, room):
+        # 接続済みのクライアントを登録し、その eio セッション ID を返す
+        eio_sid = uuid.uuid4().hex
+        sid = server.manager.connect(eio_sid, '/')
+        server.manager.enter_room(sid, '/', room)
+        return eio_sid
+
+    def _sent_to(self, send_packet):
+        return [(call.args[0], call.args[1].data) for call in send_packet.mock_calls]
+
+    def test_emit_reaches_clients_on_other_instance(self):
+        server_a = self._create_instance()
+        server_b = self._create_instance()
+        self.assertIsNot(server_a, server_b)
+
+        client_a = self._connect(server_a, '1')
+        client_b = self._connect(server_b, '1')
+        self._connect(server_b, '2')
+
+        with mock.patch.object(
+            server_a.eio, 'send_packet'
+        ) as send_a, mock.patch.object(server_b.eio, 'send_packet') as send_b:
+            # socketio.emit は最後に作ったインスタンス(B)から送られる
+            socketio.emit('receive_message', {'message': 'hello'}, to='1')
+            gevent.sleep(0.05)
+
+        sent_a = self._sent_to(send_a)
+        sent_b = self._sent_to(send_b)
+        self.assertEqual([sid for sid, _ in sent_a], [client_a])
+        self.assertEqual([sid for sid, _ in sent_b], [client_b])
+        self.assertIn('hello', sent_a[0][1])
+
+    def test_closed_instance_stops_receiving(self):
+        server_a = self._create_instance()
+        self._connect(server_a, '1')
+        server_a.manager.close()
+        self._create_instance()
+
+        with mock.patch.object(server_a.eio, 'send_packet') as send_a:
+            socketio.emit('receive_message', {'message': 'hello'}, to='1')
+            gevent.sleep(0.05)
+        send_a.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
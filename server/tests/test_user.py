@@ -0,0 +1,225 @@
+import unittest
+from datetime import datetime
+from app import create_app, db
+from app.models import Event, EventInvite, FriendRequest, User
+from app.services.friendship_service import add_friendships
+from tests.helpers import count_queries, login
+
+
+class TestUserSearch(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.users = {}
+        for name in ['alice', 'alicia', 'malice', 'bob', 'alex', 'me']:
+            user = User(username=name, email=f'{name}@example.com', password_hash='x')
+            db.session.add(user)
+            self.users[name] = user
+        db.session.commit()
+
+        self.users['me'].friends.append(self.users['alex'])
+        db.session.commit()
+
+        login(self.client, self.users['me'].id)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _search(self, query, **params):
+        response = self.client.get(
+            '/user/search', query_string={'query': query, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [user['username'] for user in response.get_json()]
+
+    def test_search_ranks_exact_prefix_then_substring(self):
+        self.assertEqual(self._search('alice'), ['alice', 'malice', 'alicia'])
+        self.assertEqual(self._search('ali'), ['alice', 'alicia', 'malice'])
+
+    def test_search_short_query_matches_substrings(self):
+        # Postgres の ILIKE '%query%' と同じ結果になる(前方一致が先)
+        self.assertEqual(self._search('a'), ['alice', 'alicia', 'malice'])
+        self.assertEqual(self._search('b'), ['bob'])
+        self.assertEqual(self._search('ic'), ['alice', 'alicia', 'malice'])
+
+    def test_search_excludes_self_and_friends(self):
+        self.assertEqual(self._search('al'), ['alice', 'alicia', 'malice'])
+        self.assertEqual(self._search('me'), [])
+
+    def test_search_respects_limit(self):
+        self.assertEqual(self._search('ali', limit=1), ['alice'])
+
+    def test_search_picks_up_new_users(self):
+        self.assertEqual(self._search('carol'), [])
+
+        user = User(username='carol', email='carol@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+
+        self.assertEqual(self._search('carol'), ['carol'])
+
+
+class TestEventInvites(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.user = User(username='guest', email='guest@example.com', password_hash='x')
+        db.session.add(self.user)
+        db.session.commit()
+
+        login(self.client, self.user.id)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _invite(self, count):
+        for _ in range(count):
+            number = Event.query.count()
+            creator = User(
+                username=f'host{number}',
+                email=f'host{number}@example.com',
+                password_hash='x',
+            )
+            db.session.add(creator)
+            db.session.commit()
+            event = Event(
+                event_name=f'event {number}',
+                event_date=datetime(2024, 10, number + 1),
+                created_by=creator.id,
+            )
+            db.session.add(event)
+            db.session.commit()
+            db.session.add(EventInvite(event_id=event.id, user_id=self.user.id))
+        db.session.commit()
+
+    def _get_invites(self):
+        with count_queries() as counter:
+            response = self.client.get('/user/event-invites')
+        self.assertEqual(response.status_code, 200)
+        return response.get_json(), counter.count
+
+    def test_invites_include_event_and_inviter(self):
+        self._invite(1)
+
+        invites, _ = self._get_invites()
+        self.assertEqual(
+            invites,
+            [
+                {
+                    'id': 1,
+                    'event_name': 'event 0',
+                    'event_date': '2024-10-01T00:00:00',
+                    'meeting_time': None,
+                    'meeting_place': None,
+                    'description': None,
+                    'invited_by': 'host0',
+                }
+            ],
+        )
+
+    def test_invites_query_budget_is_constant(self):
+        self._invite(1)
+        _, few_queries = self._get_invites()
+
+        self._invite(20)
+        invites, many_queries = self._get_invites()
+
+        self.assertEqual(len(invites), 21)
+        # 失効確認・ETag 用のバージョン取得・本体の1クエリ
+        self.assertLessEqual(few_queries, 3)
+        self.assertLessEqual(many_queries, few_queries)
+
+
+class TestFriendSuggestions(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        db.create_all()
+
+        self.users = {}
+        for name in ['me', 'a', 'b', 'c', 'x', 'y', 'z']:
+            user = User(username=name, email=f'{name}@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            self.users[name] = user.id
+
+        u = self.users
+        add_friendships(
+            [
+                (u['me'], u['a']),
+                (u['me'], u['b']),
+                (u['me'], u['c']),
+                (u['a'], u['x']),
+                (u['a'], u['y']),
+                (u['b'], u['x']),
+                (u['c'], u['y']),
+                (u['c'], u['z']),
+            ]
+        )
+        db.session.add(FriendRequest(sender_id=u['me'], receiver_id=u['z']))
+        db.session.commit()
+
+        login(self.client, u['me'])
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _suggestions(self):
+        response = self.client.get('/user/friend-suggestions')
+        self.assertEqual(response.status_code, 200)
+        return [(s['username'], s['mutual_friends']) for s in response.get_json()]
+
+    def test_ranks_friends_of_friends_by_mutual_count(self):
+        # z は保留中のリクエストがあるため除外される
+        self.assertEqual(self._suggestions(), [('x', 2), ('y', 2)])
+
+    def test_graph_reloads_only_changed_users(self):
+        self._suggestions()
+        graph = self.app.extensions['friend_graph']
+        before = dict(graph._adjacency)
+
+        add_friendships([(self.users['me'], self.users['x'])])
+        db.session.commit()
+
+        self.assertEqual(self._suggestions(), [('y', 2)])
+        self.assertIsNot(graph._adjacency[self.users['me']], before[self.users['me']])
+        self.assertIs(graph._adjacency[self.users['a']], before[self.users['a']])
+
+    def test_search_includes_mutual_friend_count(self):
+        response = self.client.get('/user/search?query=y')
+        self.assertEqual(
+            response.get_json(),
+            [{'id': self.users['y'], 'username': 'y', 'mutual_friends': 2}],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()